@@ -1,14 +1,28 @@
-from lib.finite_state_machine import FiniteStateMachine
+from lib.compiled_finite_state_machine import CompiledFiniteStateMachine
+from typing import Optional
+
 from c64_layout import C64Layout
+from Robot import Robot
+
+class C64Project(CompiledFiniteStateMachine):
+   def __init__(self, robot: Optional[Robot] = None):
+        # robot permet de fournir un Robot deja configure, par exemple avec le simulateur (voir gopigo3_simulator)
+        layout = C64Layout(robot)
+        # les etats de verification ne font que brancher, on les traverse dans le meme tick
+        super().__init__(layout, micro_steps=8)
+
+   def track(self) -> bool:
+        # les actions du tick ecrivent dans une trame d'actionneurs, envoyee au robot en un seul lot a la fin du tick
+        actuators = self.layout.robot.actuators
+        actuators.begin_frame()
+        try:
+            return super().track()
+        finally:
+            actuators.commit()
 
-class C64Project(FiniteStateMachine):
-   def __init__(self):
-        layout = C64Layout()
-        super().__init__(layout)
-    
 def main():
     c64project = C64Project()
-    c64project.run()
+    c64project.run(idle_sleep=True)
 
 if __name__ == '__main__':
     quit(main())  
\ No newline at end of file
@@ -1,72 +1,347 @@
-from easygopigo3 import EasyGoPiGo3 as GoPiGo3
+import os
+
+if os.environ.get('GOPIGO3_BACKEND') == 'simulator':
+    # le simulateur doit etre demande explicitement (tests, mesures de performance), jamais par defaut
+    from gopigo3_simulator import SimulatedGoPiGo3 as GoPiGo3
+else:
+    from easygopigo3 import EasyGoPiGo3 as GoPiGo3
 from enum import Enum, auto
-from typing import Optional, Tuple, Union, List
+from collections import deque
+from collections.abc import Sequence
+from typing import Callable, Iterable, NamedTuple, Optional, Tuple, Union, List
+from statistics import median_low
 from time import perf_counter
-
-from lib.blinker import SideBlinkers, Side
+import logging
+import threading
+
+from lib.blinker import AnalyticalBlinker, SideBlinkers, Side
+from lib.clock import Clock, default_clock
+from lib.color_pattern import ColorPattern
+from lib.ring_buffer import OverflowPolicy, RingBuffer
+from lib.scheduler import Scheduler
 from lib.state import MonitoredState
 
+logger = logging.getLogger(__name__)
+
+
+class CommandLatency(NamedTuple):
+    # temps entre la soumission et la fin d'une commande materielle, en secondes
+    count: int
+    mean: float
+    max: float
+
+
+class HardwareExecutor:
+    # Thread d'entrees/sorties qui envoie les commandes des actionneurs au GoPiGo3, pour que le tick de la machine
+    # a etats n'attende jamais le bus SPI/I2C. Il n'y a au plus qu'une commande en attente par actionneur: une
+    # nouvelle commande remplace celle qui n'est pas encore partie. Les commandes en attente partent par priorite,
+    # les moteurs d'abord, donc une mise a jour lente des yeux ne retarde pas un arret des moteurs.
+    #
+    # Chaque envoi est fait sous bus_lock, le verrou que partagent tous les threads qui parlent au GoPiGo3 (voir
+    # Robot). Un envoi qui echoue est journalise et compte, puis signale a on_error s'il a ete donne a submit().
+    CAPACITY = 16
+    PRIORITIES = {'motor': 0, 'servo': 1}
+    DEFAULT_PRIORITY = 2
+
+    def __init__(self, robot: GoPiGo3, capacity: int = CAPACITY, clock: Optional[Clock] = None,
+                 bus_lock: Optional[threading.Lock] = None):
+        if capacity <= 0:
+            raise ValueError('capacity must be strictly positive')
+
+        self.robot = robot
+        self.bus_lock = threading.Lock() if bus_lock is None else bus_lock
+        self.__capacity = capacity
+        # horloge sur laquelle la latence des commandes est mesuree
+        self.__clock = default_clock() if clock is None else clock
+        self.__pending = {}
+        self.__condition = threading.Condition()
+        self.__thread = None
+        self.__running = False
+        self.__busy = False
+        self.__latencies = {}
+        self.__coalesced_count = 0
+        self.__error_count = 0
+
+    @property
+    def is_running(self) -> bool:
+        return self.__running
+
+    @property
+    def pending_count(self) -> int:
+        return len(self.__pending)
+
+    @property
+    def coalesced_count(self) -> int:
+        # nombre de commandes remplacees avant d'etre envoyees
+        return self.__coalesced_count
+
+    @property
+    def error_count(self) -> int:
+        return self.__error_count
+
+    def latency(self, key: str) -> Optional[CommandLatency]:
+        stats = self.__latencies.get(key)
+        if stats is None:
+            return None
+        count, total, maximum = stats
+        return CommandLatency(count, total / count, maximum)
+
+    def start(self) -> None:
+        if self.__thread is not None:
+            return
+
+        self.__running = True
+        self.__thread = threading.Thread(target=self.__run, name='hardware-io', daemon=True)
+        self.__thread.start()
+
+    def stop(self) -> None:
+        # les commandes en attente sont envoyees avant l'arret
+        if self.__thread is None:
+            return
+
+        with self.__condition:
+            self.__running = False
+            self.__condition.notify_all()
+        self.__thread.join()
+        self.__thread = None
+
+    def submit(self, key: str, send: Callable[..., None], *args,
+               on_error: Optional[Callable[[str, Exception], None]] = None) -> None:
+        # on_error(key, error) est appele par le thread d'entrees/sorties si send echoue. Il n'y a qu'une commande
+        # en attente par cle, donc submit() ne bloque que s'il y a plus de cles que capacity: les actionneurs du
+        # robot (moteurs, servo, yeux et DEL, six cles) restent sous CAPACITY et ActuatorCache n'attend jamais
+        with self.__condition:
+            if key in self.__pending:
+                self.__coalesced_count += 1
+            else:
+                # file pleine: on attend qu'une commande parte
+                while len(self.__pending) >= self.__capacity:
+                    self.__condition.wait()
+            self.__pending[key] = (send, args, self.__clock.now(), on_error)
+            self.__condition.notify_all()
+
+    def flush(self, timeout: Optional[float] = None) -> bool:
+        # attend que toutes les commandes soumises soient envoyees, retourne faux si le delai est depasse
+        with self.__condition:
+            return self.__condition.wait_for(lambda: not self.__pending and not self.__busy, timeout)
+
+    def __priority(self, key: str) -> int:
+        return HardwareExecutor.PRIORITIES.get(key, HardwareExecutor.DEFAULT_PRIORITY)
+
+    def __run(self) -> None:
+        condition = self.__condition
+        pending = self.__pending
+        while True:
+            with condition:
+                while not pending and self.__running:
+                    condition.wait()
+                if not pending:
+                    return
+                key = min(pending, key=self.__priority)
+                send, args, submit_time, on_error = pending.pop(key)
+                self.__busy = True
+                condition.notify_all()
+
+            try:
+                with self.bus_lock:
+                    send(*args)
+            except Exception as error:
+                self.__error_count += 1
+                logger.exception('hardware command %r failed', key)
+                if on_error is not None:
+                    on_error(key, error)
+            latency = self.__clock.now() - submit_time
+
+            with condition:
+                stats = self.__latencies.get(key)
+                if stats is None:
+                    self.__latencies[key] = [1, latency, latency]
+                else:
+                    stats[0] += 1
+                    stats[1] += latency
+                    if latency > stats[2]:
+                        stats[2] = latency
+                self.__busy = False
+                condition.notify_all()
+
+
+class ActuatorCache:
+    # Etat fantome des actionneurs: la derniere valeur envoyee a chaque actionneur. Une commande n'est envoyee au
+    # GoPiGo3 que si la valeur demandee change, ce qui evite de renvoyer la meme commande SPI/I2C a chaque tick
+    # quand une action dans l'etat repete la meme consigne. Si le materiel est modifie sans passer par le cache,
+    # appeler invalidate() pour que la prochaine commande soit envoyee.
+    #
+    # Entre begin_frame() et commit(), les commandes sont ecrites dans une trame au lieu d'etre envoyees: seule la
+    # derniere valeur de chaque actionneur est gardee, puis commit() envoie la trame en un seul lot. Un arret suivi
+    # d'un redemarrage dans le meme tick n'atteint donc jamais les moteurs.
+    #
+    # Avec un HardwareExecutor, les commandes qui changent la valeur d'un actionneur sont confiees a son thread au
+    # lieu d'etre envoyees par le thread de la machine a etats. Sans executeur, l'envoi est fait sous bus_lock.
+    # L'etat fantome est mis a jour a la soumission; si l'envoi echoue ensuite, l'executeur invalide l'actionneur
+    # pour que la prochaine commande soit envoyee de nouveau au lieu d'etre supprimee.
+    def __init__(self, executor: Optional[HardwareExecutor] = None, bus_lock: Optional[threading.Lock] = None):
+        self.executor = executor
+        self.bus_lock = threading.Lock() if bus_lock is None else bus_lock
+        self.__shadow = {}
+        self.__frame = {}
+        self.__frame_depth = 0
+        self.__sent_count = 0
+        self.__suppressed_count = 0
+        self.__coalesced_count = 0
+
+    @property
+    def sent_count(self) -> int:
+        return self.__sent_count
+
+    @property
+    def suppressed_count(self) -> int:
+        return self.__suppressed_count
+
+    @property
+    def coalesced_count(self) -> int:
+        # nombre de commandes remplacees par une commande plus recente du meme actionneur dans la meme trame
+        return self.__coalesced_count
+
+    @property
+    def in_frame(self) -> bool:
+        return self.__frame_depth > 0
+
+    def value(self, key: str):
+        # la derniere valeur demandee a l'actionneur, None si elle est inconnue
+        pending = self.__frame.get(key)
+        if pending is not None:
+            return pending[0]
+        return self.__shadow.get(key)
+
+    def command(self, key: str, value, send: Callable[..., None], *args) -> bool:
+        # envoie send(*args) si la valeur de l'actionneur change, retourne vrai si la commande a ete envoyee. Dans
+        # une trame, la commande est gardee pour commit() et la valeur de retour est toujours faux
+        if self.__frame_depth:
+            if key in self.__frame:
+                self.__coalesced_count += 1
+            self.__frame[key] = (value, send, args)
+            return False
+
+        shadow = self.__shadow
+        if key in shadow and shadow[key] == value:
+            self.__suppressed_count += 1
+            return False
+
+        executor = self.executor
+        if executor is not None and executor.is_running:
+            executor.submit(key, send, *args, on_error=self.__send_failed)
+        else:
+            with self.bus_lock:
+                send(*args)
+        shadow[key] = value
+        self.__sent_count += 1
+        return True
+
+    def begin_frame(self) -> None:
+        # les trames s'imbriquent: seul le commit() le plus externe envoie les commandes
+        self.__frame_depth += 1
+
+    def commit(self) -> None:
+        if self.__frame_depth == 0:
+            raise RuntimeError('commit() called without begin_frame()')
+
+        self.__frame_depth -= 1
+        if self.__frame_depth or not self.__frame:
+            return
+
+        frame = self.__frame
+        self.__frame = {}
+        for key, (value, send, args) in frame.items():
+            self.command(key, value, send, *args)
+
+    def invalidate(self, key: Optional[str] = None) -> None:
+        if key is None:
+            self.__shadow.clear()
+        else:
+            self.__shadow.pop(key, None)
+
+    def reset_stats(self) -> None:
+        self.__sent_count = 0
+        self.__suppressed_count = 0
+        self.__coalesced_count = 0
+
+    def __send_failed(self, key: str, error: Exception) -> None:
+        # appele par le thread d'entrees/sorties: la valeur de l'actionneur est inconnue
+        self.invalidate(key)
+
 
 class LedBlinkers(SideBlinkers):
-    def __init__(self, robot: GoPiGo3):
+    def __init__(self, robot: GoPiGo3, actuators: Optional[ActuatorCache] = None):
         self.robot = robot
+        self.actuators = ActuatorCache() if actuators is None else actuators
 
         def generate_off_state_left() -> MonitoredState:
             mon = MonitoredState()
-            mon.add_entering_action(lambda: self.robot.led_off('left'))
+            mon.add_entering_action(lambda: self.actuators.command('led_left', False, self.robot.led_off, 'left'))
             return mon
 
         def generate_off_state_right() -> MonitoredState:
             mon = MonitoredState()
-            mon.add_entering_action(lambda: self.robot.led_off('right'))
+            mon.add_entering_action(lambda: self.actuators.command('led_right', False, self.robot.led_off, 'right'))
             return mon
 
         def generate_on_state_left() -> MonitoredState:
             mon = MonitoredState()
-            mon.add_entering_action(lambda: self.robot.led_on('left'))
+            mon.add_entering_action(lambda: self.actuators.command('led_left', True, self.robot.led_on, 'left'))
             return mon
 
         def generate_on_state_right() -> MonitoredState:
             mon = MonitoredState()
-            mon.add_entering_action(lambda: self.robot.led_on('right'))
+            mon.add_entering_action(lambda: self.actuators.command('led_right', True, self.robot.led_on, 'right'))
             return mon
 
         super().__init__(generate_off_state_left, generate_on_state_left, generate_off_state_right,
-                         generate_on_state_right)
+                         generate_on_state_right, blinker_type=AnalyticalBlinker)
 
 
 class EyeBlinkers(SideBlinkers):
-    def __init__(self, robot: GoPiGo3):
+    # yeux touches par un motif, avec le decalage de depart du motif en fraction de sa duree
+    PATTERN_SIDES = {
+        Side.LEFT: (('left', 0.0),),
+        Side.RIGHT: (('right', 0.0),),
+        Side.BOTH: (('left', 0.0), ('right', 0.0)),
+        Side.LEFT_RECIPROCAL: (('left', 0.0), ('right', 0.5)),
+        Side.RIGHT_RECIPROCAL: (('right', 0.0), ('left', 0.5)),
+    }
+    OFF_COLOR = (0, 0, 0)
+
+    def __init__(self, robot: GoPiGo3, actuators: Optional[ActuatorCache] = None):
         self.robot = robot
+        self.actuators = ActuatorCache() if actuators is None else actuators
         self.__right_color = (100, 100, 100)
         self.__left_color = (100, 100, 100)
+        # motif joue par chaque oeil: (motif, temps de depart), None pour la couleur solide
+        self.__patterns = {'left': None, 'right': None}
 
         def generate_off_state_left() -> MonitoredState:
             mon = MonitoredState()
-            mon.add_entering_action(lambda: self.robot.close_left_eye())
+            mon.add_entering_action(lambda: self.actuators.command('left_eye', None, self.robot.close_left_eye))
             return mon
 
         def generate_off_state_right() -> MonitoredState:
             mon = MonitoredState()
-            mon.add_entering_action(lambda: self.robot.close_right_eye())
+            mon.add_entering_action(lambda: self.actuators.command('right_eye', None, self.robot.close_right_eye))
             return mon
 
         def generate_on_state_left() -> MonitoredState:
             mon = MonitoredState()
-            mon.add_in_state_action(lambda: self.robot.open_left_eye())
-            mon.add_in_state_action(
-                lambda: self.robot.set_left_eye_color(self.left_color))
+            # la couleur n'est transmise qu'a l'ouverture de l'oeil: on ne rouvre l'oeil que si la couleur change
+            mon.add_in_state_action(self.__show_left)
             return mon
 
         def generate_on_state_right() -> MonitoredState:
             mon = MonitoredState()
-            mon.add_in_state_action(lambda: self.robot.open_right_eye())
-            mon.add_in_state_action(
-                lambda: self.robot.set_right_eye_color(self.right_color))
+            # la couleur n'est transmise qu'a l'ouverture de l'oeil: on ne rouvre l'oeil que si la couleur change
+            mon.add_in_state_action(self.__show_right)
             return mon
 
         super().__init__(generate_off_state_left, generate_on_state_left, generate_off_state_right,
-                         generate_on_state_right)
+                         generate_on_state_right, blinker_type=AnalyticalBlinker)
 
     @property
     def right_color(self):
@@ -78,7 +353,7 @@ class EyeBlinkers(SideBlinkers):
 
     @property
     def left_color(self):
-        return self.__right_color
+        return self.__left_color
 
     @left_color.setter
     def left_color(self, color: Tuple[int, int, int]):
@@ -88,49 +363,342 @@ class EyeBlinkers(SideBlinkers):
         self.left_color = color
         self.right_color = color
 
+    def pattern(self, side: str) -> Optional[ColorPattern]:
+        # motif joue par l'oeil 'left' ou 'right', None s'il affiche sa couleur solide
+        playing = self.__patterns[side]
+        return None if playing is None else playing[0]
+
+    def play(self, side: Side, pattern: ColorPattern) -> None:
+        # ouvre les yeux du cote donne et leur fait jouer le motif; en reciproque, l'autre oeil est decale d'une
+        # demi-duree. Le motif joue jusqu'a la prochaine commande des yeux
+        if not isinstance(side, Side):
+            raise TypeError("side must be of type Side")
+        if not isinstance(pattern, ColorPattern):
+            raise TypeError("pattern must be of type ColorPattern")
+
+        left_blinker, right_blinker = self.blinkers
+        now = left_blinker.clock.now()
+        for name, offset in EyeBlinkers.PATTERN_SIDES[side]:
+            self.__patterns[name] = (pattern, now - offset * pattern.duration)
+            (left_blinker if name == 'left' else right_blinker).turn_on()
+
+    def stop_pattern(self, side: Side = Side.BOTH) -> None:
+        # les yeux du cote donne reprennent leur couleur solide
+        if not isinstance(side, Side):
+            raise TypeError("side must be of type Side")
+        for name, _ in EyeBlinkers.PATTERN_SIDES[side]:
+            self.__patterns[name] = None
+
+    def turn_on(self, side: Side, duration: Optional[Union[float, int]] = None) -> None:
+        self.stop_pattern(side)
+        super().turn_on(side, duration)
+
+    def turn_off(self, side: Side, duration: Optional[Union[float, int]] = None) -> None:
+        self.stop_pattern(side)
+        super().turn_off(side, duration)
+
+    def blink(self, side: Side, **kwargs) -> None:
+        self.stop_pattern(side)
+        super().blink(side, **kwargs)
+
+    def __color(self, side: str, solid_color: Tuple[int, int, int]) -> Tuple[int, int, int]:
+        playing = self.__patterns[side]
+        if playing is None:
+            return solid_color
+        pattern, start_time = playing
+        return pattern.color_at(self.blinkers[0].clock.now() - start_time)
+
+    def __show_left(self):
+        color = self.__color('left', self.left_color)
+        if color == EyeBlinkers.OFF_COLOR:
+            self.actuators.command('left_eye', None, self.robot.close_left_eye)
+        else:
+            self.actuators.command('left_eye', color, self.__open_left_eye, color)
+
+    def __show_right(self):
+        color = self.__color('right', self.right_color)
+        if color == EyeBlinkers.OFF_COLOR:
+            self.actuators.command('right_eye', None, self.robot.close_right_eye)
+        else:
+            self.actuators.command('right_eye', color, self.__open_right_eye, color)
+
+    def __open_left_eye(self, color: Tuple[int, int, int]):
+        self.robot.set_left_eye_color(color)
+        self.robot.open_left_eye()
+
+    def __open_right_eye(self, color: Tuple[int, int, int]):
+        self.robot.set_right_eye_color(color)
+        self.robot.open_right_eye()
+
+
+class _CommandNode:
+    __slots__ = ('children', 'target')
+
+    def __init__(self):
+        self.children = {}
+        self.target = None
+
+
+class CommandRouter:
+    # Associe des sequences de touches de la telecommande a des cibles (par exemple les etats des taches). Les
+    # touches sont suivies dans un arbre de prefixes au fur et a mesure qu'elles arrivent, donc la touche "ok" se
+    # resout en O(1) peu importe le nombre de commandes enregistrees. Un prefixe qui ne mene a aucune commande est
+    # rejete des la touche fautive, et les touches suivantes sont ignorees jusqu'au prochain reset().
+    #
+    # Quand "ok" est appuye, la cible de la commande (ou la cible par defaut si la commande est inconnue) est publiee
+    # dans la custom_value des etats lies avec bind(), pour que leurs transitions soient des StateValueCondition
+    # resolues par une seule recherche dans un dict. La custom_value revient a None au reset().
+    OK = 'ok'
+
+    def __init__(self, default_target=None):
+        self.__root = _CommandNode()
+        self.__node = self.__root
+        self.__default_target = default_target
+        self.__bound_states = []
+        self.__complete = False
+        self.__target = None
+
+    @property
+    def default_target(self):
+        return self.__default_target
+
+    @default_target.setter
+    def default_target(self, target) -> None:
+        self.__default_target = target
+
+    @property
+    def is_complete(self) -> bool:
+        # vrai si "ok" a ete appuye depuis le dernier reset()
+        return self.__complete
+
+    @property
+    def is_rejected(self) -> bool:
+        # vrai si les touches entrees ne sont le prefixe d'aucune commande
+        return self.__node is None
+
+    @property
+    def target(self):
+        # la cible de la commande terminee par "ok", ou None si "ok" n'a pas ete appuye
+        return self.__target
+
+    def register(self, keys: Union[str, List[str]], target) -> None:
+        # une chaine est une suite de touches d'un caractere, par exemple "12" ou "#"
+        if target is None:
+            raise ValueError('target must not be None')
+        if len(keys) == 0 or CommandRouter.OK in keys:
+            raise ValueError('keys must be a non-empty sequence without "ok"')
+
+        node = self.__root
+        for key in keys:
+            node = node.children.setdefault(key, _CommandNode())
+        if node.target is not None:
+            raise ValueError('a command is already registered for these keys')
+        node.target = target
+        self.reset()
+
+    def bind(self, state: MonitoredState) -> None:
+        if not isinstance(state, MonitoredState):
+            raise TypeError('state must be of type MonitoredState')
+        self.__bound_states.append(state)
+        state.custom_value = self.__target
+
+    def push(self, key: str) -> None:
+        if key == CommandRouter.OK:
+            if not self.__complete:
+                node = self.__node
+                target = None if node is None else node.target
+                self.__complete = True
+                self.__publish(self.__default_target if target is None else target)
+            return
+
+        if self.__complete:
+            # une touche apres "ok" invalide la commande, comme dans le buffer du Controller
+            self.__complete = False
+            self.__node = None
+            self.__publish(None)
+        elif self.__node is not None:
+            self.__node = self.__node.children.get(key)
+
+    def reset(self, keys: Iterable[str] = ()) -> None:
+        self.__node = self.__root
+        self.__complete = False
+        self.__publish(None)
+        for key in keys:
+            self.push(key)
+
+    def __publish(self, target) -> None:
+        self.__target = target
+        for state in self.__bound_states:
+            state.custom_value = target
+
+
+class KeyEvent(NamedTuple):
+    # une touche de la telecommande et le moment ou elle a ete appuyee
+    key: str
+    time: float
+
+
+class KeyView(Sequence):
+    # vue en lecture seule des touches d'un RingBuffer de KeyEvent, sans copie
+    def __init__(self, events: RingBuffer):
+        self.__events = events
+
+    def __len__(self) -> int:
+        return len(self.__events)
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return [event.key for event in self.__events[index]]
+        return self.__events[index].key
+
+    def __iter__(self):
+        return (event.key for event in self.__events)
+
 
 class Controller:
-    def __init__(self, robot: GoPiGo3):
+    # nombre de touches gardees quand personne ne les consomme, par exemple pendant une tache qui ne lit pas la
+    # telecommande
+    BUFFER_CAPACITY = 32
+    # frequence de lecture de la telecommande par le thread de lecture, en Hz
+    READER_RATE = 200.0
+
+    def __init__(self, robot: GoPiGo3, router: Optional[CommandRouter] = None, capacity: int = BUFFER_CAPACITY,
+                 overflow_policy: OverflowPolicy = OverflowPolicy.DROP_OLDEST, clock: Optional[Clock] = None,
+                 bus_lock: Optional[threading.Lock] = None):
         self.robot = robot
+        # horloge qui date les touches
+        self.__clock = default_clock() if clock is None else clock
+        # la telecommande est lue sous ce verrou, par le thread de lecture ou par track()
+        self.bus_lock = threading.Lock() if bus_lock is None else bus_lock
         remote_control_port = 'AD1'
-        self.remote = robot.init_remote(port=remote_control_port)
+        with self.bus_lock:
+            self.remote = robot.init_remote(port=remote_control_port)
         self.keycode = ['', 'up', 'left', 'ok', 'right', 'down', '1', '2', '3', '4', '5', '6', '7', '8', '9', '*', '0',
                         '#']
         self.last_char = ''
-        self.__input_buffer = []
+        self.__events = RingBuffer(capacity, overflow_policy)
+        self.__buffer = KeyView(self.__events)
+        self.router = CommandRouter() if router is None else router
+        self.router.reset()
+        # mode lecture en arriere-plan (voir start_reader)
+        self.__pending_events = deque()
+        self.__reader = None
+        self.__reader_stop = threading.Event()
 
     @property
-    def buffer(self):
-        # retourne une copie du buffer pour empecher les modifications accidentelles
-        return self.__input_buffer[:]
+    def buffer(self) -> KeyView:
+        # vue en lecture seule des touches, sans copie
+        return self.__buffer
 
-    def track(self):
-        char_num: int = self.remote.read()
-        char = self.keycode[char_num]
-        if char != "" and char != self.last_char:
-            self.__input_buffer.append(char)
+    @property
+    def events(self) -> RingBuffer:
+        # les touches avec le moment ou elles ont ete appuyees, de la plus ancienne a la plus recente
+        return self.__events
+
+    @property
+    def dropped_count(self) -> int:
+        return self.__events.dropped_count
+
+    @property
+    def is_reading_in_background(self) -> bool:
+        return self.__reader is not None
+
+    def start_reader(self, rate: float = READER_RATE) -> None:
+        # Lit la telecommande dans un thread dedie, a sa propre frequence, pour que le tick ne paie plus la latence
+        # de lecture et qu'une touche plus courte qu'un tick ne soit pas perdue. Le thread depose les touches dans
+        # une deque (append et popleft sont atomiques, sans verrou) et track() les recupere une fois par tick. Seule
+        # la lecture de la telecommande prend bus_lock.
+        if rate <= 0:
+            raise ValueError('rate must be strictly positive')
+        if self.__reader is not None:
+            return
+
+        self.__reader_stop.clear()
+        self.__reader = threading.Thread(target=self.__read_loop, args=(1.0 / rate,), name='remote-reader',
+                                         daemon=True)
+        self.__reader.start()
+
+    def stop_reader(self) -> None:
+        if self.__reader is None:
+            return
+
+        self.__reader_stop.set()
+        self.__reader.join()
+        self.__reader = None
+        # les touches lues avant l'arret ne sont pas perdues
+        self.__drain()
+
+    def __read_loop(self, period: float) -> None:
+        stop = self.__reader_stop
+        pending = self.__pending_events
+        clock = self.__clock
+        # la cadence de lecture suit le temps reel, les touches sont datees sur l'horloge
+        next_read = perf_counter()
+        while not stop.is_set():
+            char = self.__read_char()
+            if char is not None:
+                pending.append(KeyEvent(char, clock.now()))
+
+            next_read += period
+            delay = next_read - perf_counter()
+            if delay < 0.0:
+                next_read = perf_counter()
+            elif stop.wait(delay):
+                break
+
+    def __read_char(self) -> Optional[str]:
+        # retourne la touche si elle vient d'etre appuyee, None si rien n'a change (anti-rebond)
+        with self.bus_lock:
+            code = self.remote.read()
+        char = self.keycode[code]
+        pressed = char != "" and char != self.last_char
         self.last_char = char
+        return char if pressed else None
+
+    def track(self):
+        if self.__reader is not None:
+            self.__drain()
+            return
+
+        char = self.__read_char()
+        if char is not None:
+            self.__add_event(KeyEvent(char, self.__clock.now()))
+
+    def __drain(self) -> None:
+        pending = self.__pending_events
+        while pending:
+            self.__add_event(pending.popleft())
+
+    def __add_event(self, event: KeyEvent) -> None:
+        events = self.__events
+        full = events.is_full
+        if events.push(event):
+            if full:
+                # la touche la plus ancienne a ete perdue, on rejoue le buffer dans le routeur
+                self.router.reset(self.__buffer)
+            else:
+                self.router.push(event.key)
 
     def clear_buffer(self):
-        self.__input_buffer = []
+        self.__events.clear()
+        self.router.reset()
 
     def next_char(self) -> Optional[str]:
-        if not self.__input_buffer:
+        event = self.__events.pop()
+        if event is None:
             return None
 
-        return self.__input_buffer.pop(0)
+        # le debut du buffer change, on rejoue les touches restantes dans le routeur
+        self.router.reset(self.__buffer)
+        return event.key
 
     def peek_last_char(self) -> Optional[str]:
-        if not self.__input_buffer:
-            return None
-
-        return self.__input_buffer[-1]
+        event = self.__events.peek_last()
+        return None if event is None else event.key
 
     def peek_char(self) -> Optional[str]:
-        if not self.__input_buffer:
-            return None
-
-        return self.__input_buffer[0]
+        event = self.__events.peek()
+        return None if event is None else event.key
 
     def current_char(self) -> Optional[str]:
         if self.last_char == self.peek_last_char():
@@ -152,8 +720,9 @@ class Direction(Enum):
 
 
 class Motor:
-    def __init__(self, robot: GoPiGo3):
+    def __init__(self, robot: GoPiGo3, actuators: Optional[ActuatorCache] = None):
         self.robot = robot
+        self.actuators = ActuatorCache() if actuators is None else actuators
         self.__current_direction = None
 
     @property
@@ -164,37 +733,151 @@ class Motor:
     def direction(self, direction: Optional[Direction]):
         self.__current_direction = direction
         if direction == Direction.FORWARD:
-            self.robot.forward()
+            send = self.robot.forward
         elif direction == Direction.BACKWARD:
-            self.robot.backward()
+            send = self.robot.backward
         elif direction == Direction.LEFT:
-            self.robot.left()
+            send = self.robot.left
         elif direction == Direction.RIGHT:
-            self.robot.right()
+            send = self.robot.right
         else:
-            self.robot.stop()
+            send = self.robot.stop
+        self.actuators.command('motor', direction, send)
 
 
 class RangeFinder:
     __MAX_ANGLE = 20
     __MIN_ANGLE = -20
+    # frequence d'echantillonnage du capteur par le thread d'echantillonnage, en Hz, et nombre d'echantillons du
+    # filtre median
+    SAMPLER_RATE = 30.0
+    SAMPLER_WINDOW = 5
 
-    def __init__(self, robot: GoPiGo3, bias: int = 0):
+    def __init__(self, robot: GoPiGo3, bias: int = 0, actuators: Optional[ActuatorCache] = None,
+                 clock: Optional[Clock] = None, bus_lock: Optional[threading.Lock] = None):
         self.robot = robot
-        self.__sensor = self.robot.init_distance_sensor()
-        self.__servo = self.robot.init_servo(port='SERVO2')
+        self.actuators = ActuatorCache() if actuators is None else actuators
+        # horloge qui date les echantillons, pour distance_age et les lectures perimees
+        self.__clock = default_clock() if clock is None else clock
+        # le capteur est lu sous ce verrou, par le thread d'echantillonnage ou par le thread de la machine a etats
+        self.bus_lock = threading.Lock() if bus_lock is None else bus_lock
+        with self.bus_lock:
+            self.__sensor = self.robot.init_distance_sensor()
+            self.__servo = self.robot.init_servo(port='SERVO2')
         self.__bias = bias
+        # mode echantillonnage en arriere-plan (voir start_sampler). Le thread publie la distance filtree et son
+        # heure de lecture dans un seul tuple, qu'une affectation remplace d'un coup: aucun verrou n'est necessaire
+        # pour la publier, seule la lecture du capteur prend bus_lock
+        self.__sampler = None
+        self.__sampler_stop = threading.Event()
+        self.__sampler_period = 0.0
+        self.__latest = None
+        self.__sample_count = 0
+        self.__sampler_start_time = 0.0
+        self.__stale_read_count = 0
+
+    @property
+    def is_sampling(self) -> bool:
+        return self.__sampler is not None
+
+    def start_sampler(self, rate: float = SAMPLER_RATE, window: int = SAMPLER_WINDOW) -> None:
+        # Lit le capteur dans un thread dedie, a sa propre frequence. distance_mm et distance_cm retournent alors
+        # la mediane des derniers echantillons sans attendre le capteur
+        if rate <= 0:
+            raise ValueError('rate must be strictly positive')
+        if self.__sampler is not None:
+            return
+
+        self.__sampler_stop.clear()
+        self.__sampler_period = 1.0 / rate
+        self.__sample_count = 0
+        self.__stale_read_count = 0
+        self.__sampler_start_time = perf_counter()
+        self.__sampler = threading.Thread(target=self.__sample_loop, args=(RingBuffer(window),),
+                                          name='range-finder-sampler', daemon=True)
+        self.__sampler.start()
+
+    def stop_sampler(self) -> None:
+        if self.__sampler is None:
+            return
+
+        self.__sampler_stop.set()
+        self.__sampler.join()
+        self.__sampler = None
+        self.__latest = None
+
+    def __sample_loop(self, samples: RingBuffer) -> None:
+        stop = self.__sampler_stop
+        period = self.__sampler_period
+        clock = self.__clock
+        # la cadence d'echantillonnage suit le temps reel
+        next_read = perf_counter()
+        while not stop.is_set():
+            with self.bus_lock:
+                dist = self.__sensor.read_mm()
+            samples.push(dist)
+            self.__latest = (median_low(samples), clock.now())
+            self.__sample_count += 1
+
+            next_read += period
+            delay = next_read - perf_counter()
+            if delay < 0.0:
+                next_read = perf_counter()
+            elif stop.wait(delay):
+                break
+
+    @property
+    def sample_count(self) -> int:
+        return self.__sample_count
+
+    @property
+    def sample_rate(self) -> float:
+        # frequence d'echantillonnage mesuree depuis start_sampler(), en Hz
+        if self.__sampler is None:
+            return 0.0
+        elapsed = perf_counter() - self.__sampler_start_time
+        return self.__sample_count / elapsed if elapsed > 0.0 else 0.0
+
+    @property
+    def stale_read_count(self) -> int:
+        # nombre de lectures qui ont retourne un echantillon plus vieux que deux periodes d'echantillonnage
+        return self.__stale_read_count
+
+    @property
+    def distance_age(self) -> Optional[float]:
+        # age en secondes de la distance retournee par le mode echantillonnage, None sans echantillon
+        latest = self.__latest
+        if latest is None:
+            return None
+        return self.__clock.now() - latest[1]
+
+    def __read_mm(self) -> float:
+        latest = self.__latest
+        if latest is None:
+            # pas encore d'echantillon (ou pas de thread): on lit le capteur directement
+            with self.bus_lock:
+                return self.__sensor.read_mm()
+
+        dist, read_time = latest
+        if self.__clock.now() - read_time > 2.0 * self.__sampler_period:
+            self.__stale_read_count += 1
+        return dist
 
     @property
     def distance_mm(self):
-        dist = self.__sensor.read_mm()
+        dist = self.__read_mm()
         if dist > 2300:
             return None
         return dist
 
     @property
     def distance_cm(self):
-        dist = self.__sensor.read()
+        if self.__sampler is None:
+            with self.bus_lock:
+                dist = self.__sensor.read()
+        else:
+            # meme conversion que EasyDistanceSensor.read()
+            dist = self.__read_mm() // 10
         if dist > 230:
             return None
         return dist
@@ -222,7 +905,8 @@ class RangeFinder:
         self.__update_pos()
 
     def __update_pos(self):
-        self.__servo.rotate_servo(self.__raw_angle)
+        raw_angle = self.__raw_angle
+        self.actuators.command('servo', raw_angle, self.__servo.rotate_servo, raw_angle)
 
     @property
     def __raw_angle(self):
@@ -233,7 +917,31 @@ class RangeFinder:
 
 
 class Robot:
-    def __init__(self):
+    # ordre dans lequel le scheduler traque les sous-systemes a chaque tick
+    CONTROLLER_PRIORITY = 0
+    BLINKER_PRIORITY = 10
+    TASK_PRIORITY = 20
+
+    # Threads qui parlent au GoPiGo3: le thread de la machine a etats (track, lectures directes, envois sans
+    # executeur), et selon les options le thread de lecture de la telecommande, le thread d'echantillonnage du
+    # capteur de distance et le thread d'entrees/sorties des actionneurs. Tous passent par le meme bus_lock, un
+    # seul acces au bus a la fois. Le GoPiGo3 est en plus construit avec use_mutex=True, qui protege les capteurs
+    # I2C des autres processus.
+    def __init__(self, threaded_input: bool = False, sampled_distance: bool = False, threaded_output: bool = False,
+                 backend: Optional[Callable[[], GoPiGo3]] = None):
+        self.__scheduler = Scheduler()
+        # construit le GoPiGo3, par exemple un SimulatedGoPiGo3 pour executer le robot sans materiel
+        self.__backend = (lambda: GoPiGo3(use_mutex=True)) if backend is None else backend
+        self.__bus_lock = threading.Lock()
+        self.__command_router = CommandRouter()
+        self.__actuators = ActuatorCache(bus_lock=self.__bus_lock)
+        # si vrai, la telecommande est lue par un thread dedie plutot qu'a chaque tick
+        self.__threaded_input = threaded_input
+        # si vrai, le capteur de distance est echantillonne par un thread dedie
+        self.__sampled_distance = sampled_distance
+        # si vrai, les commandes des actionneurs sont envoyees par un thread d'entrees/sorties dedie
+        self.__threaded_output = threaded_output
+        self.hardware_executor = None
         self.robot = None
         self.led_blinkers = None
         self.eye_blinkers = None
@@ -242,21 +950,40 @@ class Robot:
         self.range_finder = None
         self.__integrity = False
 
+    @property
+    def scheduler(self) -> Scheduler:
+        return self.__scheduler
+
+    @property
+    def command_router(self) -> CommandRouter:
+        return self.__command_router
+
+    @property
+    def actuators(self) -> ActuatorCache:
+        return self.__actuators
+
+    @property
+    def bus_lock(self) -> threading.Lock:
+        return self.__bus_lock
+
     def track(self) -> None:
-        if self.__integrity:
-            self.controller.track()
-        self.eye_blinkers.track()
-        self.led_blinkers.track()
+        self.__scheduler.tick()
 
     def initialize(self):
         try:
             if self.robot is None:
-                self.robot = GoPiGo3()
+                self.robot = self.__backend()
 
                 if self.robot is not None:
-                    self.led_blinkers = LedBlinkers(self.robot)
-                    self.eye_blinkers = EyeBlinkers(self.robot)
-                    self.motor = Motor(self.robot)
+                    if self.__threaded_output:
+                        self.hardware_executor = HardwareExecutor(self.robot, bus_lock=self.__bus_lock)
+                        self.__actuators.executor = self.hardware_executor
+                        self.hardware_executor.start()
+                    self.led_blinkers = LedBlinkers(self.robot, self.__actuators)
+                    self.eye_blinkers = EyeBlinkers(self.robot, self.__actuators)
+                    for blinker in self.eye_blinkers.blinkers + self.led_blinkers.blinkers:
+                        self.__scheduler.register(blinker, Robot.BLINKER_PRIORITY)
+                    self.motor = Motor(self.robot, self.__actuators)
                     self.reset_actuator()
                     return True
                 else:
@@ -267,13 +994,19 @@ class Robot:
     def check_integrity(self):
         try:
             if self.controller is None:
-                self.controller = Controller(self.robot)
+                self.controller = Controller(self.robot, self.__command_router, bus_lock=self.__bus_lock)
 
             if self.range_finder is None:
-                self.range_finder = RangeFinder(self.robot)
+                self.range_finder = RangeFinder(self.robot, actuators=self.__actuators, bus_lock=self.__bus_lock)
 
             self.__integrity = self.range_finder.check_integrity(
             ) and self.controller.check_integrity()
+            if self.__integrity and self.__sampled_distance:
+                self.range_finder.start_sampler()
+            if self.__integrity and not self.__scheduler.is_registered(self.controller.track):
+                self.__scheduler.register(self.controller.track, Robot.CONTROLLER_PRIORITY)
+                if self.__threaded_input:
+                    self.controller.start_reader()
             return self.__integrity
         except:
             return False
@@ -309,6 +1042,10 @@ class Robot:
         else:
             return 3000
 
+    @property
+    def distance_age(self) -> Optional[float]:
+        return self.range_finder.distance_age
+
     def get_next_controller_input(self):
         return self.controller.next_char()
 
@@ -346,6 +1083,12 @@ class Robot:
         self.eye_blinkers.blink(side, total_duration=total_duration, cycle_duration=cycle_duration,
                                 n_cycles=n_cycles, percent_on=percent_on, begin_on=begin_on, end_off=end_off)
 
+    def play_eye_pattern(self, side: Side, pattern: ColorPattern) -> None:
+        self.eye_blinkers.play(side, pattern)
+
+    def stop_eye_pattern(self, side: Side = Side.BOTH) -> None:
+        self.eye_blinkers.stop_pattern(side)
+
     def blink_led(self, side: Side, *, total_duration: Optional[Union[float, int]] = None,
                   cycle_duration: Optional[Union[float, int]] = None, n_cycles: Optional[int] = None,
                   percent_on: Union[float, int] = 0.5, begin_on: bool = True, end_off: bool = True) -> None:
@@ -364,13 +1107,24 @@ class Robot:
     def shut_down(self):
         self.reset_actuator()
         self.range_finder_angle = 0
+        if self.range_finder is not None:
+            self.range_finder.stop_sampler()
+        if self.controller is not None:
+            self.controller.stop_reader()
+            if self.__scheduler.is_registered(self.controller.track):
+                self.__scheduler.unregister(self.controller.track)
         self.controller = None
         self.range_finder = None
+        if self.hardware_executor is not None:
+            # les dernieres commandes (arret des moteurs) partent avant l'arret du thread
+            self.__actuators.executor = None
+            self.hardware_executor.stop()
+            self.hardware_executor = None
         # On "éteint" le robot
         del self
 
     @property
-    def controller_buffer(self) -> List:
+    def controller_buffer(self) -> Sequence:
         return self.controller.buffer
 
     def controller_clear_buffer(self) -> None:
@@ -388,6 +1142,10 @@ class Robot:
     def controller_current_char(self) -> Optional[str]:
         return self.controller.current_char()
 
+    def controller_has_command(self) -> bool:
+        # vrai si "ok" a ete appuye depuis le dernier vidage du buffer
+        return self.__command_router.is_complete
+
     @property
     def range_finder_angle(self) -> int:
         return self.range_finder.angle
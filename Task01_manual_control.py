@@ -2,7 +2,7 @@ from lib.blinker import Side
 from lib.state import MonitoredState
 from lib.transition import ConditionalTransition
 from lib.condition import StateValueCondition
-from lib.finite_state_machine import FiniteStateMachine
+from lib.compiled_finite_state_machine import CompiledFiniteStateMachine
 from robot_state import RobotState
 from lib.layout import Layout
 from Robot import Robot, Direction
@@ -16,11 +16,13 @@ class ManualControlState(RobotState):
         super().__init__(robot)
         self.__robot = robot
         self.__manual_control = ManualControl(robot)
-        self.add_in_state_action(lambda: self.__manual_control.track())
+        robot.scheduler.register(self.__manual_control, Robot.TASK_PRIORITY, suspended=True)
+        self.add_entering_action(lambda: robot.scheduler.resume(self.__manual_control))
+        self.add_exiting_action(lambda: robot.scheduler.suspend(self.__manual_control))
         self.add_exiting_action(self.__stop)
 
 
-class ManualControl(FiniteStateMachine):
+class ManualControl(CompiledFiniteStateMachine):
     def __init__(self, robot: Robot):
         self.robot = robot
         forward_state, backward_state, rotate_left_state, rotate_right_state, stop_state = [
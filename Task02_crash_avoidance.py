@@ -1,10 +1,14 @@
+from functools import lru_cache
+from typing import Callable
+
 from lib.blinker import Side
 from lib.state import MonitoredState
 from lib.transition import ConditionalTransition
 from lib.condition import StateValueCondition, StateEntryDurationCondition
-from lib.finite_state_machine import FiniteStateMachine
+from lib.compiled_finite_state_machine import CompiledFiniteStateMachine
 from robot_state import RobotState
 from lib.layout import Layout
+from lib.layout_spec import LayoutSpec, MachineInstance, current_instance
 from Robot import Robot, Direction
 
 
@@ -14,77 +18,107 @@ class CrashAvoidanceState(RobotState):
         self.__robot = robot
         super().__init__(robot)
         self.__crash_avoidance = CrashAvoidance(robot)
-        self.add_in_state_action(lambda: self.__crash_avoidance.track())
+        robot.scheduler.register(self.__crash_avoidance, Robot.TASK_PRIORITY, suspended=True)
+        self.add_entering_action(lambda: robot.scheduler.resume(self.__crash_avoidance))
+        self.add_exiting_action(lambda: robot.scheduler.suspend(self.__crash_avoidance))
         self.add_exiting_action(self.STOP)
 
     def STOP(self):
         self.__robot.direction = None
 
 
-class CrashAvoidance(FiniteStateMachine):
-    __THRESHOLD_CM = 30
+def build_crash_avoidance_layout(robot_of: Callable[[], Robot]) -> Layout:
+    # robot_of donne le robot commande par les actions: toujours le meme pour CrashAvoidance, celui de l'instance
+    # en cours pour crash_avoidance_spec()
+    peek_right_state, peek_left_state, forward_state, rotate_right_state = [
+        MonitoredState() for _ in range(4)]
 
-    def __init__(self, robot: Robot):
-        self.__initialize = False
-        self.robot = robot
-        peek_right_state, peek_left_state, forward_state, rotate_right_state = [
-            MonitoredState() for _ in range(4)]
+    def forward():
+        robot_of().movement_direction = Direction.FORWARD
 
-        def forward():
-            robot.movement_direction = Direction.FORWARD
+    def rotate_right():
+        robot_of().movement_direction = Direction.RIGHT
 
-        def rotate_right():
-            robot.movement_direction = Direction.RIGHT
+    def peek_right():
+        robot_of().range_finder_angle = 50
 
-        def peek_right():
-            robot.range_finder_angle = 50
+    def peek_left():
+        robot_of().range_finder_angle = -50
 
-        def peek_left():
-            robot.range_finder_angle = -50
+    def peek_forward():
+        robot_of().range_finder_angle = 0
 
-        def peek_forward():
-            robot.range_finder_angle = 0
+    peek_left_state.add_in_state_action(peek_left)
+    peek_right_state.add_in_state_action(peek_right)
 
-        peek_left_state.add_in_state_action(peek_left)
-        peek_right_state.add_in_state_action(peek_right)
+    cond = StateEntryDurationCondition(3.0, peek_left_state)
+    transition = ConditionalTransition(peek_right_state, cond)
+    peek_left_state.add_transition(transition)
 
-        cond = StateEntryDurationCondition(3.0, peek_left_state)
-        transition = ConditionalTransition(peek_right_state, cond)
-        peek_left_state.add_transition(transition)
+    cond = StateEntryDurationCondition(3.0, peek_right_state)
+    transition = ConditionalTransition(forward_state, cond)
+    peek_right_state.add_transition(transition)
 
-        cond = StateEntryDurationCondition(3.0, peek_right_state)
-        transition = ConditionalTransition(forward_state, cond)
-        peek_right_state.add_transition(transition)
+    forward_state.add_in_state_action(forward)
+    forward_state.add_in_state_action(peek_forward)
+    rotate_right_state.add_in_state_action(rotate_right)
+    rotate_right_state.add_in_state_action(peek_forward)
 
-        forward_state.add_in_state_action(forward)
-        forward_state.add_in_state_action(peek_forward)
-        rotate_right_state.add_in_state_action(rotate_right)
-        rotate_right_state.add_in_state_action(peek_forward)
+    rotate_right_state.add_entering_action(
+        lambda: robot_of().turn_eye_on(Side.BOTH))
+    rotate_right_state.add_exiting_action(
+        lambda: robot_of().turn_eye_off(Side.BOTH))
 
-        rotate_right_state.add_entering_action(
-            lambda: self.robot.turn_eye_on(Side.BOTH))
-        rotate_right_state.add_exiting_action(
-            lambda: self.robot.turn_eye_off(Side.BOTH))
+    in_range_cond = StateValueCondition(False, forward_state)
+    out_of_range_cond = StateValueCondition(True, rotate_right_state)
 
-        in_range_cond = StateValueCondition(False, forward_state)
-        out_of_range_cond = StateValueCondition(True, rotate_right_state)
+    transiton = ConditionalTransition(forward_state, out_of_range_cond)
+    rotate_right_state.add_transition(transiton)
 
-        transiton = ConditionalTransition(forward_state, out_of_range_cond)
-        rotate_right_state.add_transition(transiton)
+    transiton = ConditionalTransition(rotate_right_state, in_range_cond)
+    forward_state.add_transition(transiton)
 
-        transiton = ConditionalTransition(rotate_right_state, in_range_cond)
-        forward_state.add_transition(transiton)
+    layout = Layout()
+    layout.add_states(
+        {forward_state, rotate_right_state, peek_left_state, peek_right_state})
+    layout.initial_state = peek_left_state
+    return layout
 
-        self.__layout = Layout()
-        self.__layout.add_states(
-            {forward_state, rotate_right_state, peek_left_state, peek_right_state})
-        self.__layout.initial_state = peek_left_state
 
+class CrashAvoidance(CompiledFiniteStateMachine):
+    THRESHOLD_CM = 30
+
+    def __init__(self, robot: Robot):
+        self.__initialize = False
+        self.robot = robot
+        self.__layout = build_crash_avoidance_layout(lambda: robot)
         super().__init__(self.__layout, uninitialized=True)
 
+    @property
+    def has_pending_work(self):
+        # la sous-machine est initialisee a son premier tick
+        return not self.__initialize or super().has_pending_work
+
     def track(self):
         if not self.__initialize:
             self.reset()
             self.__initialize = True
-        self.current_applicative_state.custom_value = self.robot.distance_cm >= CrashAvoidance.__THRESHOLD_CM
+        self.current_applicative_state.custom_value = self.robot.distance_cm >= CrashAvoidance.THRESHOLD_CM
         super().track()
+
+
+@lru_cache(maxsize=None)
+def crash_avoidance_spec() -> LayoutSpec:
+    # Une seule copie du layout pour tous les robots d'une simulation: chaque robot n'a qu'une MachineInstance dont
+    # le contexte est le robot, creee par crash_avoidance_instance()
+    return LayoutSpec(build_crash_avoidance_layout(lambda: current_instance().context))
+
+
+def crash_avoidance_instance(robot: Robot) -> MachineInstance:
+    return crash_avoidance_spec().instantiate(robot)
+
+
+def track_crash_avoidance(instance: MachineInstance) -> bool:
+    # equivalent de CrashAvoidance.track() pour une instance
+    instance.custom_values[instance.state_id] = instance.context.distance_cm >= CrashAvoidance.THRESHOLD_CM
+    return instance.track()
@@ -9,8 +9,8 @@ from lib.blinker import Side
 from Task01_manual_control import ManualControlState
 
 class C64Layout(Layout):
-    def __init__(self):
-        self.__robot = Robot()
+    def __init__(self, robot: Optional[Robot] = None):
+        self.__robot = Robot() if robot is None else robot
 
         # etat d'echec
         instantiation_failed = ActionState()
@@ -97,25 +97,31 @@ class C64Layout(Layout):
 
         condition = StateEntryDurationCondition(2.0, home)
 
+        # Le routeur publie dans home.custom_value l'etat cible de la commande entree avant "ok". Les transitions de
+        # home sont des StateValueCondition sur cette valeur, resolues ensemble par une seule recherche dans un dict,
+        # donc ajouter des taches ne ralentit pas le tick de home. Une commande inconnue ramene a home.
+        router = self.__robot.command_router
+        router.default_target = home
+        router.bind(home)
+
         for i, tache in enumerate(taches):
-            cond = ControllerCondition(self.__robot, str(i + 1))
-            transition = ActionTransition(tache, cond)
+            router.register(str(i + 1), tache)
+            transition = ActionTransition(tache, StateValueCondition(tache, home))
             transition.add_transition_action(self.__robot.controller_clear_buffer)
 
             home.add_transition(transition)
 
-            cond = ControllerCondition(self.__robot, None)
+            cond = ControllerCondition(self.__robot)
             transition = ActionTransition(home, cond)
             transition.add_transition_action(self.__robot.controller_clear_buffer)
             tache.add_transition(transition)
 
-        cond = ControllerCondition(self.__robot, "#")
-        transition = ActionTransition(shut_down_robot, cond)
+        router.register("#", shut_down_robot)
+        transition = ActionTransition(shut_down_robot, StateValueCondition(shut_down_robot, home))
         transition.add_transition_action(self.__robot.controller_clear_buffer)
         home.add_transition(transition)
 
-        cond = ControllerCondition(self.__robot, None)
-        transition = ActionTransition(home, cond)
+        transition = ActionTransition(home, StateValueCondition(home, home))
         transition.add_transition_action(self.__robot.controller_clear_buffer)
         home.add_transition(transition)
 
@@ -130,24 +136,16 @@ class C64Layout(Layout):
         self.add_states({robot_instantiation, instantiation_failed, robot_integrity, end, integrity_failed, integrity_succeeded, home})
         self.initial_state = robot_instantiation
 
+    @property
+    def robot(self) -> Robot:
+        return self.__robot
+
 
 class ControllerCondition(Condition):
-    def __init__(self, robot: Robot, texte: Optional[str], inverse: bool = False) -> None:
+    # vraie quand "ok" a ete appuye, peu importe la commande entree
+    def __init__(self, robot: Robot, inverse: bool = False) -> None:
         self.__robot = robot
-        self.__texte = texte
         super().__init__(inverse)
 
     def compare(self) -> bool:
-        if self.__robot.controller_peek_last_char() == "ok":
-            buffer = self.__robot.controller_buffer[:-1]
-            if self.__texte is None:
-                return True
-            else:
-                if ''.join(buffer) == self.__texte:
-                    self.__robot.controller_clear_buffer()
-                    return True
-                else:
-                    return False
-        else:
-            return False
-
+        return self.__robot.controller_has_command()
@@ -0,0 +1,281 @@
+import math
+import random
+from typing import Callable, Dict, List, Optional, Sequence, Tuple
+
+from lib.clock import Clock, default_clock
+
+# touches de la telecommande, dans l'ordre des codes retournes par read() (voir Controller.keycode)
+KEYCODE = ['', 'up', 'left', 'ok', 'right', 'down', '1', '2', '3', '4', '5', '6', '7', '8', '9', '*', '0', '#']
+
+# un champ de distance donne la distance en mm jusqu'au premier obstacle, a partir de la position (x, y) en cm du
+# robot et de la direction de visee du capteur en radians
+DistanceField = Callable[[float, float, float], float]
+
+
+class LatencyModel:
+    # Duree simulee d'un appel au bus SPI/I2C: latency secondes, plus un bruit uniforme de +/- jitter secondes. La
+    # duree est attendue sur l'horloge donnee, donc une VirtualClock avance du temps de bus au lieu d'attendre.
+    def __init__(self, latency: float = 0.0, jitter: float = 0.0, seed: Optional[int] = None,
+                 clock: Optional[Clock] = None):
+        if latency < 0.0 or jitter < 0.0:
+            raise ValueError('latency and jitter must be positive')
+
+        self.latency = latency
+        self.jitter = jitter
+        self.clock = default_clock() if clock is None else clock
+        self.__random = random.Random(seed)
+        self.call_count = 0
+        self.total_delay = 0.0
+
+    def delay(self) -> None:
+        self.call_count += 1
+        if self.latency == 0.0 and self.jitter == 0.0:
+            return
+
+        duration = max(0.0, self.latency + self.__random.uniform(-self.jitter, self.jitter))
+        self.total_delay += duration
+        self.clock.sleep(duration)
+
+
+def wall_field(distance_cm: float = 100.0) -> DistanceField:
+    # un mur perpendiculaire a l'axe x, a distance_cm devant la position de depart du robot
+    def field(x: float, y: float, heading: float) -> float:
+        cos_heading = math.cos(heading)
+        if cos_heading <= 1e-6:
+            return math.inf
+        return max(0.0, (distance_cm - x) / cos_heading) * 10.0
+
+    return field
+
+
+class SimulatedRemote:
+    # Telecommande infrarouge scriptee. Le script est une suite de (temps, touche, duree): la touche est tenue a
+    # partir du temps donne (en secondes depuis la creation de la telecommande) pendant la duree donnee. press()
+    # ajoute une touche pendant l'execution.
+    DEFAULT_DURATION = 0.1
+
+    def __init__(self, robot: 'SimulatedGoPiGo3', script: Sequence[Tuple[float, str, float]] = ()):
+        self.__robot = robot
+        self.__start = robot.clock.now()
+        self.__presses: List[Tuple[float, float, int]] = []
+        for time_point, key, duration in script:
+            self.__add(self.__start + time_point, key, duration)
+
+    def __add(self, start: float, key: str, duration: float) -> None:
+        if key not in KEYCODE or key == '':
+            raise ValueError('unknown key: {}'.format(key))
+        self.__presses.append((start, start + duration, KEYCODE.index(key)))
+        self.__presses.sort()
+
+    def press(self, key: str, duration: float = DEFAULT_DURATION, delay: float = 0.0) -> None:
+        self.__add(self.__robot.clock.now() + delay, key, duration)
+
+    def read(self) -> int:
+        self.__robot.bus()
+        now = self.__robot.clock.now()
+        presses = self.__presses
+        # les appuis termines sont oublies
+        while presses and presses[0][1] <= now:
+            presses.pop(0)
+        for start, end, code in presses:
+            if start > now:
+                break
+            if now < end:
+                return code
+        return 0
+
+
+class SimulatedDistanceSensor:
+    # capteur de distance qui lit le champ de distance du simulateur dans la direction du servo
+    MAX_RANGE_MM = 3000
+
+    def __init__(self, robot: 'SimulatedGoPiGo3'):
+        self.__robot = robot
+
+    def read_mm(self) -> int:
+        self.__robot.bus()
+        distance = self.__robot.sensed_distance_mm()
+        return int(min(distance, SimulatedDistanceSensor.MAX_RANGE_MM))
+
+    def read(self) -> int:
+        return self.read_mm() // 10
+
+
+class SimulatedServo:
+    def __init__(self, robot: 'SimulatedGoPiGo3'):
+        self.__robot = robot
+        self.angle = 90
+
+    def rotate_servo(self, angle: int) -> None:
+        self.__robot.bus()
+        self.angle = angle
+
+
+class SimulatedGoPiGo3:
+    # Remplacant d'EasyGoPiGo3 pour executer et mesurer C64Project sans robot. Chaque appel qui passerait par le
+    # bus attend le modele de latence, les deplacements font avancer une position simulee sur l'horloge, et le
+    # capteur de distance lit un champ de distance a partir de cette position.
+    SPEED_CM_S = 20.0
+    TURN_RATE_RAD_S = math.pi / 2
+
+    def __init__(self, latency: Optional[LatencyModel] = None, remote_script: Sequence[Tuple[float, str, float]] = (),
+                 distance_field: Optional[DistanceField] = None, clock: Optional[Clock] = None,
+                 use_mutex: bool = False):
+        self.clock = default_clock() if clock is None else clock
+        # accepte comme dans EasyGoPiGo3; le simulateur n'a pas de bus partage avec d'autres processus
+        self.use_mutex = use_mutex
+        self.latency = LatencyModel(clock=self.clock) if latency is None else latency
+        self.distance_field = wall_field() if distance_field is None else distance_field
+        self.remote_script = tuple(remote_script)
+        self.x = 0.0
+        self.y = 0.0
+        self.heading = 0.0
+        self.direction = 'stop'
+        self.leds = {'left': False, 'right': False}
+        self.eyes = {'left': None, 'right': None}
+        self.eye_colors = {'left': (0, 255, 255), 'right': (0, 255, 255)}
+        self.call_counts: Dict[str, int] = {}
+        self.servo = None
+        self.__last_update = self.clock.now()
+
+    def bus(self) -> None:
+        self.latency.delay()
+
+    def __call(self, name: str) -> None:
+        self.__update_pose()
+        self.call_counts[name] = self.call_counts.get(name, 0) + 1
+        self.bus()
+
+    def __update_pose(self) -> None:
+        now = self.clock.now()
+        elapsed = now - self.__last_update
+        self.__last_update = now
+        if elapsed <= 0.0:
+            return
+
+        if self.direction == 'forward' or self.direction == 'backward':
+            step = SimulatedGoPiGo3.SPEED_CM_S * elapsed * (1.0 if self.direction == 'forward' else -1.0)
+            self.x += step * math.cos(self.heading)
+            self.y += step * math.sin(self.heading)
+        elif self.direction == 'left':
+            self.heading += SimulatedGoPiGo3.TURN_RATE_RAD_S * elapsed
+        elif self.direction == 'right':
+            self.heading -= SimulatedGoPiGo3.TURN_RATE_RAD_S * elapsed
+
+    def sensed_distance_mm(self) -> float:
+        self.__update_pose()
+        servo_angle = 90 if self.servo is None else self.servo.angle
+        return self.distance_field(self.x, self.y, self.heading + math.radians(servo_angle - 90))
+
+    # moteurs
+    def __drive(self, direction: str) -> None:
+        self.__call(direction)
+        self.direction = direction
+
+    def forward(self) -> None:
+        self.__drive('forward')
+
+    def backward(self) -> None:
+        self.__drive('backward')
+
+    def left(self) -> None:
+        self.__drive('left')
+
+    def right(self) -> None:
+        self.__drive('right')
+
+    def stop(self) -> None:
+        self.__drive('stop')
+
+    # DELs
+    def led_on(self, side: str) -> None:
+        self.__call('led_on')
+        self.__set_leds(side, True)
+
+    def led_off(self, side: str) -> None:
+        self.__call('led_off')
+        self.__set_leds(side, False)
+
+    def __set_leds(self, side: str, on: bool) -> None:
+        for name in ('left', 'right'):
+            if side == name or side == 'both':
+                self.leds[name] = on
+
+    # yeux: la couleur n'est transmise qu'a l'ouverture, comme avec EasyGoPiGo3
+    def set_left_eye_color(self, color: Tuple[int, int, int]) -> None:
+        self.eye_colors['left'] = tuple(color)
+
+    def set_right_eye_color(self, color: Tuple[int, int, int]) -> None:
+        self.eye_colors['right'] = tuple(color)
+
+    def set_eye_color(self, color: Tuple[int, int, int]) -> None:
+        self.set_left_eye_color(color)
+        self.set_right_eye_color(color)
+
+    def open_left_eye(self) -> None:
+        self.__call('open_left_eye')
+        self.eyes['left'] = self.eye_colors['left']
+
+    def open_right_eye(self) -> None:
+        self.__call('open_right_eye')
+        self.eyes['right'] = self.eye_colors['right']
+
+    def open_eyes(self) -> None:
+        self.open_left_eye()
+        self.open_right_eye()
+
+    def close_left_eye(self) -> None:
+        self.__call('close_left_eye')
+        self.eyes['left'] = None
+
+    def close_right_eye(self) -> None:
+        self.__call('close_right_eye')
+        self.eyes['right'] = None
+
+    def close_eyes(self) -> None:
+        self.close_left_eye()
+        self.close_right_eye()
+
+    # peripheriques
+    def init_remote(self, port: str = 'AD1') -> SimulatedRemote:
+        return SimulatedRemote(self, self.remote_script)
+
+    def init_distance_sensor(self, port: str = 'I2C') -> SimulatedDistanceSensor:
+        return SimulatedDistanceSensor(self)
+
+    def init_servo(self, port: str = 'SERVO1') -> SimulatedServo:
+        self.servo = SimulatedServo(self)
+        return self.servo
+
+
+def main():
+    # Execute C64Project de bout en bout sur une horloge virtuelle avec une telecommande scriptee: entree dans la
+    # tache 2, retour a home, puis arret du robot. Affiche le temps reel d'execution et le trafic sur le bus.
+    import os
+    import time
+    from lib.clock import VirtualClock, set_default_clock
+
+    os.environ['GOPIGO3_BACKEND'] = 'simulator'
+
+    clock = VirtualClock()
+    set_default_clock(clock)
+    script = [(10.0, '2', 0.1), (10.5, 'ok', 0.1), (40.0, 'ok', 0.1), (45.0, '#', 0.1), (45.5, 'ok', 0.1)]
+    latency = LatencyModel(latency=0.0005, jitter=0.0002, seed=0, clock=clock)
+    simulator = SimulatedGoPiGo3(latency, script, clock=clock)
+
+    from Robot import Robot
+    from C64Projet import C64Project
+    robot = Robot(backend=lambda: simulator)
+    project = C64Project(robot)
+
+    start = time.perf_counter()
+    project.run(time_budget=60.0)
+    elapsed = time.perf_counter() - start
+    print('simulated {:.1f} s in {:.3f} s'.format(clock.now(), elapsed))
+    print('bus calls: {}, bus time: {:.3f} s'.format(simulator.latency.call_count, simulator.latency.total_delay))
+    print('actuator commands sent: {}, suppressed: {}'.format(robot.actuators.sent_count,
+                                                              robot.actuators.suppressed_count))
+
+
+if __name__ == '__main__':
+    main()
@@ -1,3 +1,6 @@
+from typing import Optional
+
+from lib.clock import Clock
 from state import MonitoredState
 from finite_state_machine import FiniteStateMachine
 from layout import Layout
@@ -6,7 +9,7 @@ from condition import StateEntryDurationCondition
 
 
 class TrafficLight(FiniteStateMachine):
-    def __init__(self):
+    def __init__(self, clock: Optional[Clock] = None):
         self.__G_TO_Y = 4.0
         self.__Y_TO_R = 1.0
         self.__R_TO_G = 5.0
@@ -30,7 +33,7 @@ class TrafficLight(FiniteStateMachine):
         layout.add_states({GREEN, YELLOW, RED})
         layout.initial_state = GREEN
 
-        super().__init__(layout)
+        super().__init__(layout, clock=clock)
 
 
 def main():
@@ -0,0 +1,318 @@
+import asyncio
+from collections import deque
+from typing import Any, Awaitable, Callable, Deque, Optional
+
+from lib.clock import Clock
+from lib.finite_state_machine import FiniteStateMachine
+from lib.operational_state import OperationalState
+from lib.layout import Layout
+from lib.state import State
+from lib.transition import Transition
+
+
+class AsyncFiniteStateMachine(FiniteStateMachine):
+    """
+    A finite state machine driven by an asyncio event loop.
+
+    track() and run() are coroutines. The actions of the states and transitions may be coroutine functions, which
+    are awaited in the same order as the synchronous actions would run, so a slow I/O action lets the other tasks of
+    the loop run instead of blocking them. Several machines run side by side with run_all(), and run() waits on the
+    loop's timers until the next deadline instead of spinning.
+
+    reset(), transit_to() and _transit_by() stay synchronous so that the existing callers keep working: the current
+    applicative state changes immediately, and the exiting, transiting and entering actions are queued and awaited
+    at the beginning of the next track().
+
+    Attributes:
+        __current_applicative_state (Optional[State]): The current applicative state of the state machine.
+        __pending_actions (Deque[Callable[[], Awaitable[None]]]): The actions queued by reset(), transit_to() and
+            _transit_by(), in execution order.
+        __loop (Optional[asyncio.AbstractEventLoop]): The event loop running run(), if any.
+        __async_wakeup (Optional[asyncio.Event]): Set by notify() to end a wait of run() early.
+    """
+    # __current_applicative_state: Optional[State]
+    # __pending_actions: Deque[Callable[[], Awaitable[None]]]
+    # __loop: Optional[asyncio.AbstractEventLoop]
+    # __async_wakeup: Optional[asyncio.Event]
+
+    def __init__(self, layout: Layout, uninitialized: bool = True, clock: Optional[Clock] = None,
+                 micro_steps: int = 1) -> None:
+        """
+        Initializes a new instance of the AsyncFiniteStateMachine class.
+
+        Args:
+            layout (Layout): The layout of the state machine.
+            uninitialized (bool, optional): Whether to leave the state machine uninitialized. Otherwise, the entering
+                action of the initial state runs at the first track(). Defaults to True.
+            clock (Clock, optional): The clock of the state machine. Defaults to the default clock.
+            micro_steps (int, optional): The maximum number of transitions taken in one tick (see
+                FiniteStateMachine.track()). Defaults to 1.
+        """
+        self.__current_applicative_state = None
+        self.__pending_actions = deque()
+        self.__loop = None
+        self.__async_wakeup = None
+        super().__init__(layout, uninitialized, clock, micro_steps)
+
+    @property
+    def current_applicative_state(self) -> Optional[State]:
+        """
+        Returns the current applicative state of the state machine.
+
+        Returns:
+            Optional[State]: The current applicative state, or None if the state machine was never reset.
+        """
+        return self.__current_applicative_state
+
+    @property
+    def has_pending_actions(self) -> bool:
+        """
+        Returns True if actions queued by reset(), transit_to() or _transit_by() wait for the next track().
+        """
+        return bool(self.__pending_actions)
+
+    @property
+    def is_quiescent(self) -> bool:
+        """
+        Returns True if no action is queued and the current state is quiescent, in which case track() does nothing.
+        """
+        state = self.__current_applicative_state
+        return not self.__pending_actions and state is not None and self._is_quiescent_state(state)
+
+    @property
+    def has_pending_work(self) -> bool:
+        """
+        Returns False if a tick would do nothing, True if actions are queued or the current state needs to be ticked.
+        """
+        if self.__pending_actions:
+            return True
+        operational_state = self.current_operational_state
+        if operational_state is OperationalState.UNINITIALIZED or operational_state is OperationalState.TERMINAL_REACHED:
+            return False
+        return not self._is_quiescent_state(self.__current_applicative_state)
+
+    def reset(self) -> None:
+        """
+        Sets the operational state to IDLE and the initial state as the current state. Its entering action runs at
+        the next track().
+        """
+        self._set_operational_state(OperationalState.IDLE)
+        self.__current_applicative_state = self.layout.initial_state
+        self.__pending_actions.append(self.__current_applicative_state._async_exec_entering_action)
+
+    def _transit_by(self, transition: Transition) -> None:
+        """
+        Makes the next state of the given transition the current state. The exiting, transiting and entering actions
+        run at the next track().
+
+        Args:
+            transition (Transition): The transition to use for transitioning to the next state.
+        """
+        if not isinstance(transition, Transition):
+            raise TypeError('transition must be of type Transition')
+
+        self.__pending_actions.append(self.__current_applicative_state._async_exec_exiting_action)
+        self.__pending_actions.append(transition._async_exec_transiting_action)
+        self.__current_applicative_state = transition.next_state
+        self.__pending_actions.append(self.__current_applicative_state._async_exec_entering_action)
+        self.notify()
+
+    def transit_to(self, state: State) -> None:
+        """
+        Makes the given state the current state. The exiting and entering actions run at the next track().
+
+        Args:
+            state (State): The state to transition to.
+        """
+        if not isinstance(state, State):
+            raise TypeError('state must be of type State')
+
+        self.__pending_actions.append(self.__current_applicative_state._async_exec_exiting_action)
+        self.__current_applicative_state = state
+        self.__pending_actions.append(state._async_exec_entering_action)
+        self.notify()
+
+    async def flush(self) -> None:
+        """
+        Awaits the actions queued by reset(), transit_to() and _transit_by(), in order.
+        """
+        pending_actions = self.__pending_actions
+        while pending_actions:
+            await pending_actions.popleft()()
+
+    async def track(self) -> bool:
+        """
+        Advances the state machine by one step and returns True if the state machine has not reached a terminal state,
+        and False otherwise. The queued actions run first, then the tick runs like FiniteStateMachine.track(),
+        including the run to completion when micro_steps is above 1.
+
+        Returns:
+            bool: True if the state machine has not reached a terminal state, and False otherwise.
+        """
+        if self.current_operational_state == OperationalState.UNINITIALIZED:
+            raise RuntimeError("The finite state machine is UNINITIALIZED. You cannot track an UNINITIALIZED state machine")
+
+        if self.__pending_actions:
+            await self.flush()
+
+        state = self.__current_applicative_state
+        if state.is_terminal:
+            self._set_operational_state(OperationalState.TERMINAL_REACHED)
+            return False
+        if state.is_quiescent:
+            return True
+
+        transition = state.is_transiting
+        if transition is None:
+            await state._async_exec_in_state_action()
+            return True
+
+        visited = {state}
+        remaining_steps = self.micro_steps
+        while True:
+            await state._async_exec_exiting_action()
+            await transition._async_exec_transiting_action()
+            state = self.__current_applicative_state = transition.next_state
+            await state._async_exec_entering_action()
+            if self.__pending_actions:
+                await self.flush()
+                state = self.__current_applicative_state
+
+            remaining_steps -= 1
+            if remaining_steps == 0 or state in visited or state.is_terminal or state.is_quiescent:
+                break
+            visited.add(state)
+            transition = state.is_transiting
+            if transition is None:
+                break
+
+        return True
+
+    async def run(self, reset: bool = True, time_budget: Optional[float] = None, tick_budget: Optional[int] = None,
+                  min_tick_rate: float = 50.0) -> None:
+        """
+        Runs the state machine until a terminal state is reached or the time or tick budget is exceeded.
+
+        A tick that changes the applicative state is followed by another tick right away. Otherwise, run() waits
+        until the next deadline of the current state, until notify() is called, or for at most 1 / min_tick_rate
+        seconds, whichever comes first, and the event loop runs the other tasks meanwhile.
+
+        Args:
+            reset (bool, optional): Whether to reset the state machine before running. Defaults to True.
+            time_budget (float, optional): The maximum time to run the state machine, in seconds. Defaults to None.
+            tick_budget (int, optional): The maximum number of ticks, or None for no limit. Defaults to None.
+            min_tick_rate (float, optional): The minimum number of ticks per second, so that polled inputs are still
+                read. Defaults to 50.0.
+
+        Raises:
+            ValueError: If a budget or the rate is out of range.
+        """
+        if not isinstance(reset, bool):
+            raise TypeError('reset must be of type bool')
+        if not isinstance(time_budget, (float, int)) and time_budget is not None:
+            raise TypeError('time_budget must be of type float')
+        if not isinstance(tick_budget, int) and tick_budget is not None:
+            raise TypeError('tick_budget must be of type int')
+        if tick_budget is not None and tick_budget <= 0:
+            raise ValueError('tick_budget must be strictly positive')
+        if not isinstance(min_tick_rate, (float, int)):
+            raise TypeError('min_tick_rate must be of type float')
+        if min_tick_rate <= 0:
+            raise ValueError('min_tick_rate must be strictly positive')
+
+        if reset:
+            self.reset()
+
+        self._set_operational_state(OperationalState.RUNNING)
+        self.__loop = asyncio.get_running_loop()
+        self.__async_wakeup = asyncio.Event()
+
+        clock = self.clock
+        wakeup = self.__async_wakeup
+        max_sleep = 1.0 / min_tick_rate
+        start_time = clock.now()
+        tick_count = 0
+
+        try:
+            while True:
+                previous_state = self.__current_applicative_state
+                if not await self.track():
+                    break
+                tick_count += 1
+
+                cur_time = clock.now()
+                if time_budget is not None and cur_time - start_time >= time_budget:
+                    self.stop()
+                    break
+                if tick_budget is not None and tick_count >= tick_budget:
+                    self.stop()
+                    break
+                if self.current_operational_state != OperationalState.RUNNING:
+                    break
+
+                if self.__current_applicative_state is previous_state and not self.__pending_actions:
+                    wake_time = cur_time + max_sleep
+                    deadline = self.next_deadline(cur_time)
+                    if deadline is not None and deadline < wake_time:
+                        wake_time = deadline
+                    if time_budget is not None and start_time + time_budget < wake_time:
+                        wake_time = start_time + time_budget
+                    await clock.async_sleep_until(wake_time, wakeup)
+                else:
+                    await asyncio.sleep(0)
+                wakeup.clear()
+        finally:
+            self.__loop = None
+            self.__async_wakeup = None
+
+    def notify(self) -> None:
+        """
+        Wakes up run() if it is waiting. Can be called from any thread.
+        """
+        super().notify()
+        loop, wakeup = self.__loop, self.__async_wakeup
+        if loop is not None and wakeup is not None:
+            loop.call_soon_threadsafe(wakeup.set)
+
+    def stop(self) -> None:
+        """
+        Stops the state machine if it is running, and wakes up run() so that it returns right away.
+        """
+        super().stop()
+        self.notify()
+
+
+async def run_all(*machines: AsyncFiniteStateMachine, **run_options) -> None:
+    """
+    Runs several asynchronous state machines on the current event loop until they all stop.
+
+    Args:
+        *machines (AsyncFiniteStateMachine): The state machines to run.
+        **run_options: The keyword arguments of AsyncFiniteStateMachine.run(), shared by every machine.
+    """
+    for machine in machines:
+        if not isinstance(machine, AsyncFiniteStateMachine):
+            raise TypeError('machines must be of type AsyncFiniteStateMachine')
+
+    await asyncio.gather(*(machine.run(**run_options) for machine in machines))
+
+
+def offload(action: Callable[[], Any]) -> Callable[[], Awaitable[Any]]:
+    """
+    Wraps a blocking action into a coroutine function that runs it in the default thread pool, so that an
+    AsyncFiniteStateMachine can await it without blocking the event loop. Useful for the I2C and servo calls of the
+    robot, which block for milliseconds.
+
+    Args:
+        action (Callable[[], Any]): The blocking action.
+
+    Returns:
+        Callable[[], Awaitable[Any]]: A coroutine function running the action in a worker thread.
+    """
+    if not callable(action):
+        raise TypeError('action must be callable')
+
+    async def offloaded() -> Any:
+        return await asyncio.get_running_loop().run_in_executor(None, action)
+
+    return offloaded
@@ -0,0 +1,372 @@
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+import numpy as np
+
+from lib.clock import Clock, default_clock
+from lib.condition import Condition, AlwaysTrueCondition, StateValueCondition, StateEntryDurationCondition, \
+    StateEntryCountCondition, AllConditions, AnyConditions, NoneConditions
+from lib.layout import Layout
+from lib.state import State
+from lib.transition import ConditionalTransition
+
+# Evaluates a condition for the instances whose indices are given, and returns one boolean per index.
+_Evaluator = Callable[[np.ndarray], np.ndarray]
+
+
+class BatchFiniteStateMachine:
+    """
+    Runs many independent instances of one Layout, advancing all of them in one vectorized step.
+
+    The current state, the entry times, the entry counts and the custom values of every instance are kept in NumPy
+    arrays. Only the built-in conditions are supported: AlwaysTrueCondition, StateValueCondition,
+    StateEntryDurationCondition, StateEntryCountCondition and the All, Any and None compositions of those. They are
+    evaluated with the same short-circuit rules as the interpreted FiniteStateMachine. The actions of the states and
+    transitions are not run: the instances are driven through their custom values (see set_custom_value()).
+
+    Attributes:
+        __states (Tuple[State, ...]): The states, indexed by state id.
+        __state_ids (Dict[State, int]): The state id of every state.
+        __instance_count (int): The number of instances.
+        __clock (Clock): The clock shared by every instance.
+        __current (np.ndarray): The current state id of every instance.
+        __entry_time (np.ndarray): The last entry time of every instance, per state.
+        __exit_time (np.ndarray): The last exit time of every instance, per state.
+        __entry_count (np.ndarray): The entry count of every instance, per state.
+        __custom_value (np.ndarray): The custom value code of every instance, per state.
+        __value_codes (Dict[Any, int]): The code of every custom value seen so far.
+        __values (List[Any]): The custom values, indexed by code.
+        __durations (Dict[StateEntryDurationCondition, np.ndarray]): The per-instance durations that override the
+            duration of a condition.
+        __transitions (Tuple[Tuple[Tuple[_Evaluator, int], ...], ...]): The (evaluator, next state id) pairs of
+            every state, in evaluation order.
+    """
+
+    def __init__(self, layout: Layout, instance_count: int, clock: Optional[Clock] = None) -> None:
+        """
+        Compiles the layout and resets every instance to its initial state.
+
+        Args:
+            layout (Layout): The layout shared by every instance.
+            instance_count (int): The number of instances.
+            clock (Clock, optional): The clock shared by every instance. Defaults to the default clock.
+
+        Raises:
+            TypeError: If an argument has the wrong type, or a transition or condition of the layout is not supported.
+            ValueError: If the layout has no initial state, instance_count is not strictly positive, or a condition
+                monitors a state outside of the layout.
+        """
+        if not isinstance(layout, Layout):
+            raise TypeError('layout must be of type Layout')
+        if not isinstance(instance_count, int):
+            raise TypeError('instance_count must be of type int')
+        if instance_count <= 0:
+            raise ValueError('instance_count must be strictly positive')
+        if not isinstance(clock, Clock) and clock is not None:
+            raise TypeError('clock must be of type Clock')
+        if layout.initial_state is None:
+            raise ValueError('the layout must have an initial state')
+
+        self.__states: Tuple[State, ...] = tuple(layout.traverse())
+        self.__state_ids: Dict[State, int] = {state: state_id for state_id, state in enumerate(self.__states)}
+        self.__initial_state_id = self.__state_ids[layout.initial_state]
+        self.__terminal = np.array([state.is_terminal for state in self.__states], dtype=bool)
+        self.__instance_count = instance_count
+        self.__clock = default_clock() if clock is None else clock
+
+        shape = (len(self.__states), instance_count)
+        self.__current = np.empty(instance_count, dtype=np.intp)
+        self.__entry_time = np.zeros(shape, dtype=np.float64)
+        self.__exit_time = np.zeros(shape, dtype=np.float64)
+        self.__entry_count = np.zeros(shape, dtype=np.int64)
+        self.__custom_value = np.zeros(shape, dtype=np.int64)
+        self.__value_codes: Dict[Any, int] = {None: 0}
+        self.__values: List[Any] = [None]
+        self.__durations: Dict[StateEntryDurationCondition, np.ndarray] = {}
+
+        self.__transitions = tuple(tuple((self.__compile_transition(transition), self.__state_ids[transition.next_state])
+                                         for transition in state.transitions)
+                                   for state in self.__states)
+        self.reset()
+
+    @property
+    def instance_count(self) -> int:
+        """
+        Returns the number of instances.
+        """
+        return self.__instance_count
+
+    @property
+    def states(self) -> Tuple[State, ...]:
+        """
+        Returns the states, indexed by state id.
+        """
+        return self.__states
+
+    @property
+    def clock(self) -> Clock:
+        """
+        Returns the clock shared by every instance.
+        """
+        return self.__clock
+
+    @property
+    def current_state_ids(self) -> np.ndarray:
+        """
+        Returns a read-only view of the current state id of every instance.
+        """
+        view = self.__current.view()
+        view.flags.writeable = False
+        return view
+
+    @property
+    def terminal_reached(self) -> np.ndarray:
+        """
+        Returns whether every instance is in a terminal state.
+        """
+        return self.__terminal[self.__current]
+
+    def state_id(self, state: State) -> int:
+        """
+        Returns the state id of the given state.
+
+        Args:
+            state (State): A state of the layout.
+
+        Returns:
+            int: The state id.
+
+        Raises:
+            ValueError: If the state is not part of the layout.
+        """
+        try:
+            return self.__state_ids[state]
+        except KeyError:
+            raise ValueError('state must be part of the layout') from None
+
+    def state_counts(self) -> np.ndarray:
+        """
+        Returns the number of instances in each state, indexed by state id.
+        """
+        return np.bincount(self.__current, minlength=len(self.__states))
+
+    def entry_count(self, state: State) -> np.ndarray:
+        """
+        Returns a copy of the entry count of the given state, per instance.
+        """
+        return self.__entry_count[self.state_id(state)].copy()
+
+    def last_entry_time(self, state: State) -> np.ndarray:
+        """
+        Returns a copy of the last entry time of the given state, per instance.
+        """
+        return self.__entry_time[self.state_id(state)].copy()
+
+    def last_exit_time(self, state: State) -> np.ndarray:
+        """
+        Returns a copy of the last exit time of the given state, per instance.
+        """
+        return self.__exit_time[self.state_id(state)].copy()
+
+    def custom_value(self, state: State) -> np.ndarray:
+        """
+        Returns the custom value of the given state, per instance.
+
+        Returns:
+            np.ndarray: An object array of the custom values.
+        """
+        values = np.empty(len(self.__values), dtype=object)
+        values[:] = self.__values
+        return values[self.__custom_value[self.state_id(state)]]
+
+    def set_custom_value(self, state: State, values: Any) -> None:
+        """
+        Sets the custom value of the given state, for every instance.
+
+        Args:
+            state (State): A state of the layout.
+            values (Any): Either one value shared by every instance, or an array-like of one value per instance.
+
+        Raises:
+            ValueError: If the number of values does not match the number of instances.
+        """
+        state_id = self.state_id(state)
+        if np.isscalar(values) or values is None:
+            self.__custom_value[state_id] = self.__code(values)
+            return
+
+        values = np.asarray(values)
+        if values.shape != (self.__instance_count,):
+            raise ValueError('values must hold one value per instance')
+        if values.dtype == bool:
+            self.__custom_value[state_id] = np.where(values, self.__code(True), self.__code(False))
+            return
+
+        uniques, inverse = np.unique(values, return_inverse=True)
+        codes = np.array([self.__code(value.item() if isinstance(value, np.generic) else value)
+                          for value in uniques], dtype=np.int64)
+        self.__custom_value[state_id] = codes[inverse.reshape(-1)]
+
+    def set_duration(self, condition: StateEntryDurationCondition, durations: Any) -> None:
+        """
+        Overrides the duration of a StateEntryDurationCondition of the layout, per instance.
+
+        Args:
+            condition (StateEntryDurationCondition): A condition of the layout.
+            durations (Any): Either one duration shared by every instance, or an array-like of one duration per
+                instance, in seconds.
+
+        Raises:
+            ValueError: If the condition is not part of the layout or the number of durations does not match the
+                number of instances.
+        """
+        if condition not in self.__durations:
+            raise ValueError('condition must be a StateEntryDurationCondition of the layout')
+
+        durations = np.broadcast_to(np.asarray(durations, dtype=np.float64), (self.__instance_count,))
+        self.__durations[condition][:] = durations
+
+    def reset(self) -> None:
+        """
+        Puts every instance back in the initial state, entered now. Entry counts and custom values are kept.
+        """
+        self.__current.fill(self.__initial_state_id)
+        self.__entry_time[self.__initial_state_id] = self.__clock.now()
+        self.__entry_count[self.__initial_state_id] += 1
+
+    def track(self) -> bool:
+        """
+        Advances every instance by one step. An instance takes the first transition of its current state whose
+        condition holds, evaluated against the values of the beginning of the step. The instances in a terminal
+        state do not move.
+
+        Returns:
+            bool: True if at least one instance has not reached a terminal state, and False otherwise.
+        """
+        current = self.__current
+        candidates = np.flatnonzero(~self.__terminal[current])
+        if candidates.size == 0:
+            return False
+
+        now = self.__clock.now()
+        sources = current[candidates]
+        moved_indices = []
+        moved_targets = []
+        for state_id, transitions in enumerate(self.__transitions):
+            if not transitions:
+                continue
+            remaining = candidates[sources == state_id]
+            for evaluate, next_state_id in transitions:
+                if remaining.size == 0:
+                    break
+                passed = evaluate(remaining)
+                moved_indices.append(remaining[passed])
+                moved_targets.append(np.full(np.count_nonzero(passed), next_state_id, dtype=np.intp))
+                remaining = remaining[~passed]
+
+        if moved_indices:
+            indices = np.concatenate(moved_indices)
+            targets = np.concatenate(moved_targets)
+            self.__exit_time[current[indices], indices] = now
+            current[indices] = targets
+            self.__entry_time[targets, indices] = now
+            self.__entry_count[targets, indices] += 1
+
+        return not bool(self.__terminal[current].all())
+
+    def __code(self, value: Any) -> int:
+        """
+        Returns the code of the given custom value, allocating a new one if needed.
+        """
+        code = self.__value_codes.get(value)
+        if code is None:
+            code = len(self.__values)
+            self.__value_codes[value] = code
+            self.__values.append(value)
+        return code
+
+    def __monitored_state_id(self, condition: Condition) -> int:
+        """
+        Returns the state id of the state monitored by the given condition.
+        """
+        if condition.monitored_state not in self.__state_ids:
+            raise ValueError('conditions must monitor states of the layout')
+        return self.__state_ids[condition.monitored_state]
+
+    def __compile_transition(self, transition: ConditionalTransition) -> _Evaluator:
+        """
+        Returns the evaluator of the condition of the given transition.
+
+        Raises:
+            TypeError: If the transition is not a plain conditional transition.
+        """
+        if not isinstance(transition, ConditionalTransition) \
+                or type(transition).is_transiting is not ConditionalTransition.is_transiting:
+            raise TypeError(f'{type(transition).__name__} is not supported by BatchFiniteStateMachine')
+        if transition.condition is None:
+            return lambda indices: np.zeros(indices.size, dtype=bool)
+        return self.__compile_condition(transition.condition)
+
+    def __compile_condition(self, condition: Condition) -> _Evaluator:
+        """
+        Returns the evaluator of the given condition.
+
+        Raises:
+            TypeError: If the condition is not one of the supported built-in conditions.
+        """
+        evaluate = self.__compile_comparison(condition)
+        if condition.inverse:
+            return lambda indices: ~evaluate(indices)
+        return evaluate
+
+    def __compile_comparison(self, condition: Condition) -> _Evaluator:
+        """
+        Returns the evaluator of the given condition, before its inverse flag is applied.
+        """
+        condition_type = type(condition)
+
+        if condition_type is AlwaysTrueCondition:
+            return lambda indices: np.ones(indices.size, dtype=bool)
+
+        if condition_type is StateValueCondition:
+            state_id = self.__monitored_state_id(condition)
+            code = self.__code(condition.expected_value)
+            return lambda indices: self.__custom_value[state_id, indices] == code
+
+        if condition_type is StateEntryDurationCondition:
+            state_id = self.__monitored_state_id(condition)
+            durations = self.__durations.setdefault(condition,
+                                                    np.full(self.__instance_count, condition.duration, dtype=np.float64))
+            return lambda indices: durations[indices] < self.__clock.now() - self.__entry_time[state_id, indices]
+
+        if condition_type is StateEntryCountCondition:
+            state_id = self.__monitored_state_id(condition)
+            expected_count, auto_reset = condition.expected_count, condition.auto_reset
+
+            def evaluate_count(indices: np.ndarray) -> np.ndarray:
+                passed = expected_count <= self.__entry_count[state_id, indices]
+                if auto_reset:
+                    self.__entry_count[state_id, indices[passed]] = 0
+                return passed
+
+            return evaluate_count
+
+        if condition_type in (AllConditions, AnyConditions, NoneConditions):
+            children = tuple(self.__compile_condition(child) for child in condition.conditions)
+            # All stops at the first false condition, Any and None at the first true one.
+            stop_on = condition_type is not AllConditions
+            result_on_stop = condition_type is AnyConditions
+
+            def evaluate_many(indices: np.ndarray) -> np.ndarray:
+                result = np.full(indices.size, not result_on_stop, dtype=bool)
+                undecided = np.arange(indices.size)
+                for child in children:
+                    if undecided.size == 0:
+                        break
+                    stopped = child(indices[undecided]) == stop_on
+                    result[undecided[stopped]] = result_on_stop
+                    undecided = undecided[~stopped]
+                return result
+
+            return evaluate_many
+
+        raise TypeError(f'{condition_type.__name__} is not supported by BatchFiniteStateMachine')
@@ -0,0 +1,289 @@
+import math
+from typing import Any, Callable, Optional, Union
+
+import numpy as np
+
+from lib.clock import Clock, default_clock
+
+# Receives the channels whose light changed and their new levels, in increasing channel order.
+Listener = Callable[[np.ndarray, np.ndarray], None]
+
+
+class BlinkerBank:
+    """
+    Drives many blinking lights from one timebase, computing the level of every channel in one vectorized step.
+
+    Each channel follows the last command it was given, with the same settings as AnalyticalBlinker: steady on or
+    off, for a duration or forever, or blinking with a cycle duration, an on share, a number of cycles or a total
+    duration. The commands are stored in NumPy arrays, with the time origin of every channel, so the channels
+    commanded together share the same start time and stay locked together: a reciprocal pair is one command with
+    begin_on set per channel, and a chase along a LED strip is one command with a phase offset per channel.
+
+    A command takes effect at the next track(), which computes every level at once and gives only the channels that
+    changed to the listener. Between two edges, track() only reads the clock.
+
+    Attributes:
+        __clock (Clock): The clock of the timebase.
+        __listener (Optional[Listener]): Receives the channels that changed.
+        __origin (np.ndarray): The time at which the current cycle of every channel started, shifted by its phase.
+        __end_time (np.ndarray): The time at which the command of every channel ends, or infinity.
+        __cycle_duration (np.ndarray): The blink cycle of every channel, or 0 if the channel does not blink.
+        __first_duration (np.ndarray): The duration of the first half of the blink cycle of every channel.
+        __first_on (np.ndarray): Whether every channel is on during the first half of its cycle, or during the whole
+            command when it does not blink.
+        __final_on (np.ndarray): Whether every channel is on after the end of its command.
+        __level (np.ndarray): The level last given to the listener, per channel.
+        __next_edge (float): The time of the next edge of any channel, infinity if there is none, or minus infinity
+            if a command waits for the next track().
+    """
+    # __clock: Clock
+    # __listener: Optional[Listener]
+    # __origin: np.ndarray
+    # __end_time: np.ndarray
+    # __cycle_duration: np.ndarray
+    # __first_duration: np.ndarray
+    # __first_on: np.ndarray
+    # __final_on: np.ndarray
+    # __level: np.ndarray
+    # __next_edge: float
+
+    def __init__(self, channel_count: int, listener: Optional[Listener] = None, clock: Optional[Clock] = None) -> None:
+        """
+        Initializes a bank whose channels are all off.
+
+        Args:
+            channel_count (int): The number of channels.
+            listener (Listener, optional): Called by track() with the channels that changed and their new levels.
+                Defaults to None.
+            clock (Clock, optional): The clock of the timebase. Defaults to the default clock.
+
+        Raises:
+            TypeError: If an argument has the wrong type.
+            ValueError: If channel_count is not strictly positive.
+        """
+        if not isinstance(channel_count, int):
+            raise TypeError('channel_count must be of type int')
+        if channel_count <= 0:
+            raise ValueError('channel_count must be strictly positive')
+        if not callable(listener) and listener is not None:
+            raise TypeError('listener must be callable')
+        if not isinstance(clock, Clock) and clock is not None:
+            raise TypeError('clock must be of type Clock')
+
+        self.__clock = default_clock() if clock is None else clock
+        self.__listener = listener
+        self.__origin = np.zeros(channel_count, dtype=np.float64)
+        self.__end_time = np.full(channel_count, math.inf, dtype=np.float64)
+        self.__cycle_duration = np.zeros(channel_count, dtype=np.float64)
+        self.__first_duration = np.zeros(channel_count, dtype=np.float64)
+        self.__first_on = np.zeros(channel_count, dtype=bool)
+        self.__final_on = np.zeros(channel_count, dtype=bool)
+        self.__level = np.zeros(channel_count, dtype=bool)
+        self.__next_edge = math.inf
+
+    @property
+    def channel_count(self) -> int:
+        """
+        Returns the number of channels.
+        """
+        return len(self.__level)
+
+    @property
+    def clock(self) -> Clock:
+        """
+        Returns the clock of the timebase.
+        """
+        return self.__clock
+
+    @property
+    def listener(self) -> Optional[Listener]:
+        """
+        Returns the callable receiving the channels that changed.
+        """
+        return self.__listener
+
+    @listener.setter
+    def listener(self, listener: Optional[Listener]) -> None:
+        if not callable(listener) and listener is not None:
+            raise TypeError('listener must be callable')
+        self.__listener = listener
+
+    @property
+    def levels(self) -> np.ndarray:
+        """
+        Returns a read-only view of the level of every channel, as of the last track().
+        """
+        view = self.__level.view()
+        view.flags.writeable = False
+        return view
+
+    def is_on(self, channel: int) -> bool:
+        """
+        Returns True if the given channel was on at the last track().
+        """
+        return bool(self.__level[channel])
+
+    def is_off(self, channel: int) -> bool:
+        """
+        Returns True if the given channel was off at the last track().
+        """
+        return not self.__level[channel]
+
+    @property
+    def has_pending_work(self) -> bool:
+        """
+        Returns False if no channel can change until the next command, in which case track() does nothing.
+        """
+        return self.__next_edge != math.inf
+
+    def turn_on(self, channels: Any, duration: Optional[Union[float, int]] = None) -> None:
+        """
+        Turns on the given channels, for the given duration after which they turn off, or until the next command.
+
+        Args:
+            channels (Any): A channel, a sequence of channels, a slice or a boolean mask.
+            duration (Optional[Union[float, int]]): The duration, in seconds, or None for no limit.
+        """
+        if not isinstance(duration, (float, int)) and duration is not None:
+            raise TypeError("duration must be a float, a int or None")
+
+        self.__program(channels, duration, 0.0, 0.0, True, False, 0.0)
+
+    def turn_off(self, channels: Any, duration: Optional[Union[float, int]] = None) -> None:
+        """
+        Turns off the given channels, for the given duration after which they turn on, or until the next command.
+
+        Args:
+            channels (Any): A channel, a sequence of channels, a slice or a boolean mask.
+            duration (Optional[Union[float, int]]): The duration, in seconds, or None for no limit.
+        """
+        if not isinstance(duration, (float, int)) and duration is not None:
+            raise TypeError("duration must be a float, a int or None")
+
+        self.__program(channels, duration, 0.0, 0.0, False, True, 0.0)
+
+    def blink(self, channels: Any, *, total_duration: Optional[Union[float, int]] = None,
+              cycle_duration: Optional[Union[float, int]] = None, n_cycles: Optional[int] = None,
+              percent_on: Union[float, int] = 0.5, begin_on: Any = True, end_off: Any = True,
+              phase: Any = 0.0) -> None:
+        """
+        Blinks the given channels with the same settings and calling conventions as Blinker.blink(). begin_on, end_off
+        and phase are either shared by the channels or given per channel.
+
+        Args:
+            channels (Any): A channel, a sequence of channels, a slice or a boolean mask.
+            begin_on (Any, optional): Whether each channel begins its cycle on. Defaults to True.
+            end_off (Any, optional): Whether each channel ends off rather than on. Defaults to True.
+            phase (Any, optional): How far into its first cycle each channel starts, as a fraction of the cycle
+                duration. Defaults to 0.0.
+
+        Raises:
+            ValueError: If percent_on is not between 0 and 1, or a per-channel setting does not have one value per
+                channel.
+        """
+        if not isinstance(total_duration, (float, int)) and total_duration is not None:
+            raise TypeError("total_duration must be a float, a int or None")
+        elif not isinstance(cycle_duration, (float, int)) and cycle_duration is not None:
+            raise TypeError("cycle_duration must be a float, a int or None")
+        elif not isinstance(n_cycles, int) and n_cycles is not None:
+            raise TypeError("n_cycles must be a int")
+        elif not isinstance(percent_on, (int, float)):
+            raise TypeError("percent_on must be a float or a int")
+        elif not (0 <= percent_on <= 1):
+            raise ValueError("percent_on must be between 0 and 1")
+
+        if cycle_duration is not None and total_duration is None and n_cycles is None:
+            pass
+        elif total_duration is not None and cycle_duration is not None and n_cycles is None:
+            pass
+        elif total_duration is not None and cycle_duration is None and n_cycles is not None:
+            cycle_duration = total_duration / n_cycles
+        elif total_duration is None and cycle_duration is not None and n_cycles is not None:
+            total_duration = cycle_duration * n_cycles
+        else:
+            raise TypeError("invalid calling convention")
+
+        begin_on = np.asarray(begin_on, dtype=bool)
+        on_time = cycle_duration * percent_on
+        first_duration = np.where(begin_on, on_time, cycle_duration - on_time)
+        self.__program(channels, total_duration, max(cycle_duration, 0.0), first_duration, begin_on,
+                       np.logical_not(end_off), phase)
+
+    def __program(self, channels: Any, duration: Optional[float], cycle_duration: float, first_duration: Any,
+                  first_on: Any, final_on: Any, phase: Any) -> None:
+        """
+        Starts a new command on the given channels at the current time. Every setting but the durations is either
+        shared by the channels or given per channel.
+        """
+        indices = np.arange(len(self.__level))[channels]
+        count = np.size(indices)
+
+        def per_channel(values: Any, name: str) -> np.ndarray:
+            values = np.asarray(values)
+            if values.ndim > 0 and values.shape != (count,):
+                raise ValueError('{} must hold one value per channel'.format(name))
+            return values
+
+        now = self.__clock.now()
+        phase = per_channel(phase, 'phase')
+        self.__origin[indices] = now - phase * cycle_duration
+        self.__end_time[indices] = math.inf if duration is None else now + duration
+        self.__cycle_duration[indices] = cycle_duration
+        self.__first_duration[indices] = per_channel(first_duration, 'begin_on')
+        self.__first_on[indices] = per_channel(first_on, 'begin_on')
+        self.__final_on[indices] = per_channel(final_on, 'end_off')
+        self.__next_edge = -math.inf
+
+    def next_deadline(self, now: float) -> Optional[float]:
+        """
+        Returns the time of the next edge of any channel, the given time if a command waits for the next track(), or
+        None if no channel changes until the next command.
+
+        Args:
+            now (float): The current time of the clock, in seconds.
+        """
+        next_edge = self.__next_edge
+        if next_edge == math.inf:
+            return None
+        return max(next_edge, now)
+
+    def track(self) -> int:
+        """
+        Computes the level of every channel and gives the channels that changed to the listener. Does nothing but read
+        the clock before the next edge.
+
+        Returns:
+            int: The number of channels that changed.
+        """
+        now = self.__clock.now()
+        if now < self.__next_edge:
+            return 0
+
+        end_time = self.__end_time
+        cycle_duration = self.__cycle_duration
+        first_on = self.__first_on
+
+        ended = now >= end_time
+        if ended.any():
+            end_time[ended] = math.inf
+            cycle_duration[ended] = 0.0
+            first_on[ended] = self.__final_on[ended]
+
+        first_duration = self.__first_duration
+        blinking = cycle_duration > 0.0
+        phase = np.where(blinking, (now - self.__origin) % np.where(blinking, cycle_duration, 1.0), 0.0)
+        in_first_half = phase < first_duration
+        level = np.where(blinking & ~in_first_half, ~first_on, first_on)
+
+        cycle_start = now - phase
+        edge = np.where(in_first_half, cycle_start + first_duration, cycle_start + cycle_duration)
+        edge[~(blinking & (first_duration > 0.0) & (first_duration < cycle_duration))] = math.inf
+        self.__next_edge = float(np.minimum(edge, end_time).min())
+
+        changed = np.flatnonzero(level != self.__level)
+        if changed.size:
+            levels = level[changed]
+            self.__level[changed] = levels
+            if self.__listener is not None:
+                self.__listener(changed, levels)
+        return int(changed.size)
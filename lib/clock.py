@@ -0,0 +1,268 @@
+from abc import ABC
+import abc
+import asyncio
+import math
+import threading
+import time
+from typing import Callable, Optional
+
+
+class Clock(ABC):
+    """
+    Abstract base class of the time sources read by the monitored states, the monitored transitions, the timed
+    conditions and FiniteStateMachine.run().
+
+    Times are expressed in seconds. Only differences between two times of the same clock are meaningful.
+    """
+
+    @abc.abstractmethod
+    def now(self) -> float:
+        """
+        Returns the current time of the clock.
+
+        Returns:
+            float: The current time, in seconds.
+        """
+        ...
+
+    @abc.abstractmethod
+    def sleep(self, duration: float) -> None:
+        """
+        Waits for the given duration of the clock.
+
+        Args:
+            duration (float): The duration to wait, in seconds.
+        """
+        ...
+
+    def sleep_until(self, time_point: float, wakeup: Optional[threading.Event] = None, spin: float = 0.0) -> None:
+        """
+        Waits until the given time of the clock, or until the wakeup event is set.
+
+        Args:
+            time_point (float): The time to wait for, in seconds.
+            wakeup (threading.Event, optional): An event that ends the wait early when it is set. Defaults to None.
+            spin (float, optional): How long before time_point to stop sleeping and busy-wait instead, for clocks
+                whose sleep is not precise enough. Defaults to 0.0.
+        """
+        if wakeup is not None and wakeup.is_set():
+            return
+        self.sleep(time_point - self.now())
+
+    async def async_sleep_until(self, time_point: float, wakeup: Optional[asyncio.Event] = None) -> None:
+        """
+        Suspends the calling coroutine until the given time of the clock, or until the wakeup event is set. The
+        event loop runs the other tasks meanwhile. Used by AsyncFiniteStateMachine.run().
+
+        Args:
+            time_point (float): The time to wait for, in seconds.
+            wakeup (asyncio.Event, optional): An event that ends the wait early when it is set. Defaults to None.
+        """
+        timeout = time_point - self.now()
+        if wakeup is None:
+            await asyncio.sleep(max(timeout, 0.0))
+        elif not wakeup.is_set() and timeout > 0.0:
+            try:
+                await asyncio.wait_for(wakeup.wait(), timeout)
+            except asyncio.TimeoutError:
+                pass
+
+    def idle(self, next_deadline: Callable[[float], Optional[float]]) -> None:
+        """
+        Called by FiniteStateMachine.run() between two ticks. Does nothing by default, so the run loop ticks as fast
+        as it can.
+
+        Args:
+            next_deadline (Callable[[float], Optional[float]]): Returns the earliest time after the given time at
+                which a timed condition of the state machine changes, or None if there is none.
+        """
+
+
+class PerfCounterClock(Clock):
+    """
+    The wall clock, read from time.perf_counter(). This is the default clock.
+    """
+    now = staticmethod(time.perf_counter)
+
+    def sleep(self, duration: float) -> None:
+        """
+        Suspends the calling thread for the given duration.
+
+        Args:
+            duration (float): The duration to wait, in seconds.
+        """
+        if duration > 0.0:
+            time.sleep(duration)
+
+    def sleep_until(self, time_point: float, wakeup: Optional[threading.Event] = None, spin: float = 0.0) -> None:
+        """
+        Suspends the calling thread until the given time, or until the wakeup event is set. The last spin seconds
+        are busy-waited, since the operating system may wake a sleeping thread late.
+
+        Args:
+            time_point (float): The time to wait for, in seconds.
+            wakeup (threading.Event, optional): An event that ends the wait early when it is set. Defaults to None.
+            spin (float, optional): How long before time_point to stop sleeping and busy-wait instead, in seconds.
+                Defaults to 0.0.
+        """
+        timeout = time_point - time.perf_counter() - spin
+        if timeout > 0.0:
+            if wakeup is None:
+                time.sleep(timeout)
+            elif wakeup.wait(timeout):
+                return
+        if spin > 0.0:
+            while time.perf_counter() < time_point:
+                if wakeup is not None and wakeup.is_set():
+                    return
+
+
+class VirtualClock(Clock):
+    """
+    A clock that only moves when it is told to. Sleeping on it returns immediately, and between two ticks of
+    FiniteStateMachine.run() it jumps straight to the next deadline of the state machine, so that simulated hours
+    run in milliseconds.
+
+    Attributes:
+        __now (float): The current time, in seconds.
+        __step (float): How far idle() moves the clock when the state machine has no deadline.
+    """
+    # __now: float
+    # __step: float
+
+    def __init__(self, start: float = 0.0, step: float = 0.01) -> None:
+        """
+        Initializes a new VirtualClock.
+
+        Args:
+            start (float, optional): The initial time, in seconds. Defaults to 0.0.
+            step (float, optional): How far the clock moves between two ticks when the state machine has no
+                deadline, in seconds. Defaults to 0.01.
+
+        Raises:
+            TypeError: If start or step is not a float or an int.
+            ValueError: If step is not strictly positive.
+        """
+        if not isinstance(start, (float, int)):
+            raise TypeError("start must be a float or a int")
+        if not isinstance(step, (float, int)):
+            raise TypeError("step must be a float or a int")
+        if step <= 0:
+            raise ValueError("step must be strictly positive")
+
+        self.__now = float(start)
+        self.__step = float(step)
+
+    @property
+    def step(self) -> float:
+        """
+        How far the clock moves between two ticks when the state machine has no deadline, in seconds.
+        """
+        return self.__step
+
+    def now(self) -> float:
+        """
+        Returns the current virtual time.
+
+        Returns:
+            float: The current time, in seconds.
+        """
+        return self.__now
+
+    def sleep(self, duration: float) -> None:
+        """
+        Moves the clock forward by the given duration, without waiting.
+
+        Args:
+            duration (float): The duration to skip, in seconds.
+        """
+        self.advance(duration)
+
+    def sleep_until(self, time_point: float, wakeup: Optional[threading.Event] = None, spin: float = 0.0) -> None:
+        """
+        Moves the clock just past the given time, without waiting, unless the wakeup event is already set.
+
+        Args:
+            time_point (float): The time to reach, in seconds.
+            wakeup (threading.Event, optional): An event that cancels the wait when it is set. Defaults to None.
+            spin (float, optional): Ignored, the virtual clock is always on time. Defaults to 0.0.
+        """
+        if wakeup is not None and wakeup.is_set():
+            return
+        self.advance_to(math.nextafter(time_point, math.inf))
+
+    async def async_sleep_until(self, time_point: float, wakeup: Optional[asyncio.Event] = None) -> None:
+        """
+        Moves the clock just past the given time, unless the wakeup event is already set, then lets the other tasks
+        of the event loop run once.
+
+        Args:
+            time_point (float): The time to reach, in seconds.
+            wakeup (asyncio.Event, optional): An event that cancels the wait when it is set. Defaults to None.
+        """
+        if wakeup is None or not wakeup.is_set():
+            self.advance_to(math.nextafter(time_point, math.inf))
+        await asyncio.sleep(0)
+
+    def advance(self, duration: float) -> None:
+        """
+        Moves the clock forward by the given duration.
+
+        Args:
+            duration (float): The duration to skip, in seconds. Negative durations are ignored.
+        """
+        if duration > 0.0:
+            self.__now += duration
+
+    def advance_to(self, time_point: float) -> None:
+        """
+        Moves the clock forward to the given time. The clock never goes backward.
+
+        Args:
+            time_point (float): The time to reach, in seconds.
+        """
+        if time_point > self.__now:
+            self.__now = time_point
+
+    def idle(self, next_deadline: Callable[[float], Optional[float]]) -> None:
+        """
+        Jumps just past the next deadline of the state machine, or moves forward by one step if there is none.
+
+        Args:
+            next_deadline (Callable[[float], Optional[float]]): Returns the earliest time after the given time at
+                which a timed condition of the state machine changes, or None if there is none.
+        """
+        deadline = next_deadline(self.__now)
+        if deadline is None:
+            self.__now += self.__step
+        else:
+            self.__now = math.nextafter(deadline, math.inf)
+
+
+_default_clock: Clock = PerfCounterClock()
+
+
+def default_clock() -> Clock:
+    """
+    Returns the clock given to the time-based components that are created without an explicit clock.
+
+    Returns:
+        Clock: The default clock.
+    """
+    return _default_clock
+
+
+def set_default_clock(clock: Clock) -> None:
+    """
+    Replaces the default clock. Only the components created afterwards use the new clock.
+
+    Args:
+        clock (Clock): The new default clock.
+
+    Raises:
+        TypeError: If clock is not of type Clock.
+    """
+    global _default_clock
+    if not isinstance(clock, Clock):
+        raise TypeError("clock must be of type Clock")
+    _default_clock = clock
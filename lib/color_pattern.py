@@ -0,0 +1,233 @@
+import math
+from typing import Callable, Optional, Sequence, Tuple
+
+import numpy as np
+
+Color = Tuple[int, int, int]
+
+
+class ColorPattern:
+    """
+    An RGB animation compiled into a lookup table of colors, one frame per 1 / rate seconds.
+
+    The whole animation is computed once, when the pattern is built, and quantized to whole color steps. Playing it
+    back is a table lookup indexed by the elapsed time, and two consecutive frames of the same color are the same
+    tuple, so that a player writing the color to the hardware only when it changes (see Robot.ActuatorCache) writes
+    once per distinct color.
+
+    A looping pattern starts over after its duration. Otherwise, it holds its last frame.
+
+    Attributes:
+        __frames (Tuple[Color, ...]): The color of every frame.
+        __rate (float): The number of frames per second.
+        __loop (bool): Whether the pattern starts over after its last frame.
+    """
+    # __frames: Tuple[Color, ...]
+    # __rate: float
+    # __loop: bool
+
+    DEFAULT_RATE = 50.0
+
+    def __init__(self, table: np.ndarray, rate: float = DEFAULT_RATE, loop: bool = True, color_step: int = 1) -> None:
+        """
+        Quantizes a table of colors into a pattern.
+
+        Args:
+            table (np.ndarray): An array-like of shape (frame count, 3) holding the red, green and blue component of
+                every frame, between 0 and 255.
+            rate (float, optional): The number of frames per second. Defaults to DEFAULT_RATE.
+            loop (bool, optional): Whether the pattern starts over after its last frame. Defaults to True.
+            color_step (int, optional): The components are rounded to a multiple of this step, so that a slow fade
+                changes color less often. Defaults to 1.
+
+        Raises:
+            TypeError: If an argument has the wrong type.
+            ValueError: If the table is empty or not of shape (frame count, 3), or rate or color_step is not strictly
+                positive.
+        """
+        if not isinstance(rate, (float, int)):
+            raise TypeError('rate must be of type float')
+        if rate <= 0:
+            raise ValueError('rate must be strictly positive')
+        if not isinstance(loop, bool):
+            raise TypeError('loop must be of type bool')
+        if not isinstance(color_step, int):
+            raise TypeError('color_step must be of type int')
+        if color_step <= 0:
+            raise ValueError('color_step must be strictly positive')
+
+        table = np.asarray(table, dtype=np.float64)
+        if table.ndim != 2 or table.shape[1] != 3 or len(table) == 0:
+            raise ValueError('table must be of shape (frame count, 3)')
+
+        quantized = np.clip(np.rint(table / color_step) * color_step, 0, 255).astype(np.uint8)
+        colors = {}
+        self.__frames = tuple(colors.setdefault(color, color) for color in map(tuple, quantized.tolist()))
+        self.__rate = float(rate)
+        self.__loop = loop
+
+    @classmethod
+    def from_keyframes(cls, keyframes: Sequence[Tuple[float, Color]], rate: float = DEFAULT_RATE, loop: bool = True,
+                       interpolate: bool = True, color_step: int = 1) -> 'ColorPattern':
+        """
+        Compiles a pattern from keyframes.
+
+        Args:
+            keyframes (Sequence[Tuple[float, Color]]): The (time, color) pairs, by increasing time, in seconds. The
+                first keyframe is at time 0, the last one sets the duration of the pattern.
+            rate (float, optional): The number of frames per second. Defaults to DEFAULT_RATE.
+            loop (bool, optional): Whether the pattern starts over after its last keyframe. Defaults to True.
+            interpolate (bool, optional): Whether the colors fade linearly from one keyframe to the next, rather than
+                hold until the next keyframe. Defaults to True.
+            color_step (int, optional): See ColorPattern(). Defaults to 1.
+
+        Raises:
+            ValueError: If there is no keyframe, the first one is not at time 0 or the times decrease.
+        """
+        if len(keyframes) == 0:
+            raise ValueError('keyframes must not be empty')
+        times = np.array([time_point for time_point, _ in keyframes], dtype=np.float64)
+        colors = np.array([color for _, color in keyframes], dtype=np.float64).reshape(len(keyframes), 3)
+        if times[0] != 0.0:
+            raise ValueError('the first keyframe must be at time 0')
+        if np.any(np.diff(times) < 0.0):
+            raise ValueError('the keyframes must be sorted by time')
+
+        # a looping pattern ends on its first frame, so the last keyframe is not played twice in a row
+        frame_count = max(1, int(round(times[-1] * rate)) + (0 if loop else 1))
+        samples = np.arange(frame_count) / rate
+        if interpolate:
+            table = np.column_stack([np.interp(samples, times, colors[:, component]) for component in range(3)])
+        else:
+            table = colors[np.searchsorted(times, samples, side='right') - 1]
+        return cls(table, rate, loop, color_step)
+
+    @classmethod
+    def from_function(cls, function: Callable[[np.ndarray], np.ndarray], duration: float,
+                      rate: float = DEFAULT_RATE, loop: bool = True, color_step: int = 1) -> 'ColorPattern':
+        """
+        Compiles a pattern by sampling a function of the time.
+
+        Args:
+            function (Callable[[np.ndarray], np.ndarray]): Maps an array of n times, in seconds, to an array of shape
+                (n, 3) of colors.
+            duration (float): The duration of the pattern, in seconds.
+            rate (float, optional): The number of frames per second. Defaults to DEFAULT_RATE.
+            loop (bool, optional): Whether the pattern starts over after its duration. Defaults to True.
+            color_step (int, optional): See ColorPattern(). Defaults to 1.
+        """
+        if not callable(function):
+            raise TypeError('function must be callable')
+        if not isinstance(duration, (float, int)):
+            raise TypeError('duration must be of type float')
+        if duration <= 0:
+            raise ValueError('duration must be strictly positive')
+
+        frame_count = max(1, int(round(duration * rate)))
+        return cls(function(np.arange(frame_count) / rate), rate, loop, color_step)
+
+    @classmethod
+    def blink(cls, color: Color, cycle_duration: float, percent_on: float = 0.5, off_color: Color = (0, 0, 0),
+              rate: float = DEFAULT_RATE) -> 'ColorPattern':
+        """
+        Compiles a looping pattern alternating between color and off_color, like Blinker.blink().
+        """
+        if not (0 <= percent_on <= 1):
+            raise ValueError('percent_on must be between 0 and 1')
+        return cls.from_keyframes([(0.0, color), (cycle_duration * percent_on, off_color), (cycle_duration, color)],
+                                  rate, loop=True, interpolate=False)
+
+    @classmethod
+    def breathe(cls, color: Color, cycle_duration: float, rate: float = DEFAULT_RATE,
+                color_step: int = 1) -> 'ColorPattern':
+        """
+        Compiles a looping pattern whose brightness rises from off to color and back down along a cosine, once per
+        cycle.
+        """
+        peak = np.asarray(color, dtype=np.float64)
+
+        def brightness(times: np.ndarray) -> np.ndarray:
+            return np.outer((1.0 - np.cos(2.0 * math.pi * times / cycle_duration)) / 2.0, peak)
+
+        return cls.from_function(brightness, cycle_duration, rate, loop=True, color_step=color_step)
+
+    @classmethod
+    def fade(cls, start_color: Color, end_color: Color, duration: float, rate: float = DEFAULT_RATE,
+             color_step: int = 1) -> 'ColorPattern':
+        """
+        Compiles a pattern fading linearly from start_color to end_color, then holding end_color.
+        """
+        return cls.from_keyframes([(0.0, start_color), (duration, end_color)], rate, loop=False,
+                                  color_step=color_step)
+
+    @property
+    def frames(self) -> Tuple[Color, ...]:
+        """
+        Returns the color of every frame.
+        """
+        return self.__frames
+
+    @property
+    def rate(self) -> float:
+        """
+        Returns the number of frames per second.
+        """
+        return self.__rate
+
+    @property
+    def loop(self) -> bool:
+        """
+        Returns whether the pattern starts over after its last frame.
+        """
+        return self.__loop
+
+    @property
+    def duration(self) -> float:
+        """
+        Returns the duration of one playthrough, in seconds.
+        """
+        return len(self.__frames) / self.__rate
+
+    @property
+    def change_count(self) -> int:
+        """
+        Returns the number of runs of frames of the same color, that is the number of writes needed to play the
+        pattern once from its first frame.
+        """
+        frames = self.__frames
+        return 1 + sum(1 for previous, color in zip(frames, frames[1:]) if color is not previous)
+
+    def color_at(self, elapsed: float) -> Color:
+        """
+        Returns the color of the frame playing at the given time.
+
+        Args:
+            elapsed (float): The time since the pattern started, in seconds.
+        """
+        frames = self.__frames
+        index = int(elapsed * self.__rate)
+        if index < 0:
+            index = 0
+        elif index >= len(frames):
+            index = index % len(frames) if self.__loop else len(frames) - 1
+        return frames[index]
+
+    def next_change(self, elapsed: float) -> Optional[float]:
+        """
+        Returns the earliest time after elapsed at which the color changes, or None if it does not change anymore.
+
+        Args:
+            elapsed (float): The time since the pattern started, in seconds.
+        """
+        frames = self.__frames
+        frame_count = len(frames)
+        index = max(0, int(elapsed * self.__rate))
+        if not self.__loop and index >= frame_count - 1:
+            return None
+
+        color = self.color_at(elapsed)
+        limit = index + frame_count if self.__loop else frame_count
+        for next_index in range(index + 1, limit):
+            if frames[next_index % frame_count] is not color:
+                return next_index / self.__rate
+        return None
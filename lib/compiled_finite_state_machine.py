@@ -0,0 +1,458 @@
+from typing import Any, Callable, Dict, Optional, Tuple
+
+from lib.clock import Clock
+from lib.finite_state_machine import FiniteStateMachine
+from lib.operational_state import OperationalState
+from lib.layout import Layout
+from lib.state import State, ActionState
+from lib.transition import Transition, ConditionalTransition
+from lib.value_dispatch import ValueDispatch, dispatch_plan
+
+
+def _never() -> bool:
+    """
+    Evaluation handle of a conditional transition without condition.
+    """
+    return False
+
+
+def _transition_handle(transition: Transition) -> Callable[[], bool]:
+    """
+    Returns the cheapest callable that answers the same thing as transition.is_transiting.
+
+    Args:
+        transition (Transition): The transition to evaluate.
+
+    Returns:
+        Callable[[], bool]: The evaluation handle of the transition.
+    """
+    if type(transition).is_transiting is ConditionalTransition.is_transiting:
+        condition = transition.condition
+        if condition is None:
+            return _never
+        return condition._evaluator()
+
+    return lambda: transition.is_transiting
+
+
+def _in_state_actions(state: State) -> Tuple[Callable[[], None], ...]:
+    """
+    Returns the callables to run for the in-state action of the given state. The actions of a plain ActionState are
+    flattened into a tuple, any other state keeps its own in-state action.
+
+    Args:
+        state (State): The state.
+
+    Returns:
+        Tuple[Callable[[], None], ...]: The in-state callables, in execution order.
+    """
+    if isinstance(state, ActionState) and type(state)._exec_in_state_action is State._exec_in_state_action \
+            and type(state)._do_in_state_action is ActionState._do_in_state_action:
+        return state.in_state_actions
+
+    return state._exec_in_state_action,
+
+
+class CompiledLayout:
+    """
+    A frozen, integer-indexed view of a Layout.
+
+    States are numbered in Layout.traverse() order. The transitions of the state i are stored in the flat tables at
+    the indices transition_start[i] to transition_start[i + 1], in the order they were added to the state.
+
+    Attributes:
+        __states (Tuple[State, ...]): The states, indexed by state id.
+        __state_ids (Dict[State, int]): The state id of every state.
+        __initial_state_id (int): The state id of the initial state.
+        __terminal (Tuple[bool, ...]): Whether each state is terminal.
+        __transition_start (Tuple[int, ...]): The first transition index of each state, plus the total count.
+        __transitions (Tuple[Transition, ...]): The flat table of transitions.
+        __conditions (Tuple[Callable[[], bool], ...]): The evaluation handle of each transition.
+        __next_state_ids (Tuple[int, ...]): The state id each transition leads to.
+        __transiting_actions (Tuple[Callable[[], None], ...]): The transiting action of each transition.
+        __entering_actions (Tuple[Callable[[], None], ...]): The entering action of each state.
+        __in_state_actions (Tuple[Tuple[Callable[[], None], ...], ...]): The in-state callables of each state.
+        __exiting_actions (Tuple[Callable[[], None], ...]): The exiting action of each state.
+    """
+
+    def __init__(self, layout: Layout) -> None:
+        """
+        Compiles the given layout. Prefer Layout.compile(), which validates the layout first.
+
+        Args:
+            layout (Layout): The layout to compile.
+
+        Raises:
+            TypeError: If layout is not of type Layout.
+            ValueError: If the layout has no initial state or a transition has no next state.
+        """
+        if not isinstance(layout, Layout):
+            raise TypeError('layout must be of type Layout')
+        if layout.initial_state is None:
+            raise ValueError('the layout must have an initial state')
+
+        states = tuple(layout.traverse())
+        state_ids = {state: state_id for state_id, state in enumerate(states)}
+
+        transition_start = [0]
+        transitions = []
+        for state in states:
+            transitions.extend(state.transitions)
+            transition_start.append(len(transitions))
+
+        if any(transition.next_state is None for transition in transitions):
+            raise ValueError('every transition must have a next state')
+
+        self.__states: Tuple[State, ...] = states
+        self.__state_ids: Dict[State, int] = state_ids
+        self.__initial_state_id = state_ids[layout.initial_state]
+        self.__terminal = tuple(state.is_terminal for state in states)
+        self.__transition_start = tuple(transition_start)
+        self.__transitions: Tuple[Transition, ...] = tuple(transitions)
+        self.__conditions = tuple(_transition_handle(transition) for transition in transitions)
+        self.__next_state_ids = tuple(state_ids[transition.next_state] for transition in transitions)
+        self.__transiting_actions = tuple(transition._exec_transiting_action for transition in transitions)
+        self.__entering_actions = tuple(state._exec_entering_action for state in states)
+        self.__in_state_actions = tuple(_in_state_actions(state) for state in states)
+        self.__exiting_actions = tuple(state._exec_exiting_action for state in states)
+
+    @property
+    def states(self) -> Tuple[State, ...]:
+        """
+        Returns the states, indexed by state id.
+        """
+        return self.__states
+
+    @property
+    def initial_state_id(self) -> int:
+        """
+        Returns the state id of the initial state.
+        """
+        return self.__initial_state_id
+
+    @property
+    def terminal(self) -> Tuple[bool, ...]:
+        """
+        Returns whether each state is terminal, indexed by state id.
+        """
+        return self.__terminal
+
+    @property
+    def transition_start(self) -> Tuple[int, ...]:
+        """
+        Returns the first transition index of each state, followed by the total number of transitions.
+        """
+        return self.__transition_start
+
+    @property
+    def transitions(self) -> Tuple[Transition, ...]:
+        """
+        Returns the flat table of transitions.
+        """
+        return self.__transitions
+
+    @property
+    def conditions(self) -> Tuple[Callable[[], bool], ...]:
+        """
+        Returns the evaluation handle of each transition.
+        """
+        return self.__conditions
+
+    @property
+    def next_state_ids(self) -> Tuple[int, ...]:
+        """
+        Returns the state id each transition leads to.
+        """
+        return self.__next_state_ids
+
+    @property
+    def transiting_actions(self) -> Tuple[Callable[[], None], ...]:
+        """
+        Returns the transiting action of each transition.
+        """
+        return self.__transiting_actions
+
+    @property
+    def entering_actions(self) -> Tuple[Callable[[], None], ...]:
+        """
+        Returns the entering action of each state, indexed by state id.
+        """
+        return self.__entering_actions
+
+    @property
+    def in_state_actions(self) -> Tuple[Tuple[Callable[[], None], ...], ...]:
+        """
+        Returns the in-state callables of each state, indexed by state id.
+        """
+        return self.__in_state_actions
+
+    @property
+    def exiting_actions(self) -> Tuple[Callable[[], None], ...]:
+        """
+        Returns the exiting action of each state, indexed by state id.
+        """
+        return self.__exiting_actions
+
+    def state_id(self, state: State) -> int:
+        """
+        Returns the state id of the given state.
+
+        Args:
+            state (State): A state of the compiled layout.
+
+        Returns:
+            int: The state id of the state.
+
+        Raises:
+            ValueError: If the state is not part of the compiled layout.
+        """
+        try:
+            return self.__state_ids[state]
+        except KeyError:
+            raise ValueError('state must be part of the compiled layout') from None
+
+    def transition_rows(self, state_id: int) -> Tuple[Tuple[Callable[[], bool], int, Callable[[], None]], ...]:
+        """
+        Returns the (condition, next state id, transiting action) rows of the given state, in evaluation order.
+
+        Args:
+            state_id (int): The state id.
+
+        Returns:
+            Tuple: The transition rows of the state.
+        """
+        begin, end = self.__transition_start[state_id], self.__transition_start[state_id + 1]
+        return tuple(zip(self.__conditions[begin:end], self.__next_state_ids[begin:end],
+                         self.__transiting_actions[begin:end]))
+
+    def dispatch_rows(self, state_id: int) -> Tuple[Tuple[Callable[[], Any], int, Optional[Callable[[], None]]], ...]:
+        """
+        Returns the transition rows of the given state with every StateValueCondition fan-out replaced by a single
+        (lookup, -1, None) row (see ValueDispatch). The lookup returns the selected transition row, or None if no
+        transition of the fan-out is transiting.
+
+        Args:
+            state_id (int): The state id.
+
+        Returns:
+            Tuple: The dispatch rows of the state.
+        """
+        rows = self.transition_rows(state_id)
+        begin, end = self.__transition_start[state_id], self.__transition_start[state_id + 1]
+        plan = dispatch_plan(self.__transitions[begin:end], rows)
+        if plan is None:
+            return rows
+        return tuple((entry.select, -1, None) if type(entry) is ValueDispatch else entry for entry in plan)
+
+
+class CompiledFiniteStateMachine(FiniteStateMachine):
+    """
+    A finite state machine that runs a compiled Layout instead of walking the State and Transition objects.
+
+    It behaves exactly like FiniteStateMachine: the same actions run in the same order and the monitored states and
+    transitions are updated the same way. The layout must be fully built before the state machine is created.
+
+    Attributes:
+        __compiled_layout (CompiledLayout): The compiled layout.
+        __current_state_id (int): The state id of the current applicative state, or -1 if there is none.
+        __rows (Tuple): The dispatch rows of every state, indexed by state id (see CompiledLayout.dispatch_rows()).
+        __terminal, __entering_actions, __in_state_actions, __exiting_actions: Local copies of the compiled layout
+            tables, to keep track() free of attribute lookups.
+        __quiescent_states (Tuple[bool, ...]): Whether the state machine can stop ticking in each state (see
+            FiniteStateMachine.is_quiescent).
+        __quiescent (bool): Whether the current state is quiescent.
+    """
+
+    def __init__(self, layout: Layout, uninitialized: bool = True, clock: Optional[Clock] = None,
+                 micro_steps: int = 1) -> None:
+        """
+        Initializes a new instance of the CompiledFiniteStateMachine class.
+
+        Args:
+            layout (Layout): The layout of the state machine.
+            uninitialized (bool, optional): Whether to leave the state machine uninitialized. Defaults to True.
+            clock (Clock, optional): The clock of the state machine. Defaults to the default clock.
+            micro_steps (int, optional): The maximum number of transitions taken in one tick (see
+                FiniteStateMachine.track()). Defaults to 1.
+
+        Raises:
+            TypeError: If layout is not of type Layout.
+            ValueError: If the layout is not valid.
+        """
+        if not isinstance(layout, Layout):
+            raise TypeError('layout must be of type Layout')
+
+        self.__compiled_layout = layout.compile()
+        self.__rows = tuple(self.__compiled_layout.dispatch_rows(state_id)
+                            for state_id in range(len(self.__compiled_layout.states)))
+        self.__terminal = self.__compiled_layout.terminal
+        self.__entering_actions = self.__compiled_layout.entering_actions
+        self.__in_state_actions = self.__compiled_layout.in_state_actions
+        self.__exiting_actions = self.__compiled_layout.exiting_actions
+        self.__quiescent_states = tuple(self._is_quiescent_state(state) for state in self.__compiled_layout.states)
+        self.__quiescent = False
+        self.__current_state_id = -1
+        super().__init__(layout, uninitialized, clock, micro_steps)
+
+    @property
+    def compiled_layout(self) -> CompiledLayout:
+        """
+        Returns the compiled layout of the state machine.
+
+        Returns:
+            CompiledLayout: The compiled layout.
+        """
+        return self.__compiled_layout
+
+    @property
+    def current_state_id(self) -> int:
+        """
+        Returns the state id of the current applicative state, or -1 if the state machine was never reset.
+
+        Returns:
+            int: The current state id.
+        """
+        return self.__current_state_id
+
+    @property
+    def current_applicative_state(self) -> Optional[State]:
+        """
+        Returns the current applicative state of the state machine.
+
+        Returns:
+            Optional[State]: The current applicative state, or None if the state machine was never reset.
+        """
+        if self.__current_state_id < 0:
+            return None
+        return self.__compiled_layout.states[self.__current_state_id]
+
+    @property
+    def is_quiescent(self) -> bool:
+        """
+        Returns True if the state machine sits in a quiescent state, in which case track() does nothing until
+        transit_to() is called.
+
+        Returns:
+            bool: True if the state machine is quiescent, False otherwise.
+        """
+        return self.__quiescent
+
+    @property
+    def has_pending_work(self) -> bool:
+        """
+        Returns False if a tick would do nothing, True otherwise (see FiniteStateMachine.has_pending_work).
+
+        Returns:
+            bool: True if the state machine needs to be ticked, False otherwise.
+        """
+        if self.__quiescent or self.__current_state_id < 0:
+            return False
+        return self.current_operational_state is not OperationalState.TERMINAL_REACHED
+
+    def reset(self) -> None:
+        """
+        Sets the operational state to IDLE
+        """
+        self._set_operational_state(OperationalState.IDLE)
+        self.__current_state_id = self.__compiled_layout.initial_state_id
+        self.__quiescent = self.__quiescent_states[self.__current_state_id]
+        self.__entering_actions[self.__current_state_id]()
+
+    def _transit_by(self, transition: Transition) -> None:
+        """
+        Transitions the state machine to the next state using the given transition.
+
+        Args:
+            transition (Transition): The transition to use for transitioning to the next state.
+        """
+        if not isinstance(transition, Transition):
+            raise TypeError('transition must be of type Transition')
+
+        next_state_id = self.__compiled_layout.state_id(transition.next_state)
+        self.__exiting_actions[self.__current_state_id]()
+        transition._exec_transiting_action()
+        self.__current_state_id = next_state_id
+        self.__quiescent = self.__quiescent_states[next_state_id]
+        self.__entering_actions[next_state_id]()
+
+    def transit_to(self, state: State) -> None:
+        """
+        Transitions the state machine to the specified state.
+
+        Args:
+            state (State): The state to transition to, which must be part of the compiled layout.
+        """
+        if not isinstance(state, State):
+            raise TypeError('state must be of type State')
+
+        state_id = self.__compiled_layout.state_id(state)
+        self.__exiting_actions[self.__current_state_id]()
+        self.__current_state_id = state_id
+        self.__quiescent = self.__quiescent_states[state_id]
+        self.__entering_actions[state_id]()
+
+    def track(self) -> bool:
+        """
+        Advances the state machine by one step and returns True if the state machine has not reached a terminal state,
+        and False otherwise. Does nothing while the state machine is quiescent, and runs to completion like
+        FiniteStateMachine.track() when micro_steps is above 1.
+
+        Returns:
+            bool: True if the state machine has not reached a terminal state, and False otherwise.
+        """
+        if self.__quiescent:
+            return True
+
+        state_id = self.__current_state_id
+        if state_id < 0:
+            raise RuntimeError("The finite state machine is UNINITIALIZED. You cannot track an UNINITIALIZED state machine")
+
+        if self.__terminal[state_id]:
+            self._set_operational_state(OperationalState.TERMINAL_REACHED)
+            return False
+
+        for condition, next_state_id, transiting_action in self.__rows[state_id]:
+            selected = condition()
+            if selected:
+                if next_state_id < 0:
+                    _, next_state_id, transiting_action = selected
+                self.__exiting_actions[state_id]()
+                transiting_action()
+                self.__current_state_id = next_state_id
+                self.__quiescent = self.__quiescent_states[next_state_id]
+                self.__entering_actions[next_state_id]()
+                if self.micro_steps > 1:
+                    self.__run_to_completion(state_id)
+                return True
+
+        for in_state_action in self.__in_state_actions[state_id]:
+            in_state_action()
+        return True
+
+    def __run_to_completion(self, start_state_id: int) -> None:
+        """
+        Takes the enabled transitions that follow the first transition of a tick, up to micro_steps transitions in
+        total.
+
+        Args:
+            start_state_id (int): The state id the tick started in.
+        """
+        visited = {start_state_id}
+        for _ in range(self.micro_steps - 1):
+            state_id = self.__current_state_id
+            if state_id in visited or self.__terminal[state_id] or self.__quiescent:
+                return
+            visited.add(state_id)
+            for condition, next_state_id, transiting_action in self.__rows[state_id]:
+                selected = condition()
+                if selected:
+                    if next_state_id < 0:
+                        _, next_state_id, transiting_action = selected
+                    self.__exiting_actions[state_id]()
+                    transiting_action()
+                    self.__current_state_id = next_state_id
+                    self.__quiescent = self.__quiescent_states[next_state_id]
+                    self.__entering_actions[next_state_id]()
+                    break
+            else:
+                return
@@ -1,11 +1,22 @@
-from typing import List, Optional, Any, TYPE_CHECKING
+from typing import List, Optional, Any, Callable, TYPE_CHECKING
 from abc import ABC
 import abc
-import time
+
+from lib.clock import Clock, default_clock
 
 if TYPE_CHECKING:
     from state import MonitoredState
 
+NoneType = type(None)
+
+
+def _invalidate_dispatch() -> None:
+    """
+    Makes the states rebuild their dispatch plan after a condition they may group changed (see ValueDispatch).
+    """
+    from lib.value_dispatch import ValueDispatch
+    ValueDispatch.invalidate()
+
 
 class Condition(ABC):
     """
@@ -41,6 +52,48 @@ class Condition(ABC):
         """
         return self.__inverse ^ self.compare()
 
+    @property
+    def inverse(self) -> bool:
+        """
+        Returns whether the condition's boolean value is inverted.
+
+        Returns:
+            bool: True if the condition's boolean value is inverted, False otherwise.
+        """
+        return self.__inverse
+
+    def _evaluator(self) -> Callable[[], bool]:
+        """
+        Returns a callable that evaluates the condition like bool() does, without the inverse indirection when the
+        condition is not inverted. Used by compiled engines.
+
+        Returns:
+            Callable[[], bool]: The evaluation callable of the condition.
+        """
+        if self.__inverse:
+            return self.__bool__
+        return self.compare
+
+    def next_deadline(self, now: float) -> Optional[float]:
+        """
+        Returns the earliest time after now at which the condition changes on its own, as time goes by.
+
+        Args:
+            now (float): The current time of the clock, in seconds.
+
+        Returns:
+            Optional[float]: The deadline, in seconds, or None if the condition does not depend on time.
+        """
+        return None
+
+    def _bind_clock(self, clock: Clock) -> None:
+        """
+        Makes the condition read the given clock. Does nothing for conditions that do not depend on time.
+
+        Args:
+            clock (Clock): The clock to read.
+        """
+
     @abc.abstractmethod
     def compare(self) -> bool:
         """
@@ -118,11 +171,14 @@ class TimedCondition(Condition):
     Attributes:
         __duration (float): The duration of time to wait before the condition becomes True.
         __time_reference (float): The time reference from which to start counting.
+        __clock (Clock): The clock the time reference and the elapsed time are read from.
     """
     # __duration: float
     # __time_reference: float
+    # __clock: Clock
 
-    def __init__(self, duration: float = 1.0, time_reference: Optional[float] = None, inverse: bool = False) -> None:
+    def __init__(self, duration: float = 1.0, time_reference: Optional[float] = None, inverse: bool = False,
+                 clock: Optional[Clock] = None) -> None:
         """
         Initializes a new TimedCondition object with the specified duration, time reference and optional inverse flag.
 
@@ -132,17 +188,21 @@ class TimedCondition(Condition):
                                               If None, the current time will be used as the reference.
             inverse (bool): Optional boolean flag indicating whether the condition's boolean value should be inverted.
                             Defaults to False.
+            clock (Clock, optional): The clock to read. Defaults to the default clock.
         """
         if not isinstance(duration, float):
             raise TypeError("duration must be a float")
-        if time_reference is None:
+        if not isinstance(time_reference, (float, NoneType)):
             raise TypeError("time_reference must be a float or None")
+        if not isinstance(clock, (Clock, NoneType)):
+            raise TypeError("clock must be a Clock or None")
 
         super().__init__(inverse)
         self.__duration = duration
+        self.__clock = default_clock() if clock is None else clock
 
         if time_reference is None:
-            self.__time_reference = time.perf_counter()
+            self.__time_reference = self.__clock.now()
         else:
             self.__time_reference = time_reference
 
@@ -173,13 +233,35 @@ class TimedCondition(Condition):
         Returns:
             bool: True if the elapsed time is less than the duration, False otherwise.
         """
-        return time.perf_counter() - self.__time_reference < self.__duration
+        return self.__clock.now() - self.__time_reference < self.__duration
+
+    def next_deadline(self, now: float) -> Optional[float]:
+        """
+        Returns the time at which the duration elapses, if it is after now.
+
+        Args:
+            now (float): The current time of the clock, in seconds.
+
+        Returns:
+            Optional[float]: The deadline, in seconds, or None if the duration has already elapsed.
+        """
+        deadline = self.__time_reference + self.__duration
+        return deadline if deadline > now else None
+
+    def _bind_clock(self, clock: Clock) -> None:
+        """
+        Makes the condition read the given clock.
+
+        Args:
+            clock (Clock): The clock to read.
+        """
+        self.__clock = clock
 
     def reset(self) -> None:
         """
         Resets the time reference to the current time.
         """
-        self.__time_reference = time.perf_counter()
+        self.__time_reference = self.__clock.now()
 
 
 class MonitoredStateCondition(Condition, ABC):
@@ -235,6 +317,7 @@ class MonitoredStateCondition(Condition, ABC):
             raise TypeError("value must be a MonitoredState object")
 
         self._monitored_state = value
+        _invalidate_dispatch()
 
 
 class StateEntryDurationCondition(MonitoredStateCondition):
@@ -296,8 +379,21 @@ class StateEntryDurationCondition(MonitoredStateCondition):
         Returns:
         - A bool indicating whether the condition is met.
         """
-        t = time.perf_counter() - self._monitored_state.last_entry_time
-        return self.__duration < time.perf_counter() - self._monitored_state.last_entry_time
+        return self.__duration < self._monitored_state.clock.now() - self._monitored_state.last_entry_time
+
+    def next_deadline(self, now: float) -> Optional[float]:
+        """
+        Returns the time at which the duration since the last entry of the monitored state elapses, if it is after
+        now.
+
+        Parameters:
+        - now: The current time of the clock, in seconds.
+
+        Returns:
+        - The deadline, in seconds, or None if the duration has already elapsed.
+        """
+        deadline = self._monitored_state.last_entry_time + self.__duration
+        return deadline if deadline > now else None
 
 
 class StateEntryCountCondition(MonitoredStateCondition):
@@ -332,6 +428,16 @@ class StateEntryCountCondition(MonitoredStateCondition):
         self.__auto_reset: bool = auto_reset
         self.__expected_count: int = expected_count
 
+    @property
+    def expected_count(self) -> int:
+        """The number of entry counts to check for."""
+        return self.__expected_count
+
+    @property
+    def auto_reset(self) -> bool:
+        """Whether or not the entry count is automatically reset when the Condition is met."""
+        return self.__auto_reset
+
     def compare(self) -> bool:
         """Compares the monitored State's entry count with the expected count.
 
@@ -386,6 +492,7 @@ class StateValueCondition(MonitoredStateCondition):
             value (Any): The expected value.
         """
         self.__expected_value = value
+        _invalidate_dispatch()
 
     def compare(self) -> bool:
         """
@@ -417,6 +524,16 @@ class ManyConditions(Condition, ABC):
         super().__init__(inverse)
         self._condition_list = []
 
+    @property
+    def conditions(self) -> List[Condition]:
+        """
+        Returns a copy of the conditions evaluated together, in evaluation order.
+
+        Returns:
+            List[Condition]: The conditions.
+        """
+        return self._condition_list[:]
+
     def add_condition(self, condition) -> None:
         """
         Adds a single condition to the ManyConditions object.
@@ -451,6 +568,30 @@ class ManyConditions(Condition, ABC):
                 raise TypeError("All elements of condition_list must be Condition objects.")
             self._condition_list.append(condition)
 
+    def next_deadline(self, now: float) -> Optional[float]:
+        """
+        Returns the earliest deadline of the conditions.
+
+        Args:
+            now (float): The current time of the clock, in seconds.
+
+        Returns:
+            Optional[float]: The earliest deadline, in seconds, or None if no condition depends on time.
+        """
+        deadlines = [deadline for deadline in (condition.next_deadline(now) for condition in self._condition_list)
+                     if deadline is not None]
+        return min(deadlines, default=None)
+
+    def _bind_clock(self, clock: Clock) -> None:
+        """
+        Makes every condition read the given clock.
+
+        Args:
+            clock (Clock): The clock to read.
+        """
+        for condition in self._condition_list:
+            condition._bind_clock(clock)
+
 
 class AllConditions(ManyConditions):
     """
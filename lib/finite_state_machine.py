@@ -1,12 +1,13 @@
+import threading
 from typing import Optional
 
+from lib.clock import Clock, default_clock
 from lib.operational_state import OperationalState
+from lib.run_stats import RunStats
 from lib.layout import Layout
 from lib.state import State
 from lib.transition import Transition
 
-from time import perf_counter
-
 
 class FiniteStateMachine:
     """
@@ -16,23 +17,47 @@ class FiniteStateMachine:
         __current_operational_state (OperationalState): The current operational state of the state machine.
         __current_applicative_state (Optional[State]): The current applicative state of the state machine.
         __layout (Layout): The layout of the state machine.
+        __clock (Clock): The clock read by the run loop and by the time-based components of the layout.
+        __wakeup (threading.Event): Set by notify() to end a sleep of the run loop early.
+        __quiescent (bool): Whether the current applicative state is quiescent, in which case track() returns
+            without doing anything until the state machine changes state or is notified.
+        __micro_steps (int): The maximum number of transitions taken in one tick.
     """
     # __current_operational_state: OperationalState
     # __current_applicative_state: Optional[State]
     # __layout: Layout
+    # __clock: Clock
+    # __wakeup: threading.Event
+    # __quiescent: bool
+    # __micro_steps: int
 
-    def __init__(self, layout: Layout, uninitialized: bool = True) -> None:
+    def __init__(self, layout: Layout, uninitialized: bool = True, clock: Optional[Clock] = None,
+                 micro_steps: int = 1) -> None:
         """
         Initializes a new instance of the FiniteStateMachine class.
 
         Args:
             layout (Layout): The layout of the state machine.
             uninitialized (bool, optional): Whether to leave the state machine uninitialized. Defaults to True.
+            clock (Clock, optional): The clock of the state machine. When given, every monitored state, monitored
+                transition and timed condition of the layout is bound to it. Defaults to the default clock, in which
+                case the layout is left untouched.
+            micro_steps (int, optional): The maximum number of transitions taken in one tick (see track()). Defaults
+                to 1, one transition per tick.
         """
         if not isinstance(layout, Layout):
             raise TypeError('layout must be of type Layout')
+        if not isinstance(clock, Clock) and clock is not None:
+            raise TypeError('clock must be of type Clock')
 
         self.__layout = layout
+        self.__wakeup = threading.Event()
+        self.__quiescent = False
+        self.micro_steps = micro_steps
+        if clock is None:
+            self.__clock = default_clock()
+        else:
+            self.clock = clock
         if uninitialized:
             self.__current_applicative_state = None
             self.__current_operational_state = OperationalState.UNINITIALIZED
@@ -49,6 +74,136 @@ class FiniteStateMachine:
         """
         return self.__current_operational_state
 
+    @property
+    def layout(self) -> Layout:
+        """
+        Returns the layout of the state machine.
+
+        Returns:
+            Layout: The layout of the state machine.
+        """
+        return self.__layout
+
+    @property
+    def clock(self) -> Clock:
+        """
+        Returns the clock of the state machine.
+
+        Returns:
+            Clock: The clock of the state machine.
+        """
+        return self.__clock
+
+    @clock.setter
+    def clock(self, clock: Clock) -> None:
+        """
+        Sets the clock of the state machine and binds every time-based component of its layout to it.
+
+        Args:
+            clock (Clock): The new clock.
+        """
+        if not isinstance(clock, Clock):
+            raise TypeError('clock must be of type Clock')
+
+        self.__clock = clock
+        for state in self.__layout.traverse():
+            state._bind_clock(clock)
+
+    def next_deadline(self, now: float) -> Optional[float]:
+        """
+        Returns the earliest time after now at which a transition from the current applicative state may start
+        transiting on its own.
+
+        Args:
+            now (float): The current time of the clock, in seconds.
+
+        Returns:
+            Optional[float]: The deadline, in seconds, or None if there is no current state or no timed transition.
+        """
+        state = self.current_applicative_state
+        if state is None:
+            return None
+        return state.next_deadline(now)
+
+    @property
+    def micro_steps(self) -> int:
+        """
+        Returns the maximum number of transitions taken in one tick.
+
+        Returns:
+            int: The maximum number of transitions taken in one tick.
+        """
+        return self.__micro_steps
+
+    @micro_steps.setter
+    def micro_steps(self, micro_steps: int) -> None:
+        """
+        Sets the maximum number of transitions taken in one tick. With more than one, track() runs to completion: after
+        a transition, it keeps following the transitions enabled in the new state, so that the states that only
+        branch do not cost a tick each.
+
+        Args:
+            micro_steps (int): The maximum number of transitions taken in one tick.
+
+        Raises:
+            ValueError: If micro_steps is not strictly positive.
+        """
+        if not isinstance(micro_steps, int):
+            raise TypeError('micro_steps must be of type int')
+        if micro_steps <= 0:
+            raise ValueError('micro_steps must be strictly positive')
+        self.__micro_steps = micro_steps
+
+    @property
+    def is_quiescent(self) -> bool:
+        """
+        Returns True if the state machine sits in a quiescent state (see State.is_quiescent), in which case track()
+        does nothing until transit_to() or notify() is called.
+
+        Returns:
+            bool: True if the state machine is quiescent, False otherwise.
+        """
+        return self.__quiescent
+
+    @staticmethod
+    def _is_quiescent_state(state: State) -> bool:
+        """
+        Returns True if the state machine can stop ticking while it sits in the given state. Terminal states are never
+        quiescent, since the next tick reports them.
+
+        Args:
+            state (State): The state.
+
+        Returns:
+            bool: True if the state is quiescent and not terminal, False otherwise.
+        """
+        return state.is_quiescent and not state.is_terminal
+
+    @property
+    def has_pending_work(self) -> bool:
+        """
+        Returns False if a tick would do nothing: the state machine is uninitialized, has reached a terminal state, or
+        sits in a quiescent state (see State.is_quiescent). Schedulers skip the machines without pending work.
+
+        Returns:
+            bool: True if the state machine needs to be ticked, False otherwise.
+        """
+        if self.__quiescent:
+            return False
+        operational_state = self.__current_operational_state
+        return operational_state is not OperationalState.UNINITIALIZED \
+            and operational_state is not OperationalState.TERMINAL_REACHED
+
+    def _set_operational_state(self, operational_state: OperationalState) -> None:
+        """
+        Sets the operational state of the state machine. Used by the engines derived from this class, which keep
+        their own applicative state.
+
+        Args:
+            operational_state (OperationalState): The new operational state.
+        """
+        self.__current_operational_state = operational_state
+
     @property
     def current_applicative_state(self) -> State:
         """
@@ -65,6 +220,7 @@ class FiniteStateMachine:
         """
         self.__current_operational_state = OperationalState.IDLE
         self.__current_applicative_state = self.__layout.initial_state
+        self.__quiescent = self._is_quiescent_state(self.__current_applicative_state)
         self.current_applicative_state._exec_entering_action()
 
     def _transit_by(self, transition: Transition) -> None:
@@ -80,6 +236,7 @@ class FiniteStateMachine:
         self.current_applicative_state._exec_exiting_action()
         transition._exec_transiting_action()
         self.__current_applicative_state = transition.next_state
+        self.__quiescent = self._is_quiescent_state(self.__current_applicative_state)
         self.current_applicative_state._exec_entering_action()
 
     def transit_to(self, state: State) -> None:
@@ -94,16 +251,26 @@ class FiniteStateMachine:
 
         self.current_applicative_state._exec_exiting_action()
         self.__current_applicative_state = state
+        self.__quiescent = self._is_quiescent_state(state)
         self.current_applicative_state._exec_entering_action()
 
     def track(self) -> bool:
         """
         Advances the state machine by one step and returns True if the state machine has not reached a terminal state,
-        and False otherwise.
+        and False otherwise. Does nothing while the state machine is quiescent (see is_quiescent).
+
+        A tick either takes the first enabled transition of the current state or runs its in-state action. With
+        micro_steps above 1, a tick that takes a transition keeps taking the enabled transitions of the states it
+        reaches, up to micro_steps transitions. It stops early on a terminal or quiescent state, on a state without
+        enabled transition, or on a state already entered during the tick, so that a loop of always-enabled
+        transitions still ends the tick.
 
         Returns:
             bool: True if the state machine has not reached a terminal state, and False otherwise.
         """
+        if self.__quiescent:
+            return True
+
         if self.__current_operational_state == OperationalState.UNINITIALIZED:
             raise RuntimeError("The finite state machine is UNINITIALIZED. You cannot track an UNINITIALIZED state machine")
 
@@ -111,42 +278,200 @@ class FiniteStateMachine:
             self.__current_operational_state = OperationalState.TERMINAL_REACHED
             return False
 
-        transition = self.current_applicative_state.is_transiting
-        if transition is not None:
-            self._transit_by(transition)
-        else:
-            self.current_applicative_state._exec_in_state_action()
+        state = self.current_applicative_state
+        transition = state.is_transiting
+        if transition is None:
+            state._exec_in_state_action()
+            return True
 
+        self._transit_by(transition)
+        if self.__micro_steps > 1:
+            self.__run_to_completion(state)
         return True
 
-    def run(self, reset: bool = True, time_budget: float = None) -> None:
+    def __run_to_completion(self, start_state: State) -> None:
+        """
+        Takes the enabled transitions that follow the first transition of a tick, up to micro_steps transitions in
+        total (see track()).
+
+        Args:
+            start_state (State): The state the tick started in.
+        """
+        visited = {start_state}
+        for _ in range(self.__micro_steps - 1):
+            state = self.current_applicative_state
+            if state in visited or state.is_terminal or self.__quiescent:
+                return
+            visited.add(state)
+            transition = state.is_transiting
+            if transition is None:
+                return
+            self._transit_by(transition)
+
+    def run(self, reset: bool = True, time_budget: float = None, idle_sleep: bool = False,
+            min_tick_rate: float = 50.0, tick_hz: Optional[float] = None,
+            spin_time: float = 0.001, tick_budget: Optional[int] = None) -> Optional[RunStats]:
         """
-        Runs the state machine until a terminal state is reached or the time budget is exceeded.
+        Runs the state machine until a terminal state is reached or the time or tick budget is exceeded. The time
+        budget is measured on the clock of the state machine, which may skip ahead between two ticks (see
+        Clock.idle()).
+
+        By default, the state machine is ticked as fast as possible. With idle_sleep, a tick that does not change the
+        applicative state is followed by a sleep until the next deadline of the current state, until notify() is
+        called, or for at most 1 / min_tick_rate seconds, whichever comes first.
+
+        With tick_hz, the state machine is ticked at a fixed rate instead. The run loop sleeps until shortly before
+        each tick, then busy-waits for the last spin_time seconds to start the tick on time, and the timing of every
+        tick is recorded in the returned RunStats.
 
         Args:
             reset (bool, optional): Whether to reset the state machine before running. Defaults to True.
             time_budget (float, optional): The maximum time to run the state machine, in seconds. Defaults to None.
+            idle_sleep (bool, optional): Whether to sleep between ticks while nothing is due. Defaults to False.
+            min_tick_rate (float, optional): With idle_sleep, the minimum number of ticks per second, so that polled
+                inputs are still read. Defaults to 50.0.
+            tick_hz (float, optional): The fixed number of ticks per second, or None to tick as fast as possible or
+                as idle_sleep allows. Defaults to None.
+            spin_time (float, optional): With tick_hz, how long to busy-wait before each tick, in seconds.
+                Defaults to 0.001.
+            tick_budget (int, optional): The maximum number of ticks, or None for no limit. Defaults to None.
+
+        Returns:
+            Optional[RunStats]: The timing statistics of the run with tick_hz, None otherwise.
+
+        Raises:
+            ValueError: If both idle_sleep and tick_hz are given, or if a rate or duration is out of range.
         """
         if not isinstance(reset, bool):
             raise TypeError('reset must be of type bool')
         if not isinstance(time_budget, float) and time_budget is not None:
             raise TypeError('time_budget must be of type float')
+        if not isinstance(idle_sleep, bool):
+            raise TypeError('idle_sleep must be of type bool')
+        if not isinstance(min_tick_rate, (float, int)):
+            raise TypeError('min_tick_rate must be of type float')
+        if min_tick_rate <= 0:
+            raise ValueError('min_tick_rate must be strictly positive')
+        if not isinstance(tick_hz, (float, int)) and tick_hz is not None:
+            raise TypeError('tick_hz must be of type float')
+        if tick_hz is not None and tick_hz <= 0:
+            raise ValueError('tick_hz must be strictly positive')
+        if tick_hz is not None and idle_sleep:
+            raise ValueError('idle_sleep and tick_hz cannot be used together')
+        if not isinstance(spin_time, (float, int)):
+            raise TypeError('spin_time must be of type float')
+        if spin_time < 0:
+            raise ValueError('spin_time must be positive')
+        if not isinstance(tick_budget, int) and tick_budget is not None:
+            raise TypeError('tick_budget must be of type int')
+        if tick_budget is not None and tick_budget <= 0:
+            raise ValueError('tick_budget must be strictly positive')
 
         self.__current_operational_state = OperationalState.RUNNING
 
         if reset:
             self.reset()
 
-        start_time = perf_counter()
+        if tick_hz is not None:
+            return self.__run_fixed_rate(time_budget, tick_budget, 1.0 / tick_hz, spin_time)
+
+        clock = self.__clock
+        idle, next_deadline = clock.idle, self.next_deadline
+        max_sleep = 1.0 / min_tick_rate
+        start_time = clock.now()
+        previous_state = self.current_applicative_state
+        tick_count = 0
 
         while self.track():
-            cur_time = perf_counter()
+            cur_time = clock.now()
             elapsed_time = cur_time - start_time
+            tick_count += 1
 
             if time_budget is not None:
                 if elapsed_time >= time_budget:
                     self.stop()
                     break
+            if tick_budget is not None:
+                if tick_count >= tick_budget:
+                    self.stop()
+                    break
+
+            if not idle_sleep:
+                idle(next_deadline)
+                continue
+
+            current_state = self.current_applicative_state
+            if current_state is previous_state:
+                wake_time = cur_time + max_sleep
+                deadline = next_deadline(cur_time)
+                if deadline is not None and deadline < wake_time:
+                    wake_time = deadline
+                if time_budget is not None and start_time + time_budget < wake_time:
+                    wake_time = start_time + time_budget
+                clock.sleep_until(wake_time, self.__wakeup)
+                self.__wakeup.clear()
+            previous_state = current_state
+
+        return None
+
+    def __run_fixed_rate(self, time_budget: Optional[float], tick_budget: Optional[int], period: float,
+                         spin_time: float) -> RunStats:
+        """
+        Ticks the state machine every period seconds until a terminal state is reached or the time or tick budget is
+        exceeded.
+
+        Args:
+            time_budget (Optional[float]): The maximum time to run the state machine, in seconds.
+            tick_budget (Optional[int]): The maximum number of ticks.
+            period (float): The time between two ticks, in seconds.
+            spin_time (float): How long to busy-wait before each tick, in seconds.
+
+        Returns:
+            RunStats: The timing statistics of the run.
+        """
+        clock = self.__clock
+        stats = RunStats(period)
+        start_time = clock.now()
+        next_tick = start_time
+
+        while True:
+            clock.sleep_until(next_tick, spin=spin_time)
+            tick_start = clock.now()
+            running = self.track()
+            tick_end = clock.now()
+            stats.record_tick(tick_start - next_tick, tick_end - tick_start)
+
+            if not running:
+                break
+
+            next_tick += period
+            if tick_end > next_tick:
+                skipped = int((tick_end - next_tick) // period)
+                next_tick += skipped * period
+                stats.record_overrun(skipped)
+
+            if time_budget is not None and next_tick - start_time >= time_budget:
+                self.stop()
+                break
+            if tick_budget is not None and stats.tick_count >= tick_budget:
+                self.stop()
+                break
+
+        stats.record_elapsed_time(clock.now() - start_time)
+        return stats
+
+    def notify(self) -> None:
+        """
+        Wakes up the run loop if it is sleeping (see run()). Can be called from any thread, for instance when an
+        external event changes what the conditions of the current state read.
+
+        A quiescent state machine is woken up too if its current state is no longer quiescent, for instance because a
+        transition was added to it.
+        """
+        state = self.current_applicative_state
+        if state is not None:
+            self.__quiescent = self._is_quiescent_state(state)
+        self.__wakeup.set()
 
     def stop(self) -> None:
         """
@@ -1,6 +1,10 @@
-from typing import Optional, Set
+from collections import deque
+from typing import Optional, Set, List, FrozenSet, TYPE_CHECKING
 from lib.state import State
 
+if TYPE_CHECKING:
+    from lib.compiled_finite_state_machine import CompiledLayout
+
 
 class Layout:
     # __states: set[State]
@@ -62,6 +66,72 @@ class Layout:
 
         self.__states = self.__states.union(states)
 
+    @property
+    def states(self) -> FrozenSet[State]:
+        """
+        Gets the states that were added to the layout.
+
+        Returns:
+            A FrozenSet[State] of the layout states.
+        """
+
+        return frozenset(self.__states)
+
+    def traverse(self) -> List[State]:
+        """
+        Lists every state of the layout, including the states that are only reachable
+        through transitions and were never added explicitly.
+
+        The initial state comes first, followed by the states reachable from it in
+        breadth-first order of their transitions. States that are not reachable from
+        the initial state come last.
+
+        Returns:
+            A List[State] without duplicates.
+        """
+
+        ordered = []
+        visited = set()
+        roots = [] if self.__initial_state is None else [self.__initial_state]
+        roots.extend(self.__states)
+
+        for root in roots:
+            if root in visited:
+                continue
+            visited.add(root)
+            queue = deque((root,))
+            while queue:
+                state = queue.popleft()
+                ordered.append(state)
+                for transition in state.transitions:
+                    next_state = transition.next_state
+                    if next_state is not None and next_state not in visited:
+                        visited.add(next_state)
+                        queue.append(next_state)
+
+        return ordered
+
+    def compile(self) -> 'CompiledLayout':
+        """
+        Freezes the layout into an integer-indexed transition table.
+
+        The layout must be fully built before being compiled: transitions and
+        conditions added afterwards are not seen by the compiled table.
+
+        Returns:
+            A CompiledLayout built from the layout.
+
+        Raises:
+            ValueError: If the layout is not valid.
+        """
+
+        from lib.compiled_finite_state_machine import CompiledLayout
+
+        if not self.is_valid():
+            raise ValueError("the layout must be valid to be compiled")
+
+        return CompiledLayout(self)
+
     @property
     def initial_state(self) -> Optional[State]:
         """
@@ -0,0 +1,520 @@
+import threading
+from typing import Any, Callable, Dict, Optional, Tuple
+
+from lib.clock import Clock, default_clock
+from lib.condition import Condition, AlwaysTrueCondition, StateValueCondition, StateEntryDurationCondition, \
+    StateEntryCountCondition, AllConditions, AnyConditions, NoneConditions
+from lib.finite_state_machine import FiniteStateMachine
+from lib.layout import Layout
+from lib.operational_state import OperationalState
+from lib.state import State, MonitoredState
+from lib.transition import Transition, ConditionalTransition, MonitoredTransition
+
+# Evaluates a condition against the runtime state of one instance.
+_Evaluator = Callable[['MachineInstance'], bool]
+
+_active = threading.local()
+
+
+def current_instance() -> Optional['MachineInstance']:
+    """
+    Returns the instance whose actions are running on this thread, or None outside of the actions of a LayoutSpec.
+
+    The actions of a LayoutSpec are shared by all its instances, so they reach the data of the instance they act for,
+    such as the robot it drives, through current_instance().context.
+    """
+    return getattr(_active, 'instance', None)
+
+
+class MachineInstance:
+    """
+    The runtime state of one state machine backed by a LayoutSpec: its current state and the monitoring data of its
+    states and transitions, indexed by state id and transition index. Everything else is shared through the spec.
+
+    Attributes:
+        spec (LayoutSpec): The spec the instance runs.
+        context (Any): Data of the instance, for the shared actions (see current_instance()).
+        state_id (int): The state id of the current state.
+        operational_state (OperationalState): The operational state of the instance.
+        entry_counts (List[int]): The number of times each state was entered.
+        entry_times (List[float]): The time each state was last entered, in seconds.
+        exit_times (List[float]): The time each state was last exited, in seconds.
+        custom_values (List[Any]): The custom value of each state (see MonitoredState.custom_value).
+        transit_counts (List[int]): The number of times each transition was taken.
+        transit_times (List[float]): The time each transition was last taken, in seconds.
+    """
+    __slots__ = ('spec', 'context', 'state_id', 'operational_state', 'entry_counts', 'entry_times', 'exit_times',
+                 'custom_values', 'transit_counts', 'transit_times')
+
+    def __init__(self, spec: 'LayoutSpec', context: Any = None) -> None:
+        state_count = len(spec.states)
+        transition_count = len(spec.transitions)
+        self.spec = spec
+        self.context = context
+        self.state_id = spec.initial_state_id
+        self.operational_state = OperationalState.UNINITIALIZED
+        self.entry_counts = [0] * state_count
+        self.entry_times = [0.0] * state_count
+        self.exit_times = [0.0] * state_count
+        self.custom_values = [None] * state_count
+        self.transit_counts = [0] * transition_count
+        self.transit_times = [0.0] * transition_count
+
+    @property
+    def current_applicative_state(self) -> State:
+        """
+        Returns the current state of the instance.
+        """
+        return self.spec.states[self.state_id]
+
+    @property
+    def has_pending_work(self) -> bool:
+        """
+        Returns False if a tick would do nothing, like FiniteStateMachine.has_pending_work.
+        """
+        return self.spec.has_pending_work(self)
+
+    def reset(self) -> None:
+        """
+        Puts the instance in the initial state (see LayoutSpec.reset()).
+        """
+        self.spec.reset(self)
+
+    def track(self) -> bool:
+        """
+        Advances the instance by one step (see LayoutSpec.track()).
+        """
+        return self.spec.track(self)
+
+    def transit_to(self, state: State) -> None:
+        """
+        Moves the instance to the given state (see LayoutSpec.transit_to()).
+        """
+        self.spec.transit_to(self, state)
+
+    def custom_value(self, state: State) -> Any:
+        """
+        Returns the custom value of the given state.
+        """
+        return self.custom_values[self.spec.state_id(state)]
+
+    def set_custom_value(self, state: State, value: Any) -> None:
+        """
+        Sets the custom value of the given state, read by the StateValueConditions monitoring it.
+        """
+        self.custom_values[self.spec.state_id(state)] = value
+
+    def entry_count(self, state: State) -> int:
+        """
+        Returns the number of times the given state was entered.
+        """
+        return self.entry_counts[self.spec.state_id(state)]
+
+    def last_entry_time(self, state: State) -> float:
+        """
+        Returns the time the given state was last entered, in seconds.
+        """
+        return self.entry_times[self.spec.state_id(state)]
+
+    def last_exit_time(self, state: State) -> float:
+        """
+        Returns the time the given state was last exited, in seconds.
+        """
+        return self.exit_times[self.spec.state_id(state)]
+
+    def transit_count(self, transition: Transition) -> int:
+        """
+        Returns the number of times the given transition was taken.
+        """
+        return self.transit_counts[self.spec.transition_index(transition)]
+
+
+class LayoutSpec:
+    """
+    A frozen Layout shared by many lightweight state machines, each one a MachineInstance.
+
+    The spec holds everything that is the same for every instance: the states and transitions, the compiled
+    conditions and the actions. An instance holds only what a FiniteStateMachine would record in the MonitoredState
+    and MonitoredTransition objects of its layout: the current state, the entry and exit times, the entry and transit
+    counts and the custom values. An instance behaves like a FiniteStateMachine running the layout on its own: the
+    same actions run in the same order, the conditions see the data of the instance, and track() follows the same
+    rules, micro_steps and quiescent states included.
+
+    The actions are those of the layout, run as they are for every instance. They tell the instances apart through
+    current_instance(). The bookkeeping of the monitored states and transitions of the layout is not used: the
+    layout objects are not modified by the instances.
+
+    Only the built-in conditions are supported, like BatchFiniteStateMachine: AlwaysTrueCondition, StateValueCondition,
+    StateEntryDurationCondition, StateEntryCountCondition and the All, Any and None compositions of those.
+
+    Attributes:
+        __states (Tuple[State, ...]): The states, indexed by state id.
+        __state_ids (Dict[State, int]): The state id of every state.
+        __initial_state_id (int): The state id of the initial state.
+        __transitions (Tuple[Transition, ...]): The transitions, in CompiledLayout order.
+        __transition_indices (Dict[Transition, int]): The index of every transition.
+        __clock (Clock): The clock shared by every instance.
+        __micro_steps (int): The maximum number of transitions taken in one tick.
+        __terminal (Tuple[bool, ...]): Whether each state is terminal.
+        __quiescent (Tuple[bool, ...]): Whether an instance can stop ticking in each state.
+        __entering_actions (Tuple[Tuple[Callable[[], None], ...], ...]): The entering callables of each state.
+        __in_state_actions (Tuple[Callable[[], None], ...]): The in-state action of each state.
+        __exiting_actions (Tuple[Tuple[Callable[[], None], ...], ...]): The exiting callables of each state.
+        __transiting_actions (Tuple[Callable[[], None], ...]): The transiting action of each transition.
+        __next_state_ids (Tuple[int, ...]): The state id each transition leads to.
+        __rows (Tuple[Tuple[Tuple[_Evaluator, int], ...], ...]): The (evaluator, transition index) pairs of every
+            state, in evaluation order.
+    """
+
+    def __init__(self, layout: Layout, clock: Optional[Clock] = None, micro_steps: int = 1) -> None:
+        """
+        Freezes the given layout. The layout must be fully built: changes made afterwards are not seen by the spec.
+
+        Args:
+            layout (Layout): The layout shared by every instance.
+            clock (Clock, optional): The clock shared by every instance. Defaults to the default clock.
+            micro_steps (int, optional): The maximum number of transitions taken in one tick (see
+                FiniteStateMachine.track()). Defaults to 1.
+
+        Raises:
+            TypeError: If an argument has the wrong type, or a state, transition or condition of the layout is not
+                supported.
+            ValueError: If the layout is not valid, micro_steps is not strictly positive, or a condition monitors a
+                state outside of the layout.
+        """
+        if not isinstance(layout, Layout):
+            raise TypeError('layout must be of type Layout')
+        if not isinstance(clock, Clock) and clock is not None:
+            raise TypeError('clock must be of type Clock')
+        if not isinstance(micro_steps, int):
+            raise TypeError('micro_steps must be of type int')
+        if micro_steps <= 0:
+            raise ValueError('micro_steps must be strictly positive')
+
+        compiled_layout = layout.compile()
+        states = compiled_layout.states
+        transitions = compiled_layout.transitions
+        for state in states:
+            if type(state)._exec_entering_action not in (State._exec_entering_action,
+                                                         MonitoredState._exec_entering_action) \
+                    or type(state)._exec_exiting_action not in (State._exec_exiting_action,
+                                                                MonitoredState._exec_exiting_action):
+                raise TypeError(f'{type(state).__name__} is not supported by LayoutSpec')
+
+        self.__states: Tuple[State, ...] = states
+        self.__state_ids: Dict[State, int] = {state: state_id for state_id, state in enumerate(states)}
+        self.__initial_state_id = compiled_layout.initial_state_id
+        self.__transitions: Tuple[Transition, ...] = transitions
+        self.__transition_indices: Dict[Transition, int] = {transition: index
+                                                            for index, transition in enumerate(transitions)}
+        self.__clock = default_clock() if clock is None else clock
+        self.__micro_steps = micro_steps
+
+        self.__terminal = compiled_layout.terminal
+        self.__quiescent = tuple(FiniteStateMachine._is_quiescent_state(state) for state in states)
+        self.__entering_actions = tuple(
+            (state._do_entering_action, state._exec_in_state_action)
+            if state.parameters.do_in_state_action_when_entering else (state._do_entering_action,)
+            for state in states)
+        self.__in_state_actions = tuple(state._exec_in_state_action for state in states)
+        self.__exiting_actions = tuple(
+            (state._exec_in_state_action, state._do_exiting_action)
+            if state.parameters.do_in_state_action_when_exiting else (state._do_exiting_action,)
+            for state in states)
+        self.__transiting_actions = tuple(transition._do_transiting_action for transition in transitions)
+        self.__next_state_ids = compiled_layout.next_state_ids
+
+        start = compiled_layout.transition_start
+        evaluators = tuple(self.__compile_transition(transition) for transition in transitions)
+        self.__rows = tuple(tuple((evaluators[index], index) for index in range(start[state_id], start[state_id + 1]))
+                            for state_id in range(len(states)))
+
+    @property
+    def states(self) -> Tuple[State, ...]:
+        """
+        Returns the states, indexed by state id.
+        """
+        return self.__states
+
+    @property
+    def transitions(self) -> Tuple[Transition, ...]:
+        """
+        Returns the transitions, indexed by transition index.
+        """
+        return self.__transitions
+
+    @property
+    def initial_state_id(self) -> int:
+        """
+        Returns the state id of the initial state.
+        """
+        return self.__initial_state_id
+
+    @property
+    def clock(self) -> Clock:
+        """
+        Returns the clock shared by every instance.
+        """
+        return self.__clock
+
+    @property
+    def micro_steps(self) -> int:
+        """
+        Returns the maximum number of transitions taken in one tick (see FiniteStateMachine.track()).
+        """
+        return self.__micro_steps
+
+    def state_id(self, state: State) -> int:
+        """
+        Returns the state id of the given state.
+
+        Raises:
+            ValueError: If the state is not part of the layout.
+        """
+        try:
+            return self.__state_ids[state]
+        except KeyError:
+            raise ValueError('state must be part of the layout') from None
+
+    def transition_index(self, transition: Transition) -> int:
+        """
+        Returns the index of the given transition.
+
+        Raises:
+            ValueError: If the transition is not part of the layout.
+        """
+        try:
+            return self.__transition_indices[transition]
+        except KeyError:
+            raise ValueError('transition must be part of the layout') from None
+
+    def instantiate(self, context: Any = None, reset: bool = True) -> MachineInstance:
+        """
+        Creates a new instance of the spec.
+
+        Args:
+            context (Any, optional): Data of the instance, for the shared actions (see current_instance()). Defaults
+                to None.
+            reset (bool, optional): Whether to reset the instance, which runs the entering action of the initial
+                state. Otherwise, the instance is left uninitialized. Defaults to True.
+
+        Returns:
+            MachineInstance: The new instance.
+        """
+        instance = MachineInstance(self, context)
+        if reset:
+            self.reset(instance)
+        return instance
+
+    def has_pending_work(self, instance: MachineInstance) -> bool:
+        """
+        Returns False if a tick of the given instance would do nothing, like FiniteStateMachine.has_pending_work.
+        """
+        if self.__quiescent[instance.state_id]:
+            return False
+        operational_state = instance.operational_state
+        return operational_state is not OperationalState.UNINITIALIZED \
+            and operational_state is not OperationalState.TERMINAL_REACHED
+
+    def reset(self, instance: MachineInstance) -> None:
+        """
+        Sets the operational state of the given instance to IDLE and enters the initial state, like
+        FiniteStateMachine.reset().
+        """
+        previous = current_instance()
+        _active.instance = instance
+        try:
+            instance.operational_state = OperationalState.IDLE
+            instance.state_id = self.__initial_state_id
+            self.__enter(instance, self.__initial_state_id)
+        finally:
+            _active.instance = previous
+
+    def transit_to(self, instance: MachineInstance, state: State) -> None:
+        """
+        Moves the given instance to the given state, like FiniteStateMachine.transit_to().
+
+        Raises:
+            ValueError: If the state is not part of the layout.
+        """
+        state_id = self.state_id(state)
+        previous = current_instance()
+        _active.instance = instance
+        try:
+            self.__exit(instance, instance.state_id)
+            instance.state_id = state_id
+            self.__enter(instance, state_id)
+        finally:
+            _active.instance = previous
+
+    def track(self, instance: MachineInstance) -> bool:
+        """
+        Advances the given instance by one step, like FiniteStateMachine.track().
+
+        Returns:
+            bool: True if the instance has not reached a terminal state, and False otherwise.
+
+        Raises:
+            RuntimeError: If the instance is uninitialized.
+        """
+        state_id = instance.state_id
+        if self.__quiescent[state_id] and instance.operational_state is not OperationalState.UNINITIALIZED:
+            return True
+
+        if instance.operational_state is OperationalState.UNINITIALIZED:
+            raise RuntimeError("The finite state machine is UNINITIALIZED. You cannot track an UNINITIALIZED state machine")
+
+        if self.__terminal[state_id]:
+            instance.operational_state = OperationalState.TERMINAL_REACHED
+            return False
+
+        previous = current_instance()
+        _active.instance = instance
+        try:
+            index = self.__enabled_transition(instance, state_id)
+            if index < 0:
+                self.__in_state_actions[state_id]()
+                return True
+
+            self.__transit_by(instance, index)
+            if self.__micro_steps > 1:
+                self.__run_to_completion(instance, state_id)
+            return True
+        finally:
+            _active.instance = previous
+
+    def __run_to_completion(self, instance: MachineInstance, start_state_id: int) -> None:
+        """
+        Takes the enabled transitions that follow the first transition of a tick, like
+        FiniteStateMachine.track() does with micro_steps above 1.
+        """
+        visited = {start_state_id}
+        for _ in range(self.__micro_steps - 1):
+            state_id = instance.state_id
+            if state_id in visited or self.__terminal[state_id] or self.__quiescent[state_id]:
+                return
+            visited.add(state_id)
+            index = self.__enabled_transition(instance, state_id)
+            if index < 0:
+                return
+            self.__transit_by(instance, index)
+
+    def __enabled_transition(self, instance: MachineInstance, state_id: int) -> int:
+        """
+        Returns the index of the first enabled transition of the given state, or -1 if there is none.
+        """
+        for evaluate, index in self.__rows[state_id]:
+            if evaluate(instance):
+                return index
+        return -1
+
+    def __transit_by(self, instance: MachineInstance, index: int) -> None:
+        """
+        Moves the given instance along the transition of the given index.
+        """
+        self.__exit(instance, instance.state_id)
+        instance.transit_counts[index] += 1
+        instance.transit_times[index] = self.__clock.now()
+        self.__transiting_actions[index]()
+        state_id = self.__next_state_ids[index]
+        instance.state_id = state_id
+        self.__enter(instance, state_id)
+
+    def __enter(self, instance: MachineInstance, state_id: int) -> None:
+        """
+        Records the entry of the given instance into the given state and runs its entering action.
+        """
+        instance.entry_times[state_id] = self.__clock.now()
+        instance.entry_counts[state_id] += 1
+        for action in self.__entering_actions[state_id]:
+            action()
+
+    def __exit(self, instance: MachineInstance, state_id: int) -> None:
+        """
+        Records the exit of the given instance from the given state and runs its exiting action.
+        """
+        instance.exit_times[state_id] = self.__clock.now()
+        for action in self.__exiting_actions[state_id]:
+            action()
+
+    def __monitored_state_id(self, condition: Condition) -> int:
+        """
+        Returns the state id of the state monitored by the given condition.
+        """
+        if condition.monitored_state not in self.__state_ids:
+            raise ValueError('conditions must monitor states of the layout')
+        return self.__state_ids[condition.monitored_state]
+
+    def __compile_transition(self, transition: Transition) -> _Evaluator:
+        """
+        Returns the evaluator of the condition of the given transition.
+
+        Raises:
+            TypeError: If the transition is not a conditional transition with the default behavior.
+        """
+        if not isinstance(transition, ConditionalTransition) \
+                or type(transition).is_transiting is not ConditionalTransition.is_transiting \
+                or type(transition)._exec_transiting_action not in (Transition._exec_transiting_action,
+                                                                   MonitoredTransition._exec_transiting_action):
+            raise TypeError(f'{type(transition).__name__} is not supported by LayoutSpec')
+        if transition.condition is None:
+            return lambda instance: False
+        return self.__compile_condition(transition.condition)
+
+    def __compile_condition(self, condition: Condition) -> _Evaluator:
+        """
+        Returns the evaluator of the given condition.
+
+        Raises:
+            TypeError: If the condition is not one of the supported built-in conditions.
+        """
+        evaluate = self.__compile_comparison(condition)
+        if condition.inverse:
+            return lambda instance: not evaluate(instance)
+        return evaluate
+
+    def __compile_comparison(self, condition: Condition) -> _Evaluator:
+        """
+        Returns the evaluator of the given condition, before its inverse flag is applied.
+        """
+        condition_type = type(condition)
+
+        if condition_type is AlwaysTrueCondition:
+            return lambda instance: True
+
+        if condition_type is StateValueCondition:
+            state_id = self.__monitored_state_id(condition)
+            return lambda instance: condition.expected_value == instance.custom_values[state_id]
+
+        if condition_type is StateEntryDurationCondition:
+            state_id = self.__monitored_state_id(condition)
+            clock = self.__clock
+            return lambda instance: condition.duration < clock.now() - instance.entry_times[state_id]
+
+        if condition_type is StateEntryCountCondition:
+            state_id = self.__monitored_state_id(condition)
+            expected_count, auto_reset = condition.expected_count, condition.auto_reset
+
+            def evaluate_count(instance: MachineInstance) -> bool:
+                entry_counts = instance.entry_counts
+                if expected_count <= entry_counts[state_id]:
+                    if auto_reset:
+                        entry_counts[state_id] = 0
+                    return True
+                return False
+
+            return evaluate_count
+
+        if condition_type is AllConditions:
+            children = tuple(self.__compile_condition(child) for child in condition.conditions)
+            return lambda instance: all(child(instance) for child in children)
+
+        if condition_type is AnyConditions:
+            children = tuple(self.__compile_condition(child) for child in condition.conditions)
+            return lambda instance: any(child(instance) for child in children)
+
+        if condition_type is NoneConditions:
+            children = tuple(self.__compile_condition(child) for child in condition.conditions)
+            return lambda instance: not any(child(instance) for child in children)
+
+        raise TypeError(f'{condition_type.__name__} is not supported by LayoutSpec')
@@ -0,0 +1,183 @@
+from collections.abc import Sequence
+from enum import Enum, auto
+from typing import Any, Iterator, Optional, Union
+
+
+class OverflowPolicy(Enum):
+    """
+    Defines what a full RingBuffer does with a new item.
+
+    DROP_OLDEST makes room by discarding the oldest item, so the buffer always holds the latest items. DROP_NEWEST
+    discards the new item, so the buffer keeps the items that arrived first. Either way, the discarded items are
+    counted in RingBuffer.dropped_count.
+    """
+    DROP_OLDEST = auto()
+    DROP_NEWEST = auto()
+
+
+class RingBuffer(Sequence):
+    """
+    A first-in first-out queue of fixed capacity, stored in a preallocated list.
+
+    push(), pop(), peek() and peek_last() are O(1) and never allocate. The buffer is itself a read-only sequence
+    indexed from the oldest item, so readers can index or iterate it without copying it.
+
+    Attributes:
+        __items (List[Any]): The storage, of length capacity.
+        __head (int): The index in __items of the oldest item.
+        __size (int): The number of items in the buffer.
+        __overflow_policy (OverflowPolicy): What push() does when the buffer is full.
+        __dropped_count (int): The number of items discarded because the buffer was full.
+    """
+    # __items: List[Any]
+    # __head: int
+    # __size: int
+    # __overflow_policy: OverflowPolicy
+    # __dropped_count: int
+
+    def __init__(self, capacity: int, overflow_policy: OverflowPolicy = OverflowPolicy.DROP_OLDEST) -> None:
+        """
+        Initializes an empty ring buffer.
+
+        Args:
+            capacity (int): The maximum number of items.
+            overflow_policy (OverflowPolicy, optional): What push() does when the buffer is full. Defaults to
+                OverflowPolicy.DROP_OLDEST.
+
+        Raises:
+            TypeError: If capacity is not an int or overflow_policy is not an OverflowPolicy.
+            ValueError: If capacity is not strictly positive.
+        """
+        if not isinstance(capacity, int):
+            raise TypeError('capacity must be of type int')
+        if capacity <= 0:
+            raise ValueError('capacity must be strictly positive')
+        if not isinstance(overflow_policy, OverflowPolicy):
+            raise TypeError('overflow_policy must be of type OverflowPolicy')
+
+        self.__items = [None] * capacity
+        self.__head = 0
+        self.__size = 0
+        self.__overflow_policy = overflow_policy
+        self.__dropped_count = 0
+
+    @property
+    def capacity(self) -> int:
+        """
+        Returns the maximum number of items.
+        """
+        return len(self.__items)
+
+    @property
+    def overflow_policy(self) -> OverflowPolicy:
+        """
+        Returns what push() does when the buffer is full.
+        """
+        return self.__overflow_policy
+
+    @property
+    def dropped_count(self) -> int:
+        """
+        Returns the number of items discarded because the buffer was full.
+        """
+        return self.__dropped_count
+
+    @property
+    def is_full(self) -> bool:
+        """
+        Returns True if the next push() discards an item.
+        """
+        return self.__size == len(self.__items)
+
+    def __len__(self) -> int:
+        return self.__size
+
+    def __getitem__(self, index: Union[int, slice]) -> Any:
+        """
+        Returns the item at the given position, counted from the oldest item, or a list of items for a slice.
+
+        Raises:
+            IndexError: If the index is out of range.
+        """
+        if isinstance(index, slice):
+            return [self[i] for i in range(*index.indices(self.__size))]
+
+        if index < 0:
+            index += self.__size
+        if not 0 <= index < self.__size:
+            raise IndexError('ring buffer index out of range')
+        items = self.__items
+        return items[(self.__head + index) % len(items)]
+
+    def __iter__(self) -> Iterator[Any]:
+        items = self.__items
+        capacity = len(items)
+        head = self.__head
+        for offset in range(self.__size):
+            yield items[(head + offset) % capacity]
+
+    def push(self, item: Any) -> bool:
+        """
+        Adds an item after the newest one. When the buffer is full, the overflow policy decides which item is
+        discarded.
+
+        Args:
+            item (Any): The item to add.
+
+        Returns:
+            bool: True if the item was added, False if it was discarded.
+        """
+        items = self.__items
+        capacity = len(items)
+        if self.__size == capacity:
+            self.__dropped_count += 1
+            if self.__overflow_policy is OverflowPolicy.DROP_NEWEST:
+                return False
+            items[self.__head] = item
+            self.__head = (self.__head + 1) % capacity
+            return True
+
+        items[(self.__head + self.__size) % capacity] = item
+        self.__size += 1
+        return True
+
+    def pop(self) -> Optional[Any]:
+        """
+        Removes and returns the oldest item, or returns None if the buffer is empty.
+        """
+        if self.__size == 0:
+            return None
+
+        items = self.__items
+        item = items[self.__head]
+        items[self.__head] = None
+        self.__head = (self.__head + 1) % len(items)
+        self.__size -= 1
+        return item
+
+    def peek(self) -> Optional[Any]:
+        """
+        Returns the oldest item without removing it, or None if the buffer is empty.
+        """
+        if self.__size == 0:
+            return None
+        return self.__items[self.__head]
+
+    def peek_last(self) -> Optional[Any]:
+        """
+        Returns the newest item without removing it, or None if the buffer is empty.
+        """
+        if self.__size == 0:
+            return None
+        items = self.__items
+        return items[(self.__head + self.__size - 1) % len(items)]
+
+    def clear(self) -> None:
+        """
+        Removes every item. The dropped count is kept.
+        """
+        items = self.__items
+        for i in range(len(items)):
+            items[i] = None
+        self.__head = 0
+        self.__size = 0
@@ -0,0 +1,169 @@
+from concurrent.futures import ProcessPoolExecutor
+from itertools import repeat
+import os
+from typing import Any, Callable, Iterable, List, NamedTuple, Optional, Tuple
+
+from lib.finite_state_machine import FiniteStateMachine
+from lib.operational_state import OperationalState
+from lib.run_stats import RunStats
+from lib.state import MonitoredState
+from lib.transition import MonitoredTransition
+
+
+class StateMetrics(NamedTuple):
+    """
+    The metrics of a MonitoredState at the end of a run.
+
+    Attributes:
+        state_index (int): The index of the state in Layout.traverse() order.
+        entry_count (int): The number of times the state was entered.
+        last_entry_time (float): The time at which the state was last entered.
+        last_exit_time (float): The time at which the state was last exited.
+    """
+    state_index: int
+    entry_count: int
+    last_entry_time: float
+    last_exit_time: float
+
+
+class TransitionMetrics(NamedTuple):
+    """
+    The metrics of a MonitoredTransition at the end of a run.
+
+    Attributes:
+        state_index (int): The index of the state the transition leaves, in Layout.traverse() order.
+        transition_index (int): The index of the transition among the transitions of that state.
+        transit_count (int): The number of times the transition was taken.
+        last_transit_time (float): The time at which the transition was last taken.
+    """
+    state_index: int
+    transition_index: int
+    transit_count: int
+    last_transit_time: float
+
+
+class RunResult(NamedTuple):
+    """
+    The outcome of one run of run_many().
+
+    Attributes:
+        parameters (Any): The parameters the state machine was built from.
+        final_state_index (Optional[int]): The index of the final applicative state in Layout.traverse() order, or
+            None if there is none.
+        operational_state (OperationalState): The operational state at the end of the run.
+        elapsed_time (float): The duration of the run, measured on the clock of the state machine.
+        states (Tuple[StateMetrics, ...]): The metrics of the monitored states, in Layout.traverse() order.
+        transitions (Tuple[TransitionMetrics, ...]): The metrics of the monitored transitions, in Layout.traverse()
+            order.
+        stats (Optional[RunStats]): The timing statistics of the run when it ran at a fixed rate, None otherwise.
+    """
+    parameters: Any
+    final_state_index: Optional[int]
+    operational_state: OperationalState
+    elapsed_time: float
+    states: Tuple[StateMetrics, ...]
+    transitions: Tuple[TransitionMetrics, ...]
+    stats: Optional[RunStats]
+
+
+def collect_metrics(fsm: FiniteStateMachine, parameters: Any = None, elapsed_time: float = 0.0,
+                    stats: Optional[RunStats] = None) -> RunResult:
+    """
+    Reads the metrics of the monitored states and transitions of a state machine into a picklable RunResult.
+
+    Args:
+        fsm (FiniteStateMachine): The state machine.
+        parameters (Any, optional): The parameters the state machine was built from. Defaults to None.
+        elapsed_time (float, optional): The duration of the run, in seconds. Defaults to 0.0.
+        stats (RunStats, optional): The timing statistics of the run. Defaults to None.
+
+    Returns:
+        RunResult: The metrics of the state machine.
+    """
+    states = tuple(fsm.layout.traverse())
+    state_metrics = []
+    transition_metrics = []
+    for state_index, state in enumerate(states):
+        if isinstance(state, MonitoredState):
+            state_metrics.append(StateMetrics(state_index, state.entry_count, state.last_entry_time,
+                                              state.last_exit_time))
+        for transition_index, transition in enumerate(state.transitions):
+            if isinstance(transition, MonitoredTransition):
+                transition_metrics.append(TransitionMetrics(state_index, transition_index, transition.transit_count,
+                                                            transition.last_transit_time))
+
+    current_state = fsm.current_applicative_state
+    final_state_index = None if current_state is None else states.index(current_state)
+    return RunResult(parameters, final_state_index, fsm.current_operational_state, elapsed_time,
+                     tuple(state_metrics), tuple(transition_metrics), stats)
+
+
+def _run_one(factory: Callable[[Any], FiniteStateMachine], parameters: Any, run_options: dict) -> RunResult:
+    """
+    Builds a state machine from the given parameters, runs it and collects its metrics. Runs in a worker process.
+
+    Args:
+        factory (Callable[[Any], FiniteStateMachine]): Builds the state machine from the parameters.
+        parameters (Any): The parameters of this run.
+        run_options (dict): The keyword arguments of FiniteStateMachine.run().
+
+    Returns:
+        RunResult: The metrics of the run.
+    """
+    fsm = factory(parameters)
+    if not isinstance(fsm, FiniteStateMachine):
+        raise TypeError('factory must return a FiniteStateMachine')
+
+    start_time = fsm.clock.now()
+    stats = fsm.run(**run_options)
+    return collect_metrics(fsm, parameters, fsm.clock.now() - start_time, stats)
+
+
+def run_many(factory: Callable[[Any], FiniteStateMachine], params: Iterable[Any], workers: Optional[int] = None,
+             time_budget: Optional[float] = None, tick_budget: Optional[int] = None,
+             **run_options) -> List[RunResult]:
+    """
+    Runs one independent state machine per parameter set, spread over a pool of worker processes.
+
+    Each state machine is built in its worker by calling factory(parameters), then run with
+    FiniteStateMachine.run(), and only its metrics travel back to the parent process. The factory and the parameters
+    must therefore be picklable: use a module-level function or a functools.partial of one, not a lambda. Give the
+    state machines a VirtualClock to run simulated time as fast as possible.
+
+    At least one of time_budget and tick_budget should be given unless every state machine reaches a terminal state.
+
+    Args:
+        factory (Callable[[Any], FiniteStateMachine]): Builds a state machine from one parameter set.
+        params (Iterable[Any]): The parameter sets, one per run.
+        workers (int, optional): The number of worker processes. With 1, the runs are done one after the other in the
+            calling process. Defaults to the number of processors.
+        time_budget (float, optional): The maximum time of each run, in seconds. Defaults to None.
+        tick_budget (int, optional): The maximum number of ticks of each run. Defaults to None.
+        **run_options: The other keyword arguments of FiniteStateMachine.run().
+
+    Returns:
+        List[RunResult]: The result of every run, in the order of params.
+
+    Raises:
+        TypeError: If factory is not callable or workers is not an int.
+        ValueError: If workers is not strictly positive.
+    """
+    if not callable(factory):
+        raise TypeError('factory must be callable')
+    if not isinstance(workers, int) and workers is not None:
+        raise TypeError('workers must be of type int')
+    if workers is not None and workers <= 0:
+        raise ValueError('workers must be strictly positive')
+
+    params = list(params)
+    run_options.update(time_budget=time_budget, tick_budget=tick_budget)
+    if workers is None:
+        workers = os.cpu_count() or 1
+    workers = min(workers, len(params))
+
+    if workers <= 1:
+        return [_run_one(factory, parameters, run_options) for parameters in params]
+
+    chunk_size = max(1, len(params) // (workers * 4))
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        return list(executor.map(_run_one, repeat(factory), params, repeat(run_options), chunksize=chunk_size))
@@ -0,0 +1,196 @@
+from bisect import bisect_right
+import math
+from typing import List, Sequence, Tuple
+
+
+class RunStats:
+    """
+    Timing statistics of a fixed-rate run of a state machine (see FiniteStateMachine.run()).
+
+    The jitter of a tick is how late it started compared to its schedule. A tick overruns when it ends after the
+    next tick was due. When a tick ends more than one full period late, the ticks that were missed are skipped
+    rather than run back to back, and counted as skipped.
+
+    Attributes:
+        __period (float): The scheduled time between two ticks, in seconds.
+        __histogram_bounds (Tuple[float, ...]): The upper bounds of the jitter histogram buckets, in seconds.
+        __histogram (List[int]): The number of ticks per jitter bucket. The last bucket counts the ticks above the
+            last bound.
+        __tick_count (int): The number of ticks.
+        __overrun_count (int): The number of ticks that ended after the next tick was due.
+        __skipped_count (int): The number of ticks that were skipped to catch up.
+        __elapsed_time (float): The duration of the run, in seconds.
+    """
+    DEFAULT_HISTOGRAM_BOUNDS = (10e-6, 20e-6, 50e-6, 100e-6, 200e-6, 500e-6, 1e-3, 2e-3, 5e-3, 10e-3)
+
+    def __init__(self, period: float, histogram_bounds: Sequence[float] = DEFAULT_HISTOGRAM_BOUNDS) -> None:
+        """
+        Initializes empty statistics.
+
+        Args:
+            period (float): The scheduled time between two ticks, in seconds.
+            histogram_bounds (Sequence[float], optional): The increasing upper bounds of the jitter histogram
+                buckets, in seconds. Defaults to DEFAULT_HISTOGRAM_BOUNDS, from 10 us to 10 ms.
+
+        Raises:
+            ValueError: If period is not strictly positive or the bounds are not increasing.
+        """
+        if period <= 0:
+            raise ValueError("period must be strictly positive")
+        if any(lower >= upper for lower, upper in zip(histogram_bounds, histogram_bounds[1:])):
+            raise ValueError("histogram_bounds must be increasing")
+
+        self.__period = float(period)
+        self.__histogram_bounds = tuple(histogram_bounds)
+        self.__histogram = [0] * (len(self.__histogram_bounds) + 1)
+        self.__tick_count = 0
+        self.__overrun_count = 0
+        self.__skipped_count = 0
+        self.__elapsed_time = 0.0
+        self.__jitter_sum = 0.0
+        self.__jitter_square_sum = 0.0
+        self.__max_jitter = 0.0
+        self.__duration_sum = 0.0
+        self.__max_duration = 0.0
+
+    @property
+    def period(self) -> float:
+        """
+        The scheduled time between two ticks, in seconds.
+        """
+        return self.__period
+
+    @property
+    def tick_count(self) -> int:
+        """
+        The number of ticks.
+        """
+        return self.__tick_count
+
+    @property
+    def overrun_count(self) -> int:
+        """
+        The number of ticks that ended after the next tick was due.
+        """
+        return self.__overrun_count
+
+    @property
+    def skipped_count(self) -> int:
+        """
+        The number of ticks that were skipped to catch up after an overrun.
+        """
+        return self.__skipped_count
+
+    @property
+    def elapsed_time(self) -> float:
+        """
+        The duration of the run, in seconds.
+        """
+        return self.__elapsed_time
+
+    @property
+    def tick_rate(self) -> float:
+        """
+        The achieved number of ticks per second.
+        """
+        if self.__elapsed_time <= 0.0:
+            return 0.0
+        return self.__tick_count / self.__elapsed_time
+
+    @property
+    def mean_jitter(self) -> float:
+        """
+        The mean lateness of the ticks, in seconds.
+        """
+        if self.__tick_count == 0:
+            return 0.0
+        return self.__jitter_sum / self.__tick_count
+
+    @property
+    def jitter_std(self) -> float:
+        """
+        The standard deviation of the lateness of the ticks, in seconds.
+        """
+        if self.__tick_count == 0:
+            return 0.0
+        mean = self.mean_jitter
+        return math.sqrt(max(self.__jitter_square_sum / self.__tick_count - mean * mean, 0.0))
+
+    @property
+    def max_jitter(self) -> float:
+        """
+        The largest lateness of a tick, in seconds.
+        """
+        return self.__max_jitter
+
+    @property
+    def mean_tick_duration(self) -> float:
+        """
+        The mean time spent in a tick, in seconds.
+        """
+        if self.__tick_count == 0:
+            return 0.0
+        return self.__duration_sum / self.__tick_count
+
+    @property
+    def max_tick_duration(self) -> float:
+        """
+        The longest time spent in a tick, in seconds.
+        """
+        return self.__max_duration
+
+    @property
+    def histogram_bounds(self) -> Tuple[float, ...]:
+        """
+        The upper bounds of the jitter histogram buckets, in seconds.
+        """
+        return self.__histogram_bounds
+
+    @property
+    def histogram(self) -> List[int]:
+        """
+        A copy of the number of ticks per jitter bucket. The last bucket counts the ticks above the last bound.
+        """
+        return self.__histogram[:]
+
+    def record_tick(self, jitter: float, duration: float) -> None:
+        """
+        Records one tick.
+
+        Args:
+            jitter (float): How late the tick started compared to its schedule, in seconds.
+            duration (float): The time spent in the tick, in seconds.
+        """
+        self.__tick_count += 1
+        self.__jitter_sum += jitter
+        self.__jitter_square_sum += jitter * jitter
+        self.__duration_sum += duration
+        if jitter > self.__max_jitter:
+            self.__max_jitter = jitter
+        if duration > self.__max_duration:
+            self.__max_duration = duration
+        self.__histogram[bisect_right(self.__histogram_bounds, jitter)] += 1
+
+    def record_overrun(self, skipped: int) -> None:
+        """
+        Records a tick that ended after the next tick was due.
+
+        Args:
+            skipped (int): The number of ticks skipped to catch up.
+        """
+        self.__overrun_count += 1
+        self.__skipped_count += skipped
+
+    def record_elapsed_time(self, elapsed_time: float) -> None:
+        """
+        Records the duration of the run.
+
+        Args:
+            elapsed_time (float): The duration of the run, in seconds.
+        """
+        self.__elapsed_time = elapsed_time
+
+    def __str__(self) -> str:
+        return (f"{self.__tick_count} ticks at {self.tick_rate:.1f} Hz (target {1.0 / self.__period:.1f} Hz), "
+                f"jitter mean {self.mean_jitter * 1e6:.0f} us / max {self.__max_jitter * 1e6:.0f} us, "
+                f"{self.__overrun_count} overruns, {self.__skipped_count} skipped ticks")
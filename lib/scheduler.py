@@ -0,0 +1,214 @@
+from typing import Any, Callable, List, Optional, Tuple, Union
+
+from lib.clock import Clock, default_clock
+from lib.finite_state_machine import FiniteStateMachine
+
+Task = Union[FiniteStateMachine, Callable[[], Any]]
+
+
+class _ScheduledTask:
+    """
+    The scheduling data of a task registered in a Scheduler.
+
+    Attributes:
+        task (Task): The state machine, or the callable ticked in its place.
+        priority (int): The tasks are ticked by increasing priority.
+        order (int): The registration order, which breaks ties between equal priorities.
+        period (Optional[float]): The minimum time between two ticks, in seconds, or None to tick every time.
+        next_due (float): The earliest time of the next tick, in seconds.
+        suspended (bool): Whether the task is skipped until it is resumed.
+        is_machine (bool): Whether the task is a state machine rather than a callable.
+    """
+    __slots__ = ('task', 'priority', 'order', 'period', 'next_due', 'suspended', 'is_machine')
+
+    def __init__(self, task: Task, priority: int, order: int, period: Optional[float], suspended: bool) -> None:
+        self.task = task
+        self.priority = priority
+        self.order = order
+        self.period = period
+        self.next_due = float('-inf')
+        self.suspended = suspended
+        self.is_machine = isinstance(task, FiniteStateMachine)
+
+
+class Scheduler:
+    """
+    Ticks a group of state machines cooperatively, in a defined order.
+
+    Every task is registered with a priority and an optional rate. On each tick(), the tasks are visited by increasing
+    priority, then by registration order. A task is skipped while it is suspended, while its rate says it is not due,
+    and, for a state machine, while it has no pending work (see FiniteStateMachine.has_pending_work). Plain callables,
+    such as the polling of an input device, can be registered next to the state machines.
+
+    Attributes:
+        __clock (Clock): The clock the rates are measured on.
+        __tasks (Tuple[_ScheduledTask, ...]): The registered tasks, in tick order. Replaced rather than modified, so
+            that a task may register or unregister tasks while it is ticked.
+        __registration_count (int): The number of registrations so far, used to order equal priorities.
+        __tick_count (int): The number of tasks ticked so far.
+        __skip_count (int): The number of tasks skipped so far.
+    """
+    # __clock: Clock
+    # __tasks: Tuple[_ScheduledTask, ...]
+    # __registration_count: int
+    # __tick_count: int
+    # __skip_count: int
+
+    def __init__(self, clock: Optional[Clock] = None) -> None:
+        """
+        Initializes an empty scheduler.
+
+        Args:
+            clock (Clock, optional): The clock the rates are measured on. Defaults to the default clock.
+        """
+        if not isinstance(clock, Clock) and clock is not None:
+            raise TypeError('clock must be of type Clock')
+
+        self.__clock = default_clock() if clock is None else clock
+        self.__tasks = ()
+        self.__registration_count = 0
+        self.__tick_count = 0
+        self.__skip_count = 0
+
+    @property
+    def clock(self) -> Clock:
+        """
+        Returns the clock the rates are measured on.
+        """
+        return self.__clock
+
+    @property
+    def tasks(self) -> List[Task]:
+        """
+        Returns the registered tasks, in tick order.
+        """
+        return [scheduled.task for scheduled in self.__tasks]
+
+    @property
+    def tick_count(self) -> int:
+        """
+        Returns the number of times a task was ticked.
+        """
+        return self.__tick_count
+
+    @property
+    def skip_count(self) -> int:
+        """
+        Returns the number of times a task was skipped because it was suspended, not due or without pending work.
+        """
+        return self.__skip_count
+
+    def register(self, task: Task, priority: int = 0, rate: Optional[float] = None, suspended: bool = False) -> None:
+        """
+        Registers a task.
+
+        Args:
+            task (Task): A state machine, ticked with its track() method, or a callable.
+            priority (int, optional): The tasks are ticked by increasing priority. Defaults to 0.
+            rate (float, optional): The maximum number of ticks per second, or None to tick the task on every tick().
+                Defaults to None.
+            suspended (bool, optional): Whether the task starts suspended (see resume()). Defaults to False.
+
+        Raises:
+            TypeError: If task is neither a FiniteStateMachine nor callable.
+            ValueError: If the task is already registered or rate is not strictly positive.
+        """
+        if not isinstance(task, FiniteStateMachine) and not callable(task):
+            raise TypeError('task must be of type FiniteStateMachine or callable')
+        if not isinstance(priority, int):
+            raise TypeError('priority must be of type int')
+        if not isinstance(rate, (float, int)) and rate is not None:
+            raise TypeError('rate must be of type float')
+        if rate is not None and rate <= 0:
+            raise ValueError('rate must be strictly positive')
+        if self.is_registered(task):
+            raise ValueError('task is already registered')
+
+        period = None if rate is None else 1.0 / rate
+        scheduled = _ScheduledTask(task, priority, self.__registration_count, period, suspended)
+        self.__registration_count += 1
+        self.__tasks = tuple(sorted(self.__tasks + (scheduled,),
+                                    key=lambda scheduled: (scheduled.priority, scheduled.order)))
+
+    def unregister(self, task: Task) -> None:
+        """
+        Removes a task.
+
+        Args:
+            task (Task): A registered task.
+
+        Raises:
+            ValueError: If the task is not registered.
+        """
+        removed = self.__find(task)
+        self.__tasks = tuple(scheduled for scheduled in self.__tasks if scheduled is not removed)
+
+    def is_registered(self, task: Task) -> bool:
+        """
+        Returns True if the task is registered.
+        """
+        return any(scheduled.task == task for scheduled in self.__tasks)
+
+    def suspend(self, task: Task) -> None:
+        """
+        Skips the task until resume() is called, for instance a submachine whose parent state is not active.
+
+        Args:
+            task (Task): A registered task.
+        """
+        self.__find(task).suspended = True
+
+    def resume(self, task: Task) -> None:
+        """
+        Ticks the task again after suspend().
+
+        Args:
+            task (Task): A registered task.
+        """
+        self.__find(task).suspended = False
+
+    def tick(self) -> int:
+        """
+        Ticks every due task with pending work once, in order.
+
+        Returns:
+            int: The number of tasks ticked.
+        """
+        now = self.__clock.now()
+        tasks = self.__tasks
+        ticked = 0
+        for scheduled in tasks:
+            if scheduled.suspended:
+                continue
+
+            period = scheduled.period
+            if period is not None:
+                if now < scheduled.next_due:
+                    continue
+                next_due = scheduled.next_due + period
+                scheduled.next_due = next_due if next_due > now else now + period
+
+            task = scheduled.task
+            if scheduled.is_machine:
+                if not task.has_pending_work:
+                    continue
+                task.track()
+            else:
+                task()
+            ticked += 1
+
+        self.__tick_count += ticked
+        self.__skip_count += len(tasks) - ticked
+        return ticked
+
+    def __find(self, task: Task) -> _ScheduledTask:
+        """
+        Returns the scheduling data of a registered task.
+
+        Raises:
+            ValueError: If the task is not registered.
+        """
+        for scheduled in self.__tasks:
+            if scheduled.task == task:
+                return scheduled
+        raise ValueError('task is not registered')
@@ -1,6 +1,9 @@
 from __future__ import annotations
-from typing import Callable, Optional, List, TYPE_CHECKING, Any
-import time
+import inspect
+from typing import Callable, Optional, List, Tuple, TYPE_CHECKING, Any
+
+from lib.clock import Clock, default_clock
+from lib.value_dispatch import ValueDispatch, dispatch_plan
 
 if TYPE_CHECKING:
     from transition import Transition
@@ -41,9 +44,18 @@ class State:
             exiting the state.
         __transition (List[Transition]): The list of transitions available from the
             state.
+        __quiescent (Optional[bool]): The cached value of is_quiescent, or None when
+            it must be computed again.
+        __dispatch_plan (Optional[Tuple]): The transitions with their StateValueCondition
+            fan-outs replaced by ValueDispatch lookups, or None if there is none.
+        __dispatch_revision (int): The ValueDispatch.revision the plan was built at, or
+            -1 when it must be built again.
     """
     # __parameters: Parameters
     # __transition: list['Transition']
+    # __quiescent: Optional[bool]
+    # __dispatch_plan: Optional[Tuple]
+    # __dispatch_revision: int
 
     def __init__(self, parameters: Parameters = Parameters()) -> None:
         """
@@ -60,6 +72,9 @@ class State:
         
         self.__transition = []
         self.__parameters = parameters
+        self.__quiescent = None
+        self.__dispatch_plan = None
+        self.__dispatch_revision = -1
 
     def is_valid(self) -> bool:
         """
@@ -71,6 +86,30 @@ class State:
 
         return all((transition.is_valid for transition in self.__transition))
 
+    def next_deadline(self, now: float) -> Optional[float]:
+        """
+        Returns the earliest time after now at which the condition of a transition from the state changes on its
+        own, or None if no transition depends on time.
+
+        Args:
+            now (float): The current time of the clock, in seconds.
+        """
+
+        deadlines = [deadline for deadline in (transition.next_deadline(now) for transition in self.__transition)
+                     if deadline is not None]
+        return min(deadlines, default=None)
+
+    def _bind_clock(self, clock: Clock) -> None:
+        """
+        Makes the state and its transitions read the given clock.
+
+        Args:
+            clock (Clock): The clock to read.
+        """
+
+        for transition in self.__transition:
+            transition._bind_clock(clock)
+
     @property
     def is_terminal(self) -> bool:
         """
@@ -79,16 +118,81 @@ class State:
         
         return self.__parameters.terminal
 
+    @property
+    def parameters(self) -> Parameters:
+        """
+        Returns the parameters of the state.
+        """
+
+        return self.__parameters
+
+    @property
+    def is_quiescent(self) -> bool:
+        """
+        Returns True if ticking a state machine sitting in this state does nothing: the
+        state has no transitions and no in-state action.
+        """
+
+        quiescent = self.__quiescent
+        if quiescent is None:
+            quiescent = self.__quiescent = not self.__transition and not self._has_in_state_action()
+        return quiescent
+
+    def _invalidate_quiescence(self) -> None:
+        """
+        Makes is_quiescent be computed again, after a transition or an in-state action
+        was added.
+        """
+
+        self.__quiescent = None
+
+    def _has_in_state_action(self) -> bool:
+        """
+        Returns True if the state may do something in its in-state action. Subclasses
+        overriding the in-state action are assumed to do something.
+        """
+
+        return type(self)._exec_in_state_action is not State._exec_in_state_action \
+            or type(self)._do_in_state_action is not State._do_in_state_action
+
+    @property
+    def transitions(self) -> List['Transition']:
+        """
+        Returns a copy of the transitions available from the state, in evaluation order.
+        """
+
+        return self.__transition[:]
+
     @property
     def is_transiting(self) -> Optional['Transition']:
         """
         Returns the first valid transition from the state that is currently transiting,
         or None if there is no such transition.
+
+        Consecutive transitions comparing the custom value of the same monitored state
+        to different values are resolved with a single dict lookup (see ValueDispatch),
+        so a fan-out over many values costs the same as a single transition.
         """
-        
-        for transition in self.__transition:
-            if transition.is_transiting:
-                return transition
+
+        if self.__dispatch_revision != ValueDispatch.revision:
+            self.__dispatch_plan = dispatch_plan(self.__transition)
+            self.__dispatch_revision = ValueDispatch.revision
+
+        plan = self.__dispatch_plan
+        if plan is None:
+            for transition in self.__transition:
+                if transition.is_transiting:
+                    return transition
+            return None
+
+        for entry in plan:
+            if type(entry) is ValueDispatch:
+                transition = entry.select()
+                if transition is not None:
+                    return transition
+            elif entry.is_transiting:
+                return entry
+        return None
 
     def add_transition(self, transition: 'Transition') -> None:
         """
@@ -102,6 +206,8 @@ class State:
             raise TypeError("transition must be a Transition object")
 
         self.__transition.append(transition)
+        self.__quiescent = False
+        self.__dispatch_revision = -1
 
     def _exec_entering_action(self) -> None:
         """
@@ -145,6 +251,55 @@ class State:
         Performs the exiting action of the state.
         """
 
+    async def _async_exec_entering_action(self) -> None:
+        """
+        Executes the entering action of the state, awaiting the actions that are coroutines. Used by
+        AsyncFiniteStateMachine.
+        """
+
+        await self._async_do_entering_action()
+
+        if self.__parameters.do_in_state_action_when_entering:
+            await self._async_exec_in_state_action()
+
+    async def _async_exec_in_state_action(self) -> None:
+        """
+        Executes the in-state action of the state, awaiting the actions that are coroutines.
+        """
+
+        await self._async_do_in_state_action()
+
+    async def _async_exec_exiting_action(self) -> None:
+        """
+        Executes the exiting action of the state, awaiting the actions that are coroutines.
+        """
+
+        if self.__parameters.do_in_state_action_when_exiting:
+            await self._async_exec_in_state_action()
+
+        await self._async_do_exiting_action()
+
+    async def _async_do_entering_action(self) -> None:
+        """
+        Performs the entering action of the state. Defaults to the synchronous entering action.
+        """
+
+        self._do_entering_action()
+
+    async def _async_do_in_state_action(self) -> None:
+        """
+        Performs the in-state action of the state. Defaults to the synchronous in-state action.
+        """
+
+        self._do_in_state_action()
+
+    async def _async_do_exiting_action(self) -> None:
+        """
+        Performs the exiting action of the state. Defaults to the synchronous exiting action.
+        """
+
+        self._do_exiting_action()
+
 
     def __hash__(self) -> int:
         # not sure if this is needed:
@@ -152,11 +307,29 @@ class State:
         return hash(id(self))
 
 
+async def _await_actions(actions: List[Callable[[], Any]]) -> None:
+    """
+    Calls the given actions in order, awaiting the ones that return an awaitable.
+
+    Args:
+        actions (List[Callable[[], Any]]): The actions to call.
+    """
+
+    for action in actions:
+        result = action()
+        if inspect.isawaitable(result):
+            await result
+
+
 class ActionState(State):
     """
     Represents a state in a state machine that can perform actions when entering,
     within, or exiting the state, in addition to having transitions.
 
+    The actions may be coroutine functions when the state is run by an
+    AsyncFiniteStateMachine, which awaits them. The other state machines only call
+    them, so their coroutines would never run.
+
     Attributes:
         __entering_action (List[Callable[[], None]]): The list of actions to perform
             when entering the state.
@@ -205,6 +378,45 @@ class ActionState(State):
         for exiting_action in self.__exiting_action:
             exiting_action()
 
+    async def _async_do_entering_action(self) -> None:
+        """
+        Performs all the entering actions associated with the state, awaiting the coroutines.
+        """
+
+        await _await_actions(self.__entering_action)
+
+    async def _async_do_in_state_action(self) -> None:
+        """
+        Performs all the in-state actions associated with the state, awaiting the coroutines.
+        """
+
+        await _await_actions(self.__in_state_action)
+
+    async def _async_do_exiting_action(self) -> None:
+        """
+        Performs all the exiting actions associated with the state, awaiting the coroutines.
+        """
+
+        await _await_actions(self.__exiting_action)
+
+    def _has_in_state_action(self) -> bool:
+        """
+        Returns True if the state has in-state actions, or overrides how they are performed.
+        """
+
+        if type(self)._exec_in_state_action is not State._exec_in_state_action \
+                or type(self)._do_in_state_action is not ActionState._do_in_state_action:
+            return True
+        return bool(self.__in_state_action)
+
+    @property
+    def in_state_actions(self) -> Tuple[Callable[[], None], ...]:
+        """
+        Returns the in-state actions associated with the state, in execution order.
+        """
+
+        return tuple(self.__in_state_action)
+
     def add_entering_action(self, action: Callable[[], None]) -> None:
         """
         Adds a new entering action to the state.
@@ -213,7 +425,7 @@ class ActionState(State):
             action (Callable[[], None]): The action to add.
         """
         
-        if not isinstance(action, Callable):
+        if not callable(action):
             raise Exception("action must be callable.")
         else:
             self.__entering_action.append(action)
@@ -226,10 +438,11 @@ class ActionState(State):
             action (Callable[[], None]): The action to add.
         """
         
-        if not isinstance(action, Callable):
+        if not callable(action):
             raise Exception("action must be callable.")
         else:
             self.__in_state_action.append(action)
+            self._invalidate_quiescence()
 
     def add_exiting_action(self, action: Callable[[], None]) -> None:
         """
@@ -239,7 +452,7 @@ class ActionState(State):
             action (Callable[[], None]): The action to add.
         """
         
-        if not isinstance(action, Callable):
+        if not callable(action):
             raise Exception("action must be callable.")
         else:
             self.__exiting_action.append(action)
@@ -254,6 +467,7 @@ class MonitoredState(ActionState):
 
     Attributes:
         custom_value (Any): A custom value associated with the state.
+        __clock (Clock): The clock the entry and exit times are read from.
         __entry_count (int): The number of times the state was entered.
         __counter_last_exit (float): The time the state was last exited, in seconds.
         __counter_last_entry (float): The time the state was last entered, in seconds.
@@ -270,11 +484,44 @@ class MonitoredState(ActionState):
         """
         
         super().__init__(parameters)
+        self.__clock = default_clock()
         self.__counter_last_entry = 0.0
         self.__counter_last_exit = 0.0
         self.__entry_count = 0
         self.custom_value = None
 
+    @property
+    def clock(self) -> Clock:
+        """
+        The clock the entry and exit times are read from. Defaults to the default clock.
+        """
+
+        return self.__clock
+
+    @clock.setter
+    def clock(self, clock: Clock) -> None:
+        """
+        Sets the clock the entry and exit times are read from.
+
+        Args:
+            clock (Clock): The clock to read.
+        """
+
+        if not isinstance(clock, Clock):
+            raise TypeError("clock must be a Clock object")
+        self.__clock = clock
+
+    def _bind_clock(self, clock: Clock) -> None:
+        """
+        Makes the state and its transitions read the given clock.
+
+        Args:
+            clock (Clock): The clock to read.
+        """
+
+        self.clock = clock
+        super()._bind_clock(clock)
+
     @property
     def entry_count(self) -> int:
         """
@@ -319,7 +566,7 @@ class MonitoredState(ActionState):
         monitored state properties.
         """
         
-        self.__counter_last_entry = time.perf_counter()
+        self.__counter_last_entry = self.__clock.now()
         self.__entry_count += 1
         super()._exec_entering_action()
 
@@ -329,5 +576,24 @@ class MonitoredState(ActionState):
         monitored state properties.
         """
         
-        self.__counter_last_exit = time.perf_counter()
+        self.__counter_last_exit = self.__clock.now()
         super()._exec_exiting_action()
+
+    async def _async_exec_entering_action(self) -> None:
+        """
+        Performs all the entering actions associated with the state, awaiting the
+        coroutines, and updates the monitored state properties.
+        """
+
+        self.__counter_last_entry = self.__clock.now()
+        self.__entry_count += 1
+        await super()._async_exec_entering_action()
+
+    async def _async_exec_exiting_action(self) -> None:
+        """
+        Performs all the exiting actions associated with the state, awaiting the
+        coroutines, and updates the monitored state properties.
+        """
+
+        self.__counter_last_exit = self.__clock.now()
+        await super()._async_exec_exiting_action()
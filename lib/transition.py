@@ -1,8 +1,9 @@
 from abc import ABC
 import abc
-import time
+import inspect
 from typing import Callable, Optional, List, Any, TYPE_CHECKING
 
+from lib.clock import Clock, default_clock
 from lib.condition import Condition
 
 if TYPE_CHECKING:
@@ -74,6 +75,24 @@ class Transition(ABC):
         """Returns True if the transition conditions are met, False otherwise."""
         raise NotImplementedError
 
+    def next_deadline(self, now: float) -> Optional[float]:
+        """Returns the earliest time after now at which the transition starts or stops transiting on its own.
+
+        Args:
+            now (float): The current time of the clock, in seconds.
+
+        Returns:
+            Optional[float]: The deadline, in seconds, or None if the transition does not depend on time.
+        """
+        return None
+
+    def _bind_clock(self, clock: Clock) -> None:
+        """Makes the transition read the given clock. Does nothing for transitions that do not depend on time.
+
+        Args:
+            clock (Clock): The clock to read.
+        """
+
     def _exec_transiting_action(self) -> None:
         """Executes the do_transiting_action method."""
         self._do_transiting_action()
@@ -82,6 +101,14 @@ class Transition(ABC):
         """Performs the transiting action."""
         ...
 
+    async def _async_exec_transiting_action(self) -> None:
+        """Executes the transiting action, awaiting the actions that are coroutines. Used by AsyncFiniteStateMachine."""
+        await self._async_do_transiting_action()
+
+    async def _async_do_transiting_action(self) -> None:
+        """Performs the transiting action. Defaults to the synchronous transiting action."""
+        self._do_transiting_action()
+
 
 class ConditionalTransition(Transition):
     """A transition that occurs conditionally based on a given `Condition` object.
@@ -147,6 +174,8 @@ class ConditionalTransition(Transition):
         if not isinstance(condition, Condition):
             raise TypeError("condition must be a Condition object or None")
         self.__condition = condition
+        from lib.value_dispatch import ValueDispatch
+        ValueDispatch.invalidate()
 
     @property
     def is_transiting(self) -> bool:
@@ -160,12 +189,37 @@ class ConditionalTransition(Transition):
         """
         return bool(self.__condition)
 
+    def next_deadline(self, now: float) -> Optional[float]:
+        """
+        Returns the earliest time after now at which the condition of the transition changes on its own.
+
+        Args:
+            now (float): The current time of the clock, in seconds.
+
+        Returns:
+            Optional[float]: The deadline, in seconds, or None if there is no condition or it does not depend on time.
+        """
+        if self.__condition is None:
+            return None
+        return self.__condition.next_deadline(now)
+
+    def _bind_clock(self, clock: Clock) -> None:
+        """
+        Makes the condition of the transition read the given clock.
+
+        Args:
+            clock (Clock): The clock to read.
+        """
+        if self.__condition is not None:
+            self.__condition._bind_clock(clock)
+
 
 class ActionTransition(ConditionalTransition):
     """A conditional transition that triggers a list of actions upon transitioning.
 
     This class inherits from the ConditionalTransition class and adds a list of actions
-    that are triggered when the transition condition is met.
+    that are triggered when the transition condition is met. The actions may be coroutine
+    functions when the transition is taken by an AsyncFiniteStateMachine, which awaits them.
 
     Attributes:
         __transiting_actions (list[Callable[[], None]]): A list of actions triggered upon transitioning.
@@ -187,6 +241,13 @@ class ActionTransition(ConditionalTransition):
         for action in self.__transiting_actions:
             action()
 
+    async def _async_do_transiting_action(self) -> None:
+        """Execute the transit actions for this transition, awaiting the coroutines."""
+        for action in self.__transiting_actions:
+            result = action()
+            if inspect.isawaitable(result):
+                await result
+
     def add_transition_action(self, action: Callable[[], None]) -> None:
         """Add a callable object to the list of transit actions for this transition.
 
@@ -196,7 +257,7 @@ class ActionTransition(ConditionalTransition):
         Raises:
             TypeError: If `action` is not a callable object.
         """
-        if not isinstance(action, Callable):
+        if not callable(action):
             raise TypeError("action must be callable")
 
         self.__transiting_actions.append(action)
@@ -210,6 +271,7 @@ class MonitoredTransition(ActionTransition):
 
     Attributes:
         custom_value (Any): A custom value that can be set and accessed at any time.
+        __clock (Clock): The clock the transit time is read from.
         __last_transit_time (float): The timestamp of the last transition.
         __transit_count (int): The number of times this transition has been executed.
     """
@@ -225,10 +287,39 @@ class MonitoredTransition(ActionTransition):
                 Defaults to None.
         """
         super().__init__(next_state, condition)
+        self.__clock = default_clock()
         self.__transit_count = 0
         self.__last_transit_time = 0.
         self.custom_value = None
 
+    @property
+    def clock(self) -> Clock:
+        """The clock the transit time is read from. Defaults to the default clock."""
+        return self.__clock
+
+    @clock.setter
+    def clock(self, clock: Clock) -> None:
+        """Sets the clock the transit time is read from.
+
+        Args:
+            clock (Clock): The clock to read.
+
+        Raises:
+            TypeError: If `clock` is not a Clock object.
+        """
+        if not isinstance(clock, Clock):
+            raise TypeError("clock must be a Clock object")
+        self.__clock = clock
+
+    def _bind_clock(self, clock: Clock) -> None:
+        """Makes the transition and its condition read the given clock.
+
+        Args:
+            clock (Clock): The clock to read.
+        """
+        self.clock = clock
+        super()._bind_clock(clock)
+
     @property
     def transit_count(self) -> int:
         """The number of times this transition has been taken."""
@@ -251,5 +342,12 @@ class MonitoredTransition(ActionTransition):
     def _exec_transiting_action(self) -> None:
         """Execute the transit actions for this transition and track the transit count and time."""
         self.__transit_count += 1
-        self.__last_transit_time = time.perf_counter()
+        self.__last_transit_time = self.__clock.now()
         return super()._exec_transiting_action()
+
+    async def _async_exec_transiting_action(self) -> None:
+        """Execute the transit actions for this transition, awaiting the coroutines, and track the transit count and
+        time."""
+        self.__transit_count += 1
+        self.__last_transit_time = self.__clock.now()
+        await super()._async_exec_transiting_action()
@@ -1,5 +1,36 @@
+import asyncio
+import itertools
+import os
+import threading
+import time
 import unittest
+import random
+
+import numpy as np
+
 from condition import *
+from lib.async_finite_state_machine import AsyncFiniteStateMachine, run_all
+from lib.batch_finite_state_machine import BatchFiniteStateMachine
+from lib.blinker import AnalyticalBlinker, Blinker, Side, SideBlinkers
+from lib.blinker_bank import BlinkerBank
+from lib.clock import VirtualClock
+from lib.color_pattern import ColorPattern
+from lib.compiled_finite_state_machine import CompiledFiniteStateMachine
+from lib.condition import Condition, AlwaysTrueCondition, TimedCondition, StateValueCondition, \
+    StateEntryDurationCondition, StateEntryCountCondition, AllConditions, AnyConditions, NoneConditions
+from lib.finite_state_machine import FiniteStateMachine
+from lib.layout import Layout
+from lib.layout_spec import LayoutSpec, current_instance
+from lib.operational_state import OperationalState
+from lib.ring_buffer import RingBuffer, OverflowPolicy
+from lib.run_many import run_many
+from lib.scheduler import Scheduler
+from lib.state import MonitoredState, Parameters
+from lib.transition import ConditionalTransition, MonitoredTransition
+# Robot est teste sur le simulateur, sans la librairie du GoPiGo3
+os.environ['GOPIGO3_BACKEND'] = 'simulator'
+from Robot import ActuatorCache, CommandRouter, Controller, Direction, HardwareExecutor, RangeFinder, Robot
+from gopigo3_simulator import LatencyModel, SimulatedGoPiGo3
 
 
 class TestConditions(unittest.TestCase):
@@ -20,20 +51,23 @@ class TestConditions(unittest.TestCase):
         self.assertFalse(value_cond)
 
     def test_timed_condition(self):
+        clock = VirtualClock()
         duration = 0.1
-        timed_cond = TimedCondition(duration=duration, time_reference=time.perf_counter())
+        timed_cond = TimedCondition(duration=duration, time_reference=clock.now(), clock=clock)
         self.assertTrue(timed_cond)
-        time.sleep(duration + 0.1)
+        clock.sleep(duration + 0.1)
         self.assertFalse(timed_cond)
 
     def test_state_entry_duration_condition(self):
+        clock = VirtualClock()
         monitored_state = MonitoredState()
+        monitored_state.clock = clock
         monitored_state._exec_entering_action()
         duration = 0.1
         entry_duration_cond = StateEntryDurationCondition(duration, monitored_state)
         self.assertFalse(entry_duration_cond)
         # monitored_state.update_entry_time()
-        time.sleep(duration + 0.1)
+        clock.sleep(duration + 0.1)
         self.assertTrue(entry_duration_cond)
 
     def test_state_entry_count_condition(self):
@@ -120,5 +154,1076 @@ class TestConditions(unittest.TestCase):
         self.assertFalse(none_conditions)
 
 
+class TestCompiledFiniteStateMachine(unittest.TestCase):
+    @staticmethod
+    def build_layout(log):
+        terminal = Parameters()
+        terminal.terminal = True
+        states = [MonitoredState() for _ in range(5)] + [MonitoredState(terminal)]
+        for i, state in enumerate(states):
+            state.add_entering_action(lambda i=i: log.append(('enter', i)))
+            state.add_in_state_action(lambda i=i: log.append(('in', i)))
+            state.add_exiting_action(lambda i=i: log.append(('exit', i)))
+
+        for i, state in enumerate(states[:5]):
+            for value in range(3):
+                transition = MonitoredTransition(states[(i + value + 1) % 5], StateValueCondition(value, state))
+                transition.add_transition_action(lambda i=i, value=value: log.append(('transit', i, value)))
+                state.add_transition(transition)
+
+        any_conditions = AnyConditions()
+        any_conditions.add_conditions([StateValueCondition('end', states[4]), AlwaysTrueCondition(inverse=True)])
+        states[4].add_transition(ConditionalTransition(states[5], any_conditions))
+        states[3].add_transition(ConditionalTransition(states[0], StateEntryCountCondition(3, states[3])))
+
+        layout = Layout()
+        layout.add_states(set(states))
+        layout.initial_state = states[0]
+        return layout, states
+
+    def test_compiled_matches_interpreted(self):
+        interpreted_log, compiled_log = [], []
+        interpreted_layout, interpreted_states = self.build_layout(interpreted_log)
+        compiled_layout, compiled_states = self.build_layout(compiled_log)
+        interpreted = FiniteStateMachine(interpreted_layout, uninitialized=False)
+        compiled = CompiledFiniteStateMachine(compiled_layout, uninitialized=False)
+
+        rng = random.Random(64)
+        for _ in range(2000):
+            value = rng.choice([0, 1, 2, None, None, 'end'])
+            for state in interpreted_states + compiled_states:
+                state.custom_value = value
+            if rng.random() < 0.02:
+                target = rng.randrange(5)
+                interpreted.transit_to(interpreted_states[target])
+                compiled.transit_to(compiled_states[target])
+            self.assertEqual(interpreted.track(), compiled.track())
+            self.assertEqual(interpreted_states.index(interpreted.current_applicative_state),
+                             compiled_states.index(compiled.current_applicative_state))
+            if interpreted.current_operational_state == OperationalState.TERMINAL_REACHED:
+                interpreted.reset()
+                compiled.reset()
+
+        self.assertEqual(interpreted_log, compiled_log)
+        self.assertEqual([state.entry_count for state in interpreted_states],
+                         [state.entry_count for state in compiled_states])
+
+    def test_compile_requires_valid_layout(self):
+        with self.assertRaises(ValueError):
+            CompiledFiniteStateMachine(Layout())
+
+
+class TestVirtualClock(unittest.TestCase):
+    def test_virtual_clock_runs_an_hour_of_traffic_light(self):
+        green, yellow, red = MonitoredState(), MonitoredState(), MonitoredState()
+        green.add_transition(ConditionalTransition(yellow, StateEntryDurationCondition(4.0, green)))
+        yellow.add_transition(ConditionalTransition(red, StateEntryDurationCondition(1.0, yellow)))
+        red.add_transition(ConditionalTransition(green, StateEntryDurationCondition(5.0, red)))
+        layout = Layout()
+        layout.add_states({green, yellow, red})
+        layout.initial_state = green
+
+        clock = VirtualClock(start=100.0)
+        traffic_light = FiniteStateMachine(layout, clock=clock)
+        traffic_light.run(time_budget=3600.0)
+
+        self.assertGreaterEqual(clock.now() - 100.0, 3600.0)
+        self.assertEqual(green.entry_count, 361)
+        self.assertEqual(red.entry_count, 360)
+        self.assertAlmostEqual(green.last_entry_time - red.last_entry_time, 5.0)
+
+
+class TestIdleSleep(unittest.TestCase):
+    @staticmethod
+    def build_layout(duration):
+        terminal = Parameters()
+        terminal.terminal = True
+        waiting, done = MonitoredState(), MonitoredState(terminal)
+        ticks = []
+        waiting.add_in_state_action(lambda: ticks.append(waiting.clock.now()))
+        any_conditions = AnyConditions()
+        any_conditions.add_conditions([StateEntryDurationCondition(duration, waiting),
+                                       StateValueCondition('go', waiting)])
+        waiting.add_transition(ConditionalTransition(done, any_conditions))
+        layout = Layout()
+        layout.add_states({waiting, done})
+        layout.initial_state = waiting
+        return layout, waiting, ticks
+
+    def test_sleeps_until_next_deadline(self):
+        layout, waiting, ticks = self.build_layout(3.0)
+        clock = VirtualClock()
+        fsm = FiniteStateMachine(layout, clock=clock)
+        fsm.run(idle_sleep=True, min_tick_rate=1.0)
+
+        self.assertEqual(fsm.current_operational_state, OperationalState.TERMINAL_REACHED)
+        self.assertEqual(len(ticks), 3)
+        self.assertAlmostEqual(clock.now(), 3.0)
+
+    def test_notify_wakes_the_run_loop(self):
+        layout, waiting, ticks = self.build_layout(60.0)
+        fsm = FiniteStateMachine(layout)
+
+        def go():
+            waiting.custom_value = 'go'
+            fsm.notify()
+
+        timer = threading.Timer(0.05, go)
+        timer.start()
+        fsm.run(idle_sleep=True, min_tick_rate=0.1, time_budget=30.0)
+        timer.join()
+
+        self.assertEqual(fsm.current_operational_state, OperationalState.TERMINAL_REACHED)
+        self.assertLessEqual(len(ticks), 2)
+
+
+class TestFixedRateRun(unittest.TestCase):
+    @staticmethod
+    def build_machine(clock, tick_cost):
+        state = MonitoredState()
+        state.add_in_state_action(lambda: clock.advance(tick_cost))
+        layout = Layout()
+        layout.add_state(state)
+        layout.initial_state = state
+        return FiniteStateMachine(layout, clock=clock)
+
+    def test_holds_the_tick_rate(self):
+        clock = VirtualClock()
+        stats = self.build_machine(clock, 0.001).run(time_budget=1.0, tick_hz=200)
+
+        self.assertEqual(stats.tick_count, 200)
+        self.assertEqual(stats.overrun_count, 0)
+        self.assertAlmostEqual(stats.tick_rate, 200.0, delta=1.0)
+        self.assertAlmostEqual(stats.mean_tick_duration, 0.001)
+        self.assertEqual(sum(stats.histogram), stats.tick_count)
+
+    def test_counts_overruns(self):
+        clock = VirtualClock()
+        stats = self.build_machine(clock, 0.012).run(time_budget=1.0, tick_hz=200)
+
+        self.assertEqual(stats.overrun_count, stats.tick_count)
+        self.assertAlmostEqual(stats.tick_count + stats.skipped_count, 200, delta=1)
+        self.assertGreater(stats.max_jitter, 0.0)
+
+    def test_rejects_idle_sleep(self):
+        with self.assertRaises(ValueError):
+            self.build_machine(VirtualClock(), 0.0).run(idle_sleep=True, tick_hz=200)
+
+
+class TestBatchFiniteStateMachine(unittest.TestCase):
+    @staticmethod
+    def build_layout():
+        peek_left, peek_right, forward, rotate = [MonitoredState() for _ in range(4)]
+        peek_left.add_transition(ConditionalTransition(peek_right, StateEntryDurationCondition(0.3, peek_left)))
+        peek_right.add_transition(ConditionalTransition(forward, StateEntryDurationCondition(0.3, peek_right)))
+        forward.add_transition(ConditionalTransition(rotate, StateValueCondition(False, forward)))
+        stuck = AllConditions()
+        stuck.add_conditions([StateEntryCountCondition(3, rotate), StateEntryDurationCondition(0.2, rotate)])
+        rotate.add_transition(ConditionalTransition(peek_left, stuck))
+        clear = NoneConditions()
+        clear.add_conditions([StateValueCondition(False, rotate), StateValueCondition(None, rotate)])
+        rotate.add_transition(ConditionalTransition(forward, clear))
+
+        layout = Layout()
+        layout.add_states({peek_left, peek_right, forward, rotate})
+        layout.initial_state = peek_left
+        return layout, [peek_left, peek_right, forward, rotate]
+
+    def test_batch_matches_interpreted(self):
+        clock = VirtualClock()
+        instance_count = 16
+        batch_layout, batch_states = self.build_layout()
+        batch = BatchFiniteStateMachine(batch_layout, instance_count, clock)
+        machines = []
+        for _ in range(instance_count):
+            layout, states = self.build_layout()
+            machines.append((FiniteStateMachine(layout, uninitialized=False, clock=clock), states))
+
+        rng = random.Random(5)
+        for _ in range(400):
+            clock.advance(0.05)
+            values = [rng.random() > 0.3 for _ in range(instance_count)]
+            for state in batch_states[2:]:
+                batch.set_custom_value(state, values)
+            for (fsm, states), value in zip(machines, values):
+                for state in states[2:]:
+                    state.custom_value = value
+                fsm.track()
+            batch.track()
+
+            expected = [states.index(fsm.current_applicative_state) for fsm, states in machines]
+            self.assertEqual([batch_states.index(batch.states[state_id]) for state_id in batch.current_state_ids],
+                             expected)
+
+        for i, state in enumerate(batch_states):
+            self.assertEqual(list(batch.entry_count(state)), [states[i].entry_count for _, states in machines])
+
+    def test_rejects_unsupported_conditions(self):
+        first, second = MonitoredState(), MonitoredState()
+        first.add_transition(ConditionalTransition(second, TimedCondition(1.0)))
+        layout = Layout()
+        layout.add_states({first, second})
+        layout.initial_state = first
+
+        with self.assertRaises(TypeError):
+            BatchFiniteStateMachine(layout, 10)
+
+
+class TestLayoutSpec(unittest.TestCase):
+    def test_instance_matches_interpreted(self):
+        interpreted_log, spec_log = [], []
+        interpreted_layout, interpreted_states = TestCompiledFiniteStateMachine.build_layout(interpreted_log)
+        spec_layout, spec_states = TestCompiledFiniteStateMachine.build_layout(spec_log)
+        interpreted = FiniteStateMachine(interpreted_layout, uninitialized=False, micro_steps=3)
+        spec = LayoutSpec(spec_layout, micro_steps=3)
+        instance = spec.instantiate()
+
+        rng = random.Random(25)
+        for _ in range(2000):
+            value = rng.choice([0, 1, 2, None, None, 'end'])
+            for state in interpreted_states:
+                state.custom_value = value
+            for state in spec_states:
+                instance.set_custom_value(state, value)
+            if rng.random() < 0.02:
+                target = rng.randrange(5)
+                interpreted.transit_to(interpreted_states[target])
+                instance.transit_to(spec_states[target])
+            self.assertEqual(interpreted.track(), instance.track())
+            self.assertEqual(interpreted_states.index(interpreted.current_applicative_state),
+                             spec_states.index(instance.current_applicative_state))
+            if interpreted.current_operational_state == OperationalState.TERMINAL_REACHED:
+                interpreted.reset()
+                instance.reset()
+
+        self.assertEqual(interpreted_log, spec_log)
+        self.assertEqual([state.entry_count for state in interpreted_states],
+                         [instance.entry_count(state) for state in spec_states])
+        for interpreted_state, spec_state in zip(interpreted_states[:5], spec_states[:5]):
+            self.assertEqual([transition.transit_count for transition in interpreted_state.transitions[:3]],
+                             [instance.transit_count(transition) for transition in spec_state.transitions[:3]])
+        self.assertEqual([state.entry_count for state in spec_states], [0] * 6)
+
+    def test_instances_keep_their_own_state(self):
+        layout, states = TestBatchFiniteStateMachine.build_layout()
+        peek_left, peek_right, forward, rotate = states
+        entered = []
+        forward.add_entering_action(lambda: entered.append(current_instance().context))
+
+        clock = VirtualClock()
+        spec = LayoutSpec(layout, clock)
+        near, far = spec.instantiate('near'), spec.instantiate('far')
+        for _ in range(20):
+            clock.advance(0.05)
+            near.set_custom_value(forward, False)
+            far.set_custom_value(forward, True)
+            near.track()
+            far.track()
+
+        self.assertIs(near.current_applicative_state, rotate)
+        self.assertIs(far.current_applicative_state, forward)
+        self.assertEqual(entered, ['near', 'far'])
+        self.assertIsNone(current_instance())
+        self.assertEqual(forward.entry_count, 0)
+
+        with self.assertRaises(RuntimeError):
+            spec.instantiate(reset=False).track()
+
+
+def build_toggle(period):
+    on, off = MonitoredState(), MonitoredState()
+    on.add_transition(MonitoredTransition(off, StateEntryDurationCondition(period, on)))
+    off.add_transition(MonitoredTransition(on, StateEntryDurationCondition(period, off)))
+    layout = Layout()
+    layout.add_states({on, off})
+    layout.initial_state = on
+    return FiniteStateMachine(layout, clock=VirtualClock())
+
+
+class TestRunMany(unittest.TestCase):
+    def test_pool_matches_serial(self):
+        periods = [0.5, 1.0, 2.0, 4.0]
+        pooled = run_many(build_toggle, periods, workers=2, time_budget=60.0)
+        serial = run_many(build_toggle, periods, workers=1, time_budget=60.0)
+
+        self.assertEqual(pooled, serial)
+        self.assertEqual([result.parameters for result in pooled], periods)
+        for result, period in zip(pooled, periods):
+            self.assertEqual(result.operational_state, OperationalState.IDLE)
+            entries = sum(state.entry_count for state in result.states)
+            self.assertAlmostEqual(entries, 60.0 / period, delta=1)
+            self.assertEqual(sum(transition.transit_count for transition in result.transitions), entries - 1)
+
+    def test_tick_budget(self):
+        result, = run_many(build_toggle, [1.0], workers=1, tick_budget=10)
+        self.assertEqual(sum(state.entry_count for state in result.states), 10)
+        self.assertAlmostEqual(result.elapsed_time, 9.0)
+
+
+class TestAsyncFiniteStateMachine(unittest.TestCase):
+    @staticmethod
+    def build_machine(period, on_enter, clock=None):
+        on, off = MonitoredState(), MonitoredState()
+        on.add_entering_action(lambda: on_enter('on'))
+        off.add_entering_action(lambda: on_enter('off'))
+        on.add_transition(MonitoredTransition(off, StateEntryDurationCondition(period, on)))
+        off.add_transition(MonitoredTransition(on, StateEntryDurationCondition(period, off)))
+        layout = Layout()
+        layout.add_states({on, off})
+        layout.initial_state = on
+        return AsyncFiniteStateMachine(layout, clock=clock)
+
+    def test_coroutine_actions_in_order(self):
+        log = []
+
+        async def enter(name):
+            await asyncio.sleep(0)
+            log.append(name)
+
+        fsm = self.build_machine(1.0, enter, VirtualClock())
+        asyncio.run(fsm.run(time_budget=4.5))
+
+        self.assertEqual(log, ['on', 'off', 'on', 'off', 'on'])
+        self.assertEqual(fsm.current_operational_state, OperationalState.IDLE)
+
+    def test_slow_actions_overlap(self):
+        active = []
+        overlaps = []
+
+        async def slow_io(name):
+            active.append(name)
+            overlaps.append(len(active))
+            await asyncio.sleep(0.01)
+            active.remove(name)
+
+        machines = [self.build_machine(0.0, slow_io) for _ in range(4)]
+        asyncio.run(run_all(*machines, tick_budget=3))
+
+        # each machine awaits its action while the other machines start theirs
+        self.assertEqual(max(overlaps), 4)
+        self.assertEqual(len(overlaps), 16)
+        for fsm in machines:
+            self.assertEqual(sum(state.entry_count for state in fsm.layout.states), 4)
+
+
+class TestScheduler(unittest.TestCase):
+    def test_order_rate_and_suspension(self):
+        clock = VirtualClock()
+        scheduler = Scheduler(clock)
+        log = []
+        scheduler.register(lambda: log.append('slow'), priority=5, rate=10.0)
+        scheduler.register(lambda: log.append('late'), priority=9)
+        task = lambda: log.append('early')
+        scheduler.register(task, priority=1)
+
+        for _ in range(3):
+            scheduler.tick()
+            clock.advance(0.05)
+        self.assertEqual(log, ['early', 'slow', 'late', 'early', 'late', 'early', 'slow', 'late'])
+
+        log.clear()
+        scheduler.suspend(task)
+        scheduler.tick()
+        scheduler.resume(task)
+        scheduler.tick()
+        self.assertEqual(log, ['late', 'early', 'late'])
+
+    def test_skips_quiescent_machines(self):
+        blinker = Blinker(MonitoredState, MonitoredState)
+        scheduler = Scheduler(VirtualClock())
+        scheduler.register(blinker)
+
+        self.assertFalse(blinker.has_pending_work)
+        self.assertEqual(scheduler.tick(), 0)
+        blinker.blink(cycle_duration=1.0)
+        self.assertTrue(blinker.has_pending_work)
+        self.assertEqual(scheduler.tick(), 1)
+        self.assertEqual(scheduler.skip_count, 1)
+
+
+class TestQuiescence(unittest.TestCase):
+    def test_parked_machine_sleeps_until_woken(self):
+        for engine in (FiniteStateMachine, CompiledFiniteStateMachine):
+            busy, parked = MonitoredState(), MonitoredState()
+            busy.add_transition(ConditionalTransition(parked, AlwaysTrueCondition()))
+            layout = Layout()
+            layout.add_states({busy, parked})
+            layout.initial_state = busy
+            fsm = engine(layout, uninitialized=False)
+
+            self.assertFalse(fsm.is_quiescent)
+            fsm.track()
+            self.assertIs(fsm.current_applicative_state, parked)
+            self.assertTrue(fsm.is_quiescent)
+            self.assertFalse(fsm.has_pending_work)
+            self.assertTrue(fsm.track())
+
+            fsm.transit_to(busy)
+            self.assertFalse(fsm.is_quiescent)
+            fsm.track()
+            self.assertEqual(parked.entry_count, 2)
+
+        fsm = FiniteStateMachine(layout, uninitialized=False)
+        fsm.track()
+        parked.add_transition(ConditionalTransition(busy, AlwaysTrueCondition()))
+        fsm.track()
+        self.assertIs(fsm.current_applicative_state, parked)
+        fsm.notify()
+        fsm.track()
+        self.assertIs(fsm.current_applicative_state, busy)
+
+    def test_ready_engines_notify_transit_and_stop(self):
+        for engine in (FiniteStateMachine, CompiledFiniteStateMachine, AsyncFiniteStateMachine):
+            first, second = MonitoredState(), MonitoredState()
+            layout = Layout()
+            layout.add_states({first, second})
+            layout.initial_state = first
+            fsm = engine(layout, uninitialized=False)
+
+            fsm.notify()
+            fsm.transit_to(second)
+            self.assertIs(fsm.current_applicative_state, second)
+            fsm.stop()
+            if engine is AsyncFiniteStateMachine:
+                asyncio.run(fsm.flush())
+            self.assertEqual([first.entry_count, second.entry_count], [1, 1])
+
+
+class TestRunToCompletion(unittest.TestCase):
+    def test_chain_and_loop(self):
+        for engine in (FiniteStateMachine, CompiledFiniteStateMachine):
+            first, second, third, waiting = [MonitoredState() for _ in range(4)]
+            first.add_transition(ConditionalTransition(second, AlwaysTrueCondition()))
+            second.add_transition(ConditionalTransition(third, AlwaysTrueCondition()))
+            third.add_transition(ConditionalTransition(waiting, AlwaysTrueCondition()))
+            waiting.add_transition(ConditionalTransition(first, StateEntryDurationCondition(1.0, waiting)))
+            layout = Layout()
+            layout.add_states({first, second, third, waiting})
+            layout.initial_state = first
+
+            fsm = engine(layout, uninitialized=False, clock=VirtualClock(), micro_steps=8)
+            fsm.track()
+            self.assertIs(fsm.current_applicative_state, waiting)
+            self.assertEqual([state.entry_count for state in (first, second, third, waiting)], [1, 1, 1, 1])
+
+            fsm.micro_steps = 2
+            fsm.transit_to(first)
+            fsm.track()
+            self.assertIs(fsm.current_applicative_state, third)
+
+            # an always-enabled loop ends the tick once a state is entered again
+            third.add_transition(ConditionalTransition(first, AlwaysTrueCondition()))
+            waiting.add_transition(ConditionalTransition(first, AlwaysTrueCondition()))
+            fsm = engine(layout, uninitialized=False, micro_steps=100)
+            fsm.track()
+            self.assertIs(fsm.current_applicative_state, first)
+            self.assertEqual(first.entry_count, 4)
+
+
+class TestValueDispatch(unittest.TestCase):
+    def build(self, engine):
+        source, selector = MonitoredState(), MonitoredState()
+        targets = [MonitoredState() for _ in range(6)]
+        cases = [('a', 0), ('b', 1), ('a', 2), ('c', 3)]
+        for value, index in cases:
+            source.add_transition(ConditionalTransition(targets[index], StateValueCondition(value, selector)))
+        source.add_transition(ConditionalTransition(targets[4], StateValueCondition('d', selector, inverse=True)))
+        source.add_transition(ConditionalTransition(targets[5], StateValueCondition('d', selector)))
+        layout = Layout()
+        layout.add_states({source, selector, *targets})
+        layout.initial_state = source
+        return engine(layout, uninitialized=False), source, selector, targets
+
+    def test_same_transition_as_linear_scan(self):
+        expected = {'a': 0, 'b': 1, 'c': 3, 'd': 5, None: 4, 'e': 4}
+        for engine in (FiniteStateMachine, CompiledFiniteStateMachine):
+            for value, index in expected.items():
+                fsm, source, selector, targets = self.build(engine)
+                selector.custom_value = value
+                fsm.track()
+                self.assertIs(fsm.current_applicative_state, targets[index])
+
+            fsm, source, selector, targets = self.build(engine)
+            selector.custom_value = ['unhashable']
+            fsm.track()
+            self.assertIs(fsm.current_applicative_state, targets[4])
+
+    def test_plan_follows_condition_changes(self):
+        fsm, source, selector, targets = self.build(FiniteStateMachine)
+        selector.custom_value = 'z'
+        self.assertIs(source.is_transiting, source.transitions[4])
+        source.transitions[1].condition.expected_value = 'z'
+        self.assertIs(source.is_transiting, source.transitions[1])
+
+
+class TestCommandRouter(unittest.TestCase):
+    @staticmethod
+    def build_router():
+        router = CommandRouter(default_target='home')
+        router.register('12', 'task 12')
+        router.register(['#', 'up'], 'shutdown')
+        return router
+
+    def test_routes_and_rejects_prefixes(self):
+        router = self.build_router()
+        router.reset(['#', 'up', 'ok'])
+        self.assertTrue(router.is_complete)
+        self.assertEqual(router.target, 'shutdown')
+
+        router.reset(['1', '4'])
+        self.assertTrue(router.is_rejected)
+        self.assertIsNone(router.target)
+        router.push('ok')
+        self.assertEqual(router.target, 'home')
+
+        # a prefix of a command is not a command
+        router.reset(['1', 'ok'])
+        self.assertEqual(router.target, 'home')
+
+    def test_key_after_ok_invalidates_the_command(self):
+        router = self.build_router()
+        router.reset(['1', '2', 'ok'])
+        self.assertEqual(router.target, 'task 12')
+        router.push('2')
+        self.assertFalse(router.is_complete)
+        self.assertTrue(router.is_rejected)
+        self.assertIsNone(router.target)
+
+    def test_rejects_duplicate_registrations(self):
+        router = self.build_router()
+        with self.assertRaises(ValueError):
+            router.register('12', 'other task')
+        with self.assertRaises(ValueError):
+            router.register(['1', 'ok'], 'other task')
+
+    def test_bound_states_receive_the_target(self):
+        router = self.build_router()
+        state = MonitoredState()
+        router.bind(state)
+        router.reset(['1', '2', 'ok'])
+        self.assertEqual(state.custom_value, 'task 12')
+        router.reset()
+        self.assertIsNone(state.custom_value)
+
+
+
+class TestRingBuffer(unittest.TestCase):
+    def test_fifo_and_overflow(self):
+        ring = RingBuffer(3)
+        self.assertIsNone(ring.pop())
+        for item in range(5):
+            self.assertTrue(ring.push(item))
+        self.assertEqual(list(ring), [2, 3, 4])
+        self.assertEqual((ring[0], ring[-1], ring[1:]), (2, 4, [3, 4]))
+        self.assertEqual((ring.peek(), ring.peek_last(), ring.dropped_count), (2, 4, 2))
+        self.assertEqual(ring.pop(), 2)
+        ring.push(5)
+        self.assertEqual(list(ring), [3, 4, 5])
+
+        ring = RingBuffer(2, OverflowPolicy.DROP_NEWEST)
+        self.assertEqual([ring.push(item) for item in range(3)], [True, True, False])
+        self.assertEqual((list(ring), ring.dropped_count), ([0, 1], 1))
+        ring.clear()
+        self.assertEqual((len(ring), ring.peek_last()), (0, None))
+
+
+class TestBlinkerTopology(unittest.TestCase):
+    def test_states_are_created_per_command(self):
+        created = []
+
+        def generator():
+            state = MonitoredState()
+            created.append(state)
+            return state
+
+        blinker = Blinker(generator, generator)
+        blinker.clock = VirtualClock()
+        self.assertEqual(len(created), 2)
+        self.assertEqual(len(blinker.layout.states), 2)
+
+        blinker.blink(total_duration=0.5, cycle_duration=0.2)
+        self.assertEqual(len(created), 4)
+        self.assertEqual(len(blinker.layout.states), 6)
+        self.assertTrue(all(state.clock is blinker.clock for state in blinker.layout.states))
+        blinker.track()
+        self.assertTrue(blinker.is_on)
+        for _ in range(60):
+            blinker.clock.advance(0.01)
+            blinker.track()
+        self.assertTrue(blinker.is_off)
+        self.assertIs(blinker.current_applicative_state, created[0])
+
+        blinker.blink(total_duration=0.5, cycle_duration=0.2)
+        self.assertEqual(len(created), 4)
+
+        other = Blinker(generator, generator)
+        self.assertEqual(len(created), 6)
+        self.assertTrue(other.is_off)
+
+
+class TestAnalyticalBlinker(unittest.TestCase):
+    def edges(self, blinker_type, command):
+        clock = VirtualClock(start=10.0)
+        log = []
+
+        def generator(light):
+            def generate():
+                state = MonitoredState()
+                state.add_entering_action(lambda: log.append((light, round(clock.now() - 10.0, 2))))
+                return state
+            return generate
+
+        blinker = blinker_type(generator('off'), generator('on'))
+        blinker.clock = clock
+        log.clear()
+        command(blinker)
+        for _ in range(200):
+            blinker.track()
+            clock.advance(0.01)
+        return log, blinker
+
+    def test_edges_follow_the_command_timeline(self):
+        # unlike Blinker, the edges do not drift by one tick per half cycle
+        cases = [
+            (lambda blinker: blinker.blink(total_duration=1.0, cycle_duration=0.4, percent_on=0.25, end_off=False),
+             [('on', 0.0), ('off', 0.1), ('on', 0.4), ('off', 0.5), ('on', 0.8), ('off', 0.9), ('on', 1.0)]),
+            (lambda blinker: blinker.blink(n_cycles=3, cycle_duration=0.3, begin_on=False),
+             [('on', 0.15), ('off', 0.3), ('on', 0.45), ('off', 0.6), ('on', 0.75), ('off', 0.9)]),
+            (lambda blinker: blinker.turn_on(0.5), [('on', 0.0), ('off', 0.5)]),
+            (lambda blinker: blinker.turn_off(), []),
+        ]
+        for command, expected in cases:
+            edges, blinker = self.edges(AnalyticalBlinker, command)
+            self.assertEqual([light for light, _ in edges], [light for light, _ in expected])
+            for (_, time_point), (_, ideal) in zip(edges, expected):
+                self.assertTrue(ideal <= time_point + 1e-9 <= ideal + 0.011)
+            self.assertTrue(blinker.is_steady)
+
+    def test_next_edge_and_quiescence(self):
+        _, blinker = self.edges(AnalyticalBlinker, lambda blinker: blinker.blink(cycle_duration=1.0, percent_on=0.3))
+        now = blinker.clock.now() + 0.1
+        self.assertAlmostEqual(blinker.next_deadline(now), 12.3)
+        self.assertTrue(blinker.has_pending_work)
+        blinker.turn_on()
+        self.assertTrue(blinker.is_on)
+        self.assertIsNone(blinker.next_deadline(now))
+        self.assertFalse(blinker.has_pending_work)
+
+
+class TestBlinkerBank(unittest.TestCase):
+    def test_reciprocal_channels_stay_locked(self):
+        clock = VirtualClock()
+        changes = []
+        bank = BlinkerBank(2, lambda channels, levels: changes.append((clock.now(), list(channels), list(levels))),
+                           clock)
+        bank.blink([0, 1], cycle_duration=0.2, n_cycles=3, begin_on=[True, False])
+        for _ in range(100):
+            bank.track()
+            if bank.levels.any():
+                self.assertEqual(bank.is_on(0), bank.is_off(1))
+            clock.advance(0.01)
+
+        self.assertEqual(len(changes), 7)
+        self.assertEqual(changes[0][1:], ([0], [True]))
+        self.assertEqual(changes[-1][1:], ([1], [False]))
+        self.assertTrue(all(len(channels) == 2 for _, channels, _ in changes[1:-1]))
+        self.assertFalse(bank.has_pending_work)
+        self.assertEqual(bank.track(), 0)
+
+    def test_reciprocal_blinker_pair_keeps_its_phase_under_jitter(self):
+        # the reciprocal pairs of the robot are two AnalyticalBlinkers, locked to the same command time like the
+        # channels of a bank
+        clock = VirtualClock()
+        side_blinkers = SideBlinkers(MonitoredState, MonitoredState, MonitoredState, MonitoredState,
+                                     blinker_type=AnalyticalBlinker)
+        left, right = side_blinkers.blinkers
+        left.clock = right.clock = clock
+        bank = BlinkerBank(2, clock=clock)
+        side_blinkers.blink(Side.LEFT_RECIPROCAL, cycle_duration=0.2, percent_on=0.5)
+        bank.blink([0, 1], cycle_duration=0.2, percent_on=0.5, begin_on=[True, False])
+
+        jitter = random.Random(3)
+        for _ in range(500):
+            clock.advance(jitter.uniform(0.001, 0.03))
+            left.track()
+            right.track()
+            bank.track()
+            self.assertNotEqual(left.is_on, right.is_on)
+            self.assertEqual(left.is_on, clock.now() % 0.2 < 0.1)
+            self.assertEqual([left.is_on, right.is_on], list(bank.levels))
+        self.assertGreater(clock.now(), 5.0)
+
+    def test_chase_emits_only_the_changed_channels(self):
+        clock = VirtualClock()
+        bank = BlinkerBank(64, clock=clock)
+        bank.blink(slice(None), cycle_duration=0.64, percent_on=1 / 64, phase=-np.arange(64) / 64)
+        self.assertEqual(bank.next_deadline(clock.now()), clock.now())
+        self.assertEqual(bank.track(), 1)
+        self.assertTrue(bank.is_on(0))
+        self.assertAlmostEqual(bank.next_deadline(clock.now()), 0.01)
+
+        clock.advance_to(0.015)
+        self.assertEqual(bank.track(), 2)
+        self.assertEqual(list(np.flatnonzero(bank.levels)), [1])
+
+        with self.assertRaises(ValueError):
+            bank.blink([0, 1, 2], cycle_duration=1.0, phase=[0.0, 0.5])
+
+
+class TestColorPattern(unittest.TestCase):
+    def test_blink_and_keyframes(self):
+        pattern = ColorPattern.blink((255, 0, 0), 0.5, percent_on=0.4, rate=10)
+        self.assertEqual(pattern.frames, ((255, 0, 0),) * 2 + ((0, 0, 0),) * 3)
+        self.assertEqual(pattern.change_count, 2)
+        self.assertEqual(pattern.color_at(0.55), (255, 0, 0))
+        self.assertAlmostEqual(pattern.next_change(0.25), 0.5)
+
+        pattern = ColorPattern.from_keyframes([(0.0, (0, 0, 0)), (0.2, (100, 200, 50))], rate=10, loop=False)
+        self.assertEqual(pattern.frames, ((0, 0, 0), (50, 100, 25), (100, 200, 50)))
+        self.assertEqual(pattern.color_at(10.0), (100, 200, 50))
+        self.assertIsNone(pattern.next_change(0.2))
+
+        with self.assertRaises(ValueError):
+            ColorPattern.from_keyframes([(0.1, (0, 0, 0))])
+
+    def test_color_step_reduces_changes(self):
+        fine = ColorPattern.fade((0, 0, 0), (0, 0, 255), 2.0)
+        coarse = ColorPattern.fade((0, 0, 0), (0, 0, 255), 2.0, color_step=32)
+        self.assertEqual(len(fine.frames), len(coarse.frames))
+        self.assertEqual(fine.change_count, 101)
+        self.assertEqual(coarse.change_count, 9)
+        self.assertIs(coarse.frames[1], coarse.frames[2])
+
+class TestHardwareExecutor(unittest.TestCase):
+    def test_coalesces_and_sends_motors_first(self):
+        sent = []
+        executor = HardwareExecutor(None)
+        executor.submit('left_eye', sent.append, ('left_eye', 1))
+        executor.submit('motor', sent.append, ('motor', 1))
+        executor.submit('left_eye', sent.append, ('left_eye', 2))
+        self.assertEqual(executor.pending_count, 2)
+        self.assertEqual(executor.coalesced_count, 1)
+
+        executor.start()
+        self.assertTrue(executor.flush(timeout=1.0))
+        executor.stop()
+        self.assertEqual(sent, [('motor', 1), ('left_eye', 2)])
+
+    def test_latency_is_read_on_the_clock(self):
+        clock = VirtualClock()
+        executor = HardwareExecutor(None, clock=clock)
+        executor.submit('servo', clock.advance, 0.5)
+        executor.start()
+        executor.stop()
+        self.assertEqual(executor.latency('servo'), (1, 0.5, 0.5))
+        self.assertIsNone(executor.latency('motor'))
+
+    def test_flush_times_out_while_a_command_is_sent(self):
+        release = threading.Event()
+        executor = HardwareExecutor(None)
+        executor.start()
+        executor.submit('motor', release.wait)
+        self.assertFalse(executor.flush(timeout=0.05))
+        release.set()
+        self.assertTrue(executor.flush(timeout=1.0))
+        executor.stop()
+
+    def test_stop_sends_the_pending_commands(self):
+        sent = []
+        executor = HardwareExecutor(None)
+        for key in ('motor', 'servo', 'left_eye', 'right_eye'):
+            executor.submit(key, sent.append, key)
+        executor.start()
+        executor.stop()
+        self.assertFalse(executor.is_running)
+        self.assertEqual(executor.pending_count, 0)
+        self.assertEqual(sent, ['motor', 'servo', 'left_eye', 'right_eye'])
+
+    def test_submit_blocks_when_full(self):
+        sent = []
+        executor = HardwareExecutor(None, capacity=1)
+        executor.submit('motor', sent.append, 'motor')
+        submitter = threading.Thread(target=executor.submit, args=('servo', sent.append, 'servo'))
+        submitter.start()
+        submitter.join(0.05)
+        self.assertTrue(submitter.is_alive())
+
+        executor.start()
+        submitter.join(1.0)
+        self.assertFalse(submitter.is_alive())
+        executor.stop()
+        self.assertEqual(sent, ['motor', 'servo'])
+
+    def test_failed_send_is_logged_and_reported(self):
+        def fail(value):
+            raise OSError('bus error')
+
+        failures = []
+        executor = HardwareExecutor(None)
+        executor.submit('motor', fail, 'forward', on_error=lambda key, error: failures.append((key, str(error))))
+        executor.submit('servo', fail, 90)
+        with self.assertLogs('Robot', level='ERROR') as logs:
+            executor.start()
+            executor.stop()
+        self.assertEqual(executor.error_count, 2)
+        self.assertEqual(failures, [('motor', 'bus error')])
+        self.assertEqual(len(logs.records), 2)
+
+
+class TestActuatorCache(unittest.TestCase):
+    def test_suppresses_repeated_values(self):
+        sent = []
+        actuators = ActuatorCache()
+        self.assertTrue(actuators.command('motor', 'forward', sent.append, 'forward'))
+        self.assertFalse(actuators.command('motor', 'forward', sent.append, 'forward'))
+        self.assertTrue(actuators.command('servo', 90, sent.append, 90))
+        self.assertTrue(actuators.command('motor', 'stop', sent.append, 'stop'))
+
+        self.assertEqual(sent, ['forward', 90, 'stop'])
+        self.assertEqual((actuators.sent_count, actuators.suppressed_count), (3, 1))
+        self.assertEqual(actuators.value('motor'), 'stop')
+        self.assertIsNone(actuators.value('left_eye'))
+
+    def test_invalidate_sends_again(self):
+        sent = []
+        actuators = ActuatorCache()
+        actuators.command('motor', 'stop', sent.append, 'stop')
+        actuators.command('servo', 90, sent.append, 90)
+        actuators.invalidate('motor')
+        actuators.command('motor', 'stop', sent.append, 'stop')
+        actuators.command('servo', 90, sent.append, 90)
+        self.assertEqual(sent, ['stop', 90, 'stop'])
+
+        actuators.invalidate()
+        actuators.command('motor', 'stop', sent.append, 'stop')
+        actuators.command('servo', 90, sent.append, 90)
+        self.assertEqual(sent, ['stop', 90, 'stop', 'stop', 90])
+
+    def test_failed_send_through_the_executor_is_sent_again(self):
+        attempts = []
+
+        def send(value):
+            attempts.append(value)
+            if len(attempts) == 1:
+                raise OSError('bus error')
+
+        executor = HardwareExecutor(None)
+        executor.start()
+        actuators = ActuatorCache(executor)
+        with self.assertLogs('Robot', level='ERROR'):
+            self.assertTrue(actuators.command('motor', 'forward', send, 'forward'))
+            self.assertTrue(executor.flush(timeout=1.0))
+        self.assertIsNone(actuators.value('motor'))
+
+        self.assertTrue(actuators.command('motor', 'forward', send, 'forward'))
+        self.assertTrue(executor.flush(timeout=1.0))
+        self.assertFalse(actuators.command('motor', 'forward', send, 'forward'))
+        executor.stop()
+        self.assertEqual(attempts, ['forward', 'forward'])
+
+    def test_frame_keeps_the_last_value_of_each_actuator(self):
+        sent = []
+        actuators = ActuatorCache()
+        actuators.command('motor', 'forward', sent.append, 'forward')
+
+        actuators.begin_frame()
+        self.assertTrue(actuators.in_frame)
+        self.assertFalse(actuators.command('motor', 'stop', sent.append, 'stop'))
+        self.assertFalse(actuators.command('servo', 90, sent.append, 90))
+        self.assertFalse(actuators.command('motor', 'forward', sent.append, 'forward'))
+        self.assertEqual(actuators.value('motor'), 'forward')
+        self.assertEqual(sent, ['forward'])
+        actuators.commit()
+
+        # the stop never reaches the motors and the restart is the value they already have
+        self.assertFalse(actuators.in_frame)
+        self.assertEqual(sent, ['forward', 90])
+        self.assertEqual(actuators.coalesced_count, 1)
+        self.assertEqual(actuators.suppressed_count, 1)
+
+    def test_only_the_outermost_commit_sends(self):
+        sent = []
+        actuators = ActuatorCache()
+        actuators.begin_frame()
+        actuators.begin_frame()
+        actuators.command('servo', 90, sent.append, 90)
+        actuators.commit()
+        self.assertTrue(actuators.in_frame)
+        self.assertEqual(sent, [])
+        actuators.commit()
+        self.assertEqual(sent, [90])
+
+        with self.assertRaises(RuntimeError):
+            actuators.commit()
+
+
+def wait_until(predicate, timeout=2.0):
+    # polls until a background thread makes predicate() true, returns False on timeout
+    deadline = time.perf_counter() + timeout
+    while not predicate():
+        if time.perf_counter() > deadline:
+            return False
+        time.sleep(0.001)
+    return True
+
+
+class TestController(unittest.TestCase):
+    @staticmethod
+    def build_controller(script, capacity=Controller.BUFFER_CAPACITY):
+        clock = VirtualClock()
+        router = CommandRouter(default_target='home')
+        router.register('12', 'task 12')
+        controller = Controller(SimulatedGoPiGo3(remote_script=script, clock=clock), router, capacity, clock=clock)
+        return controller, router, clock
+
+    def test_background_reader(self):
+        controller, router, clock = self.build_controller([(0.0, '1', 1.0), (2.0, '2', 1.0), (4.0, 'ok', 1.0)])
+        controller.start_reader()
+        controller.start_reader()
+        self.assertTrue(controller.is_reading_in_background)
+        self.assertEqual([thread.name for thread in threading.enumerate()].count('remote-reader'), 1)
+
+        def last_key():
+            controller.track()
+            return controller.peek_last_char()
+
+        for time_point, key in ((0.0, '1'), (2.5, '2'), (4.5, 'ok')):
+            clock.advance_to(time_point)
+            self.assertTrue(wait_until(lambda: last_key() == key))
+
+        controller.stop_reader()
+        controller.stop_reader()
+        self.assertFalse(controller.is_reading_in_background)
+        self.assertNotIn('remote-reader', [thread.name for thread in threading.enumerate()])
+        self.assertEqual([event.time for event in controller.events], [0.0, 2.5, 4.5])
+        self.assertEqual(router.target, 'task 12')
+
+    def test_router_is_replayed_when_the_buffer_changes_at_its_start(self):
+        script = [(0.0, '3', 1.0), (2.0, '1', 1.0), (4.0, '2', 1.0), (6.0, 'ok', 1.0)]
+        controller, router, clock = self.build_controller(script, capacity=3)
+        for time_point in (0.5, 2.5, 4.5):
+            clock.advance_to(time_point)
+            controller.track()
+        self.assertTrue(router.is_rejected)
+
+        # the '3' falls out of the full buffer: the router sees '1', '2', 'ok'
+        clock.advance_to(6.5)
+        controller.track()
+        self.assertEqual(controller.dropped_count, 1)
+        self.assertEqual(router.target, 'task 12')
+
+        self.assertEqual(controller.next_char(), '1')
+        self.assertEqual(router.target, 'home')
+
+
+class TestRangeFinderSampler(unittest.TestCase):
+    @staticmethod
+    def build_range_finder(distances_mm):
+        clock = VirtualClock()
+        readings = iter(distances_mm)
+        simulator = SimulatedGoPiGo3(distance_field=lambda x, y, heading: next(readings), clock=clock)
+        return RangeFinder(simulator, clock=clock), clock
+
+    def test_median_filters_spikes(self):
+        # every third reading is a spike, which a median over three samples never returns
+        range_finder, clock = self.build_range_finder(itertools.cycle([500, 500, 2900]))
+        range_finder.start_sampler(rate=1000.0, window=3)
+        range_finder.start_sampler(rate=1000.0, window=3)
+        self.assertEqual([thread.name for thread in threading.enumerate()].count('range-finder-sampler'), 1)
+        self.assertTrue(wait_until(lambda: range_finder.sample_count >= 10))
+        for _ in range(20):
+            self.assertEqual(range_finder.distance_mm, 500)
+            self.assertEqual(range_finder.distance_cm, 50)
+
+        range_finder.stop_sampler()
+        range_finder.stop_sampler()
+        self.assertFalse(range_finder.is_sampling)
+        self.assertNotIn('range-finder-sampler', [thread.name for thread in threading.enumerate()])
+
+    def test_counts_stale_reads(self):
+        range_finder, clock = self.build_range_finder(itertools.repeat(800))
+        range_finder.start_sampler(rate=1.0)
+        self.assertTrue(wait_until(lambda: range_finder.sample_count == 1))
+        self.assertEqual(range_finder.distance_mm, 800)
+        self.assertEqual(range_finder.stale_read_count, 0)
+
+        # the sampler waits one real second before its next sample, while the simulated time moves on
+        clock.advance(5.0)
+        self.assertEqual(range_finder.distance_age, 5.0)
+        self.assertEqual(range_finder.distance_mm, 800)
+        self.assertEqual(range_finder.stale_read_count, 1)
+        range_finder.stop_sampler()
+        self.assertIsNone(range_finder.distance_age)
+
+
+class TestGoPiGo3Simulator(unittest.TestCase):
+    def test_robot_runs_on_the_simulator(self):
+        clock = VirtualClock()
+        latency = LatencyModel(latency=0.001, clock=clock)
+        simulator = SimulatedGoPiGo3(latency, clock=clock)
+        robot = Robot(backend=lambda: simulator)
+        self.assertTrue(robot.initialize())
+        self.assertTrue(robot.check_integrity())
+
+        robot.movement_direction = Direction.FORWARD
+        clock.advance(1.0)
+        # 20 cm/s toward the wall 100 cm away, for one second plus the bus time of the reads
+        self.assertEqual(robot.distance_cm, 79)
+        self.assertAlmostEqual(simulator.x, 20.0, delta=0.1)
+        robot.movement_direction = Direction.FORWARD
+
+        self.assertEqual(simulator.direction, 'forward')
+        self.assertEqual(simulator.call_counts['forward'], 1)
+        self.assertGreater(latency.call_count, 0)
+        self.assertAlmostEqual(latency.total_delay, 0.001 * latency.call_count)
+        self.assertAlmostEqual(clock.now(), 1.0 + latency.total_delay)
+
+    def test_jitter_is_reproducible(self):
+        delays = []
+        for _ in range(2):
+            latency = LatencyModel(latency=0.002, jitter=0.001, seed=7, clock=VirtualClock())
+            for _ in range(100):
+                latency.delay()
+            delays.append(latency.total_delay)
+        self.assertEqual(delays[0], delays[1])
+        self.assertAlmostEqual(delays[0], 0.2, delta=0.02)
+
+    def test_threads_never_overlap_on_the_bus(self):
+        simulator = SimulatedGoPiGo3(clock=VirtualClock())
+        bus = simulator.bus
+        probe = threading.Lock()
+        overlaps = []
+
+        def exclusive_bus():
+            if not probe.acquire(blocking=False):
+                overlaps.append(threading.current_thread().name)
+                return bus()
+            try:
+                # widens the window in which another thread could reach the bus
+                time.sleep(0.0002)
+                bus()
+            finally:
+                probe.release()
+
+        simulator.bus = exclusive_bus
+        robot = Robot(threaded_input=True, sampled_distance=True, threaded_output=True, backend=lambda: simulator)
+        self.assertTrue(robot.initialize())
+        self.assertTrue(robot.check_integrity())
+        for i in range(100):
+            robot.movement_direction = Direction.FORWARD if i % 2 else Direction.LEFT
+            robot.track()
+            robot.distance_cm
+            time.sleep(0.001)
+        robot.shut_down()
+
+        self.assertGreater(simulator.latency.call_count, 100)
+        self.assertEqual(overlaps, [])
+
+    def test_default_backend_uses_the_bus_mutex(self):
+        robot = Robot()
+        self.assertTrue(robot.initialize())
+        self.assertTrue(robot.robot.use_mutex)
+
+
 if __name__ == '__main__':
     unittest.main()
@@ -0,0 +1,157 @@
+from typing import Any, Dict, List, Optional, Sequence, Tuple, TYPE_CHECKING
+
+from lib.condition import StateValueCondition
+from lib.transition import Transition, ConditionalTransition
+
+if TYPE_CHECKING:
+    from lib.state import MonitoredState
+
+
+class ValueDispatch:
+    """
+    A run of consecutive transitions guarded by StateValueConditions on the same monitored state, evaluated with one
+    dict lookup on the custom value of the state instead of one comparison per transition.
+
+    Each case maps an expected value to a target, the transition itself for State.is_transiting or a row of the
+    compiled engine. When several cases expect the same value, the first one wins, as it does with the linear scan. A
+    custom value that cannot be hashed is compared to every case in order instead.
+
+    Attributes:
+        revision (int): Class-wide counter bumped whenever a condition or a transition that dispatch plans rely on is
+            changed, so that the states rebuild their plan before the next evaluation.
+        __monitored_state (MonitoredState): The state whose custom value is looked up.
+        __cases (Tuple[Tuple[Any, Any], ...]): The (expected value, target) pairs, in evaluation order.
+        __targets (Dict[Any, Any]): The target of the first case expecting each value.
+    """
+    # __monitored_state: MonitoredState
+    # __cases: Tuple[Tuple[Any, Any], ...]
+    # __targets: Dict[Any, Any]
+    revision: int = 0
+
+    def __init__(self, monitored_state: 'MonitoredState', cases: Sequence[Tuple[Any, Any]]) -> None:
+        """
+        Initializes a new instance of the ValueDispatch class.
+
+        Args:
+            monitored_state (MonitoredState): The state whose custom value is looked up.
+            cases (Sequence[Tuple[Any, Any]]): The (expected value, target) pairs, in evaluation order. The expected
+                values must be hashable and the targets must not be None.
+        """
+        targets = {}
+        for expected_value, target in cases:
+            targets.setdefault(expected_value, target)
+
+        self.__monitored_state = monitored_state
+        self.__cases = tuple(cases)
+        self.__targets = targets
+
+    @property
+    def monitored_state(self) -> 'MonitoredState':
+        """
+        Returns the state whose custom value is looked up.
+        """
+        return self.__monitored_state
+
+    @property
+    def cases(self) -> Tuple[Tuple[Any, Any], ...]:
+        """
+        Returns the (expected value, target) pairs, in evaluation order.
+        """
+        return self.__cases
+
+    def select(self) -> Any:
+        """
+        Returns the target of the first case expecting the current custom value of the monitored state, or None if
+        there is none.
+        """
+        value = self.__monitored_state.custom_value
+        try:
+            return self.__targets.get(value)
+        except TypeError:
+            for expected_value, target in self.__cases:
+                if expected_value == value:
+                    return target
+            return None
+
+    @classmethod
+    def invalidate(cls) -> None:
+        """
+        Makes every state rebuild its dispatch plan before its next evaluation. Called when a condition or a
+        transition changes in a way that may move it in or out of a group.
+        """
+        cls.revision += 1
+
+
+def _dispatch_key(transition: Transition) -> Optional[Tuple['MonitoredState', Any]]:
+    """
+    Returns the (monitored state, expected value) pair of a transition that can be part of a ValueDispatch, or None if
+    the transition must be evaluated on its own.
+
+    Only a plain ConditionalTransition whose condition is exactly a StateValueCondition, not inverted, with a hashable
+    expected value equal to itself, behaves the same under a dict lookup.
+
+    Args:
+        transition (Transition): The transition.
+    """
+    if type(transition).is_transiting is not ConditionalTransition.is_transiting:
+        return None
+    condition = transition.condition
+    if type(condition) is not StateValueCondition or condition.inverse:
+        return None
+
+    expected_value = condition.expected_value
+    try:
+        hash(expected_value)
+    except TypeError:
+        return None
+    if expected_value != expected_value:
+        return None
+    return condition.monitored_state, expected_value
+
+
+def dispatch_plan(transitions: Sequence[Transition], targets: Optional[Sequence[Any]] = None) \
+        -> Optional[Tuple[Any, ...]]:
+    """
+    Replaces every run of at least two consecutive transitions guarded by StateValueConditions on the same monitored
+    state with a ValueDispatch.
+
+    Args:
+        transitions (Sequence[Transition]): The transitions of a state, in evaluation order.
+        targets (Sequence[Any], optional): What stands for each transition in the plan. Defaults to the transitions.
+
+    Returns:
+        Optional[Tuple[Any, ...]]: The targets in evaluation order, each run replaced by its ValueDispatch, or None if
+            there is no run to replace.
+    """
+    if targets is None:
+        targets = transitions
+
+    plan: List[Any] = []
+    run: List[Tuple[Any, Any]] = []
+    run_state = None
+    grouped = False
+
+    def close_run() -> None:
+        nonlocal grouped
+        if len(run) > 1:
+            plan.append(ValueDispatch(run_state, run))
+            grouped = True
+        else:
+            plan.extend(target for _, target in run)
+
+    for transition, target in zip(transitions, targets):
+        key = _dispatch_key(transition)
+        if key is not None and key[0] is run_state:
+            run.append((key[1], target))
+            continue
+
+        close_run()
+        if key is None:
+            run, run_state = [], None
+            plan.append(target)
+        else:
+            run_state = key[0]
+            run = [(key[1], target)]
+    close_run()
+
+    return tuple(plan) if grouped else None